@@ -0,0 +1,105 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+# pyre-unsafe
+
+import json
+import logging
+import os
+import tempfile
+from typing import Dict, Optional
+
+logger: logging.Logger = logging.getLogger(__name__)
+
+DEFAULT_APPLY_CACHE_SIZE = 1024
+
+
+class ApplyResultCache:
+    """
+    Results of applying series, keyed by the commit they were applied on and
+    the digest of their mbox. A result is either the SHA-1 of the resulting
+    commit (`{"head": ...}`), or the error and conflict reported by `git am`
+    (`{"error": ..., "conflict": ...}`).
+
+    Successful applies are stored as JSON at `path` so that they survive
+    restarts, up to `size` of them, evicting the least recently used ones.
+    Failures may be transient (e.g., `git am` getting killed, or a full
+    disk): they are only kept in memory until `forget_failures` is called,
+    once per sync cycle.
+    """
+
+    def __init__(self, path: str, size: int = DEFAULT_APPLY_CACHE_SIZE) -> None:
+        self.path = path
+        self.size = size
+        self._entries: Optional[Dict[str, Dict[str, str]]] = None
+        self._failures: Dict[str, Dict[str, str]] = {}
+
+    @staticmethod
+    def key(base: str, mbox_digest: str) -> str:
+        return f"{base}:{mbox_digest}"
+
+    def _load(self) -> Dict[str, Dict[str, str]]:
+        if self._entries is None:
+            self._entries = {}
+            try:
+                with open(self.path) as f:
+                    # Failures may have been persisted by earlier versions.
+                    self._entries = {
+                        key: result
+                        for key, result in json.load(f).items()
+                        if "head" in result
+                    }
+            except FileNotFoundError:
+                pass
+            except (OSError, ValueError):
+                logger.exception(f"Failed to load apply cache {self.path}, dropping it")
+        return self._entries
+
+    def save(self) -> None:
+        entries = self._load()
+        try:
+            # Write atomically so that a crash cannot leave a truncated file.
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(self.path))
+            with os.fdopen(fd, "w") as f:
+                json.dump(entries, f)
+            os.replace(tmp_path, self.path)
+        except OSError:
+            logger.exception(f"Failed to save apply cache {self.path}")
+
+    def get(self, key: str) -> Optional[Dict[str, str]]:
+        if key in self._failures:
+            return self._failures[key]
+        entries = self._load()
+        result = entries.pop(key, None)
+        if result is not None:
+            # Dicts keep insertion order: move the entry to the end, as the
+            # most recently used.
+            entries[key] = result
+        return result
+
+    def put(self, key: str, result: Dict[str, str]) -> None:
+        if "head" not in result:
+            self._failures[key] = result
+            return
+        self._failures.pop(key, None)
+        entries = self._load()
+        entries.pop(key, None)
+        entries[key] = result
+        while len(entries) > self.size:
+            del entries[next(iter(entries))]
+        self.save()
+
+    def drop(self, key: str) -> None:
+        self._failures.pop(key, None)
+        if self._load().pop(key, None) is not None:
+            self.save()
+
+    def forget_failures(self) -> None:
+        """
+        Forget the failures recorded so far, so that the series get applied
+        again.
+        """
+        self._failures = {}
@@ -0,0 +1,116 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+# pyre-unsafe
+
+import asyncio
+import logging
+import os
+import signal
+import weakref
+from subprocess import PIPE
+from typing import Any, Callable, Dict, Optional, TypeVar
+
+import git
+
+logger: logging.Logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Generous, as pushes of kernel branches to GitHub can be slow.
+DEFAULT_GIT_TIMEOUT_SEC = 600
+
+# Event loop -> working directory -> lock serializing the commands run in it.
+# Locks cannot be shared between event loops.
+_repo_locks: weakref.WeakKeyDictionary[
+    asyncio.AbstractEventLoop, Dict[str, asyncio.Lock]
+] = weakref.WeakKeyDictionary()
+
+
+class AsyncGit:
+    """
+    Run git commands in a repository as asyncio subprocesses, so that the
+    event loop keeps serving other tasks (e.g., HTTP requests) meanwhile.
+
+    Commands run through any `AsyncGit` of the same working directory are
+    serialized. Commands are killed if they time out or if the awaiting task
+    gets cancelled. Failures raise `git.exc.GitCommandError`, as with GitPython.
+    """
+
+    def __init__(
+        self, working_dir: str, timeout: Optional[float] = DEFAULT_GIT_TIMEOUT_SEC
+    ) -> None:
+        self.working_dir = working_dir
+        self.timeout = timeout
+
+    @property
+    def lock(self) -> asyncio.Lock:
+        locks = _repo_locks.setdefault(asyncio.get_running_loop(), {})
+        return locks.setdefault(os.path.realpath(self.working_dir), asyncio.Lock())
+
+    @classmethod
+    def for_repo(cls, repo: git.Repo) -> "AsyncGit":
+        return cls(repo.working_dir)
+
+    async def run(
+        self,
+        *args: str,
+        stdin: Optional[bytes] = None,
+        env: Optional[Dict[str, str]] = None,
+    ) -> str:
+        """
+        Run `git *args` and return its output, minus the trailing newline.
+        `env` is added to the environment of the command.
+        """
+        command = ["git", *args]
+        async with self.lock:
+            proc = await asyncio.create_subprocess_exec(
+                *command,
+                cwd=self.working_dir,
+                stdin=PIPE if stdin is not None else None,
+                stdout=PIPE,
+                stderr=PIPE,
+                # Fail rather than wait for credentials that will never come.
+                env={**os.environ, "GIT_TERMINAL_PROMPT": "0", **(env or {})},
+                # So that the helpers git spawns (e.g., ssh) can be killed too.
+                start_new_session=True,
+            )
+            try:
+                stdout, stderr = await asyncio.wait_for(
+                    proc.communicate(stdin), self.timeout
+                )
+            except asyncio.TimeoutError as e:
+                logger.error(f"git {args[0]} timed out after {self.timeout}s")
+                await _kill(proc)
+                raise git.exc.GitCommandError(command, e) from e
+            except asyncio.CancelledError:
+                await _kill(proc)
+                raise
+
+        output = stdout.decode(errors="replace")
+        if proc.returncode != 0:
+            raise git.exc.GitCommandError(
+                command, proc.returncode, stderr.decode(errors="replace"), output
+            )
+        return output[:-1] if output.endswith("\n") else output
+
+    async def to_thread(self, func: Callable[..., T], *args: Any) -> T:
+        """
+        Call `func(*args)` in a thread, serialized with the commands run
+        through `run`. For the git work that is better done with GitPython
+        (e.g., several commands sharing an environment) than as separate
+        subprocesses. `func` must not use `AsyncGit` itself.
+        """
+        async with self.lock:
+            return await asyncio.to_thread(func, *args)
+
+
+async def _kill(proc: asyncio.subprocess.Process) -> None:
+    try:
+        os.killpg(proc.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+    await proc.wait()
@@ -0,0 +1,69 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+# pyre-unsafe
+
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, List, TypeVar
+
+from github.Branch import Branch
+from github.IssueComment import IssueComment
+from github.PullRequest import PullRequest
+from github.Repository import Repository
+from github.WorkflowJob import WorkflowJob
+from github.WorkflowRun import WorkflowRun
+
+T = TypeVar("T")
+
+DEFAULT_GITHUB_MAX_WORKERS = 8
+
+
+class AsyncGithub:
+    """
+    Async facade over the (blocking) PyGithub operations used from coroutines.
+
+    Calls run on a bounded thread pool, so that they neither block the event
+    loop nor flood GitHub: at most `max_workers` requests are in flight at
+    once. Paginated lists are fully fetched in the pool as well. The pool
+    threads are released by `close`.
+    """
+
+    def __init__(self, max_workers: int = DEFAULT_GITHUB_MAX_WORKERS) -> None:
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="github"
+        )
+
+    def close(self) -> None:
+        # Calls in flight are left to complete on their own.
+        self._executor.shutdown(wait=False)
+
+    async def call(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor, functools.partial(fn, *args, **kwargs)
+        )
+
+    async def update_pr(self, pr: PullRequest) -> None:
+        await self.call(pr.update)
+
+    async def set_labels(self, pr: PullRequest, *labels: str) -> None:
+        await self.call(pr.set_labels, *labels)
+
+    async def get_issue_comments(self, pr: PullRequest) -> List[IssueComment]:
+        return await self.call(lambda: list(pr.get_issue_comments()))
+
+    async def get_branches(self, repo: Repository) -> List[Branch]:
+        return await self.call(lambda: list(repo.get_branches()))
+
+    async def get_workflow_runs(
+        self, repo: Repository, **kwargs: Any
+    ) -> List[WorkflowRun]:
+        return await self.call(lambda: list(repo.get_workflow_runs(**kwargs)))
+
+    async def get_run_jobs(self, run: WorkflowRun) -> List[WorkflowJob]:
+        return await self.call(lambda: list(run.jobs()))
@@ -26,7 +26,6 @@ from email.message import EmailMessage
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 from enum import Enum
-from pathlib import Path
 from subprocess import PIPE
 from typing import (
     Any,
@@ -48,12 +47,20 @@ from github.Label import Label as GithubLabel
 from github.PullRequest import PullRequest
 from github.Repository import Repository
 from github.WorkflowJob import WorkflowJob
+from kernel_patches_daemon.apply_cache import ApplyResultCache
+from kernel_patches_daemon.async_git import AsyncGit
+from kernel_patches_daemon.async_github import AsyncGithub
 from kernel_patches_daemon.config import (
+    CloneConfig,
     EmailConfig,
     PRCommentsForwardingConfig,
     SERIES_TARGET_SEPARATOR,
 )
 from kernel_patches_daemon.github_connector import GithubConnector
+from kernel_patches_daemon.github_graphql import (
+    fetch_open_pr_snapshots,
+    PullRequestSnapshot,
+)
 from kernel_patches_daemon.github_logs import GithubLogExtractor
 from kernel_patches_daemon.patchwork import (
     Patchwork,
@@ -68,6 +75,7 @@ from kernel_patches_daemon.status import (
     Status,
 )
 from kernel_patches_daemon.utils import redact_url, remove_unsafe_chars
+from kernel_patches_daemon.worktree_pool import WorktreePool
 from opentelemetry import metrics
 from pyre_extensions import none_throws
 
@@ -96,7 +104,13 @@ errors: metrics.Counter = meter.create_counter(name="errors")
 # 100 commits should be sufficient. We could always increase the
 # count but it would slow down normal operation more.
 ALREADY_MERGED_LOOKBACK = 100
+# Ref under which the CI repository's files are made available to a worker's
+# repository.
+CI_FILES_REF = "refs/kpd/ci"
 BRANCH_TTL = 172800  # 1 week
+# Closed PRs are listed from the latest update seen, minus this margin for
+# updates GitHub indexes out of order.
+CLOSED_PRS_SINCE_MARGIN = 300
 PULL_REQUEST_TTL = timedelta(days=7)
 
 KNOWN_OK_COMMENT_EXCEPTIONS = {
@@ -483,9 +497,110 @@ def pr_has_label(pr: PullRequest, label: str) -> bool:
     return False
 
 
-def execute_command(cmd: str) -> None:
-    logger.info(cmd)
-    os.system(cmd)
+def _stripspace(text: str) -> str:
+    """
+    Clean up a commit message the way `git stripspace` (and thus `git am`)
+    does: strip trailing whitespace, squeeze and trim blank lines.
+    """
+    lines: List[str] = []
+    for line in text.splitlines():
+        line = line.rstrip()
+        if line or (lines and lines[-1]):
+            lines.append(line)
+    while lines and not lines[-1]:
+        lines.pop()
+    return "".join(f"{line}\n" for line in lines)
+
+
+async def _apply_mbox_to_index(repo: git.Repo, base: str, mbox: bytes) -> Optional[str]:
+    """
+    Apply the patches of `mbox` on top of commit `base`, committing each of
+    them like `git am` would, and return the SHA-1 of the last commit.
+
+    Patches are applied to a temporary index with `git apply --cached`, so
+    neither the working tree nor the index of `repo` are touched. Returns None
+    if any patch does not apply cleanly, in which case a 3-way merge (and
+    thus a checkout) is needed.
+    """
+    git_ = AsyncGit.for_repo(repo)
+    head = base
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        mbox_path = os.path.join(tmp_dir, "mbox")
+        with open(mbox_path, "wb") as f:
+            f.write(mbox)
+        mails_dir = os.path.join(tmp_dir, "mails")
+        os.mkdir(mails_dir)
+        try:
+            await git_.run("mailsplit", f"-o{mails_dir}", mbox_path)
+        except git.exc.GitCommandError:
+            return None
+        # One file per mail, named after their position in the mbox.
+        mails = sorted(os.listdir(mails_dir))
+        if not mails:
+            return None
+
+        index_env = {"GIT_INDEX_FILE": os.path.join(tmp_dir, "index")}
+        await git_.run("read-tree", base, env=index_env)
+        msg_path = os.path.join(tmp_dir, "msg")
+        patch_path = os.path.join(tmp_dir, "patch")
+        for name in mails:
+            try:
+                with open(os.path.join(mails_dir, name), "rb") as mail:
+                    mail_content = mail.read()
+                info = await git_.run(
+                    "mailinfo", msg_path, patch_path, stdin=mail_content
+                )
+                if not os.path.getsize(patch_path):
+                    return None
+                await git_.run("apply", "--cached", patch_path, env=index_env)
+            except git.exc.GitCommandError:
+                return None
+            headers = dict(
+                line.split(": ", 1) for line in info.splitlines() if ": " in line
+            )
+            # Let `git am` deal with (and report) mails without an author.
+            if not headers.get("Author") or not headers.get("Email"):
+                return None
+
+            with open(msg_path, encoding="utf-8") as f:
+                message = _stripspace(f"{headers.get('Subject', '')}\n\n{f.read()}")
+            tree = await git_.run("write-tree", env=index_env)
+            head = await git_.run(
+                "commit-tree",
+                tree,
+                "-p",
+                head,
+                stdin=message.encode(),
+                env={
+                    "GIT_AUTHOR_NAME": headers["Author"],
+                    "GIT_AUTHOR_EMAIL": headers["Email"],
+                    "GIT_AUTHOR_DATE": headers.get("Date", ""),
+                },
+            )
+    return head
+
+
+async def _move_branch(repo: git.Repo, branch: str, sha: str) -> None:
+    """
+    Point `branch` at `sha` without touching the working tree.
+    """
+    git_ = AsyncGit.for_repo(repo)
+    try:
+        head = await git_.run("symbolic-ref", "--quiet", "--short", "HEAD")
+    except git.exc.GitCommandError:
+        # Detached HEAD.
+        head = None
+    # The branch may be checked out from an earlier 3-way merge. It must not be
+    # moved from under the checkout.
+    if head == branch:
+        await git_.run("checkout", "--detach")
+    await git_.run("update-ref", f"refs/heads/{branch}", sha)
+
+
+def _is_ci_file(path: str) -> bool:
+    # CI files used to be copied with `cp {ci_repo_dir}/*`, which skips hidden
+    # top-level entries, and `.github` separately.
+    return not path.startswith(".") or path.startswith(".github/")
 
 
 def _uniq_tmp_folder(
@@ -502,6 +617,34 @@ def _uniq_tmp_folder(
     return os.path.join(base_directory, f"pw_sync_{repo_name}_{sha.hexdigest()}")
 
 
+def _object_store_folder(url: str, base_directory: str) -> str:
+    # Clones of the same remote share a single object store, whatever branch
+    # they track. Credentials are left out as they change on token refreshes.
+    url = redact_url(url)
+    sha = hashlib.sha256()
+    sha.update(url.encode("utf-8"))
+    repo_name = remove_unsafe_chars(os.path.basename(url))
+    return os.path.join(base_directory, f"pw_objects_{repo_name}_{sha.hexdigest()}")
+
+
+def _update_object_store(path: str, url: str, branch: str) -> None:
+    """
+    Fetch `branch` of `url` into the bare repository at `path`, creating it if
+    need be. Clones borrowing objects from it (through `--reference`) then only
+    have to download what it is missing.
+    """
+    try:
+        store = git.Repo(path)
+    except git.exc.GitError:
+        shutil.rmtree(path, ignore_errors=True)
+        store = git.Repo.init(path, bare=True)
+        # Objects may only be referenced by the clones borrowing them, so the
+        # store must never prune anything on its own.
+        store.git.config("gc.auto", "0")
+        store.git.config("gc.pruneExpire", "never")
+    store.git.fetch("--no-tags", url, f"+refs/heads/{branch}:refs/heads/{branch}")
+
+
 @contextmanager
 def temporary_patch_file(content: bytes) -> Generator[IO, None, None]:
     """
@@ -567,6 +710,76 @@ def prs_for_the_same_series(pr1: PullRequest, pr2: PullRequest) -> bool:
     )
 
 
+def _ref_sha(repo: git.Repo, ref: str) -> Optional[str]:
+    """
+    Returns the SHA `ref` points to in `repo`, or None if it does not exist.
+    """
+    try:
+        return repo.git.rev_parse("--verify", "--quiet", ref)
+    except git.exc.GitCommandError:
+        return None
+
+
+async def _async_ref_sha(repo: git.Repo, ref: str) -> Optional[str]:
+    """
+    Same as `_ref_sha`, through `AsyncGit`.
+    """
+    try:
+        return await AsyncGit.for_repo(repo).run(
+            "rev-parse", "--verify", "--quiet", ref
+        )
+    except git.exc.GitCommandError:
+        return None
+
+
+def _fetch_branches(repo: git.Repo, branches: Optional[Sequence[str]]) -> None:
+    """
+    Fetch `branches` from origin and drop the remote-tracking refs of all the
+    others, or fetch everything if `branches` is None. Branches deleted from
+    origin since they were listed are skipped.
+    """
+    if branches is None:
+        repo.git.fetch("--prune", "origin")
+        return
+
+    def fetch(branches: Sequence[str]) -> None:
+        # Explicit refspecs restrict the refs advertised by the remote to the
+        # ones we ask for, but are not considered by `--prune` for other refs.
+        repo.git.fetch(
+            "origin", *[f"+refs/heads/{b}:refs/remotes/origin/{b}" for b in branches]
+        )
+
+    try:
+        fetch(branches)
+    except git.exc.GitCommandError:
+        # Fetching a missing ref is an error: find out which ones are gone.
+        existing = {
+            line.partition("\t")[2]
+            for line in repo.git.ls_remote(
+                "--heads", "origin", *[f"refs/heads/{b}" for b in branches]
+            ).splitlines()
+        }
+        missing = [b for b in branches if f"refs/heads/{b}" not in existing]
+        if not missing:
+            raise
+        logger.warning(f"Branches deleted from origin, not fetching them: {missing}")
+        branches = [b for b in branches if b not in missing]
+        fetch(branches)
+    wanted = {f"refs/remotes/origin/{b}" for b in branches}
+    wanted.add("refs/remotes/origin/HEAD")
+    stale = [
+        ref
+        for ref in repo.git.for_each_ref(
+            "--format=%(refname)", "refs/remotes/origin/"
+        ).splitlines()
+        if ref not in wanted
+    ]
+    if stale:
+        commands = "".join(f"delete {ref}\n" for ref in stale)
+        with temporary_patch_file(commands.encode()) as f:
+            repo.git.update_ref("--stdin", istream=f)
+
+
 def _reset_repo(repo, branch: str) -> None:
     """
     Reset the repository into a known good state, with `branch` checked out.
@@ -595,10 +808,10 @@ async def _series_already_applied(repo: git.Repo, series: Series, rev: str) -> b
     could have applied a fixup.
     """
     try:
-        summaries = {
-            commit.summary.lower()
-            for commit in repo.iter_commits(rev, max_count=ALREADY_MERGED_LOOKBACK)
-        }
+        log = await AsyncGit.for_repo(repo).run(
+            "log", f"--max-count={ALREADY_MERGED_LOOKBACK}", "--format=%s", rev
+        )
+        summaries = {summary.lower() for summary in log.splitlines()}
     except git.exc.GitCommandError:
         logger.exception("Failed to check series application status")
         return False
@@ -606,7 +819,7 @@ async def _series_already_applied(repo: git.Repo, series: Series, rev: str) -> b
     return any(ps.lower() in summaries for ps in await series.patch_subjects())
 
 
-def _is_branch_changed(
+async def _is_branch_changed(
     repo: git.Repo, base_branch: str, old_branch: str, new_branch: str
 ) -> bool:
     """
@@ -617,14 +830,19 @@ def _is_branch_changed(
     SHA is unstable even if the contents are the same. So compare the contents
     we care about.
     """
+    git_ = AsyncGit.for_repo(repo)
     # Check if code changes are different
-    if repo.git.diff(new_branch, old_branch):
+    if await git_.run("diff", new_branch, old_branch):
         return True
 
     # Check if change metadata is different (number of commits and
     # commit messages)
-    old_metadata = repo.git.log('--format="%B"', f"{base_branch}..{old_branch}")
-    new_metadata = repo.git.log('--format="%B"', f"{base_branch}..{new_branch}")
+    old_metadata = await git_.run(
+        "log", '--format="%B"', f"{base_branch}..{old_branch}"
+    )
+    new_metadata = await git_.run(
+        "log", '--format="%B"', f"{base_branch}..{new_branch}"
+    )
     if old_metadata != new_metadata:
         return True
 
@@ -683,12 +901,16 @@ class BranchWorker(GithubConnector):
         app_auth: Optional[Auth.AppInstallationAuth] = None,
         email: Optional[EmailConfig] = None,
         http_retries: Optional[int] = None,
+        worktree_pool_size: int = 0,
+        clone_config: Optional[CloneConfig] = None,
+        async_github: Optional[AsyncGithub] = None,
     ) -> None:
         super().__init__(
             repo_url=repo_url,
             github_oauth_token=github_oauth_token,
             app_auth=app_auth,
             http_retries=http_retries,
+            async_github=async_github,
         )
 
         self.patchwork = patchwork
@@ -701,22 +923,54 @@ class BranchWorker(GithubConnector):
         # Set properly at a later time.
 
         self.repo_dir = _uniq_tmp_folder(repo_url, repo_branch, base_directory)
+        self.base_directory = base_directory
+        self.clone_config: CloneConfig = clone_config or CloneConfig()
         self.repo_branch = repo_branch
         self.repo_pr_base_branch = repo_branch + "_base"
         self.repo_local: Optional[git.Repo] = None
+        # Checkouts in which series get applied. Subjects synced concurrently
+        # each lease their own one.
+        self.worktrees = WorktreePool(self.repo_dir, worktree_pool_size)
+        # Serializes updates of the PR base branch, which happen in
+        # `repo_local` itself.
+        self.base_branch_lock = asyncio.Lock()
+        # Results of applying series. Successful ones are persisted next to the
+        # repository.
+        self.apply_cache = ApplyResultCache(f"{self.repo_dir}_apply_cache.json")
 
         self.upstream_url = upstream_url
         self.upstream_branch = upstream_branch
         # Most recently used upstream SHA-1. Used to prevent unnecessary pushes
         # if upstream did not change.
         self.upstream_sha = None
+        # SHA-1 of the CI files, as of the last fetch of the CI repo.
+        self.ci_sha: Optional[str] = None
+        # (upstream SHA-1, CI SHA-1) the e2e test branch was last updated for.
+        self.e2e_synced_key: Optional[Tuple[Optional[str], Optional[str]]] = None
+        # Base branch name -> ((upstream SHA-1, CI SHA-1), SHA-1 of the base
+        # commit built for them).
+        self.pr_base_commits: Dict[
+            str, Tuple[Tuple[Optional[str], Optional[str]], str]
+        ] = {}
+        # PR number -> snapshot of the PR, as of the last `get_pulls`. Dropped
+        # when KPD changes the PR itself.
+        self.pr_snapshots: Dict[int, PullRequestSnapshot] = {}
+        # PR number -> (series ID, snapshot) the checks were last synced for.
+        self.synced_checks: Dict[int, Tuple[int, PullRequestSnapshot]] = {}
 
         create_color_labels(labels_cfg, self.repo)
         # member variables
         self.branches = {}
         self.prs: Dict[str, PullRequest] = {}
         self.all_prs = {}
-        self._closed_prs = None
+        # Head branch -> (number, update timestamp) of the most recently
+        # updated closed PR. Only PRs updated since `closed_prs_synced_at` get
+        # listed to update it, on first use in each cycle.
+        self.closed_pr_index: Dict[str, Tuple[int, float]] = {}
+        self.closed_prs_synced_at: Optional[float] = None
+        self._closed_prs_refreshed = False
+        # Number -> closed PR, as listed by the latest refresh of the index.
+        self._closed_pr_objects: Dict[int, PullRequest] = {}
 
     def _create_new_pull_request(
         self, title: str, message: str, head: str, base: str
@@ -769,19 +1023,29 @@ class BranchWorker(GithubConnector):
     ) -> Optional[PullRequest]:
         base_branch = branch + "_base"
         branch_name = branch + "_test"
+        title = f"[test] {branch_name}"
+
+        # Neither upstream nor the CI files changed since the branch was last
+        # pushed, and its PR is still open: there is nothing to update.
+        key = (self.upstream_sha, self.ci_sha)
+        if (
+            key == self.e2e_synced_key
+            and branch_name in self.branches
+            and title in self.prs
+        ):
+            logger.info(f"{branch_name} is up to date, skipping update")
+            return
 
-        self._update_pr_base_branch(base_branch)
+        base_commit = self._pr_base_commit(base_branch)
 
         # Now that we have an updated base branch, create a dummy commit on top
         # so that we can actually create a pull request (this path tests
         # upstream directly, without any mailbox patches applied).
         # pyrefly: ignore  # missing-attribute
-        self.repo_local.git.checkout("-B", branch_name)
+        self.repo_local.git.checkout("-B", branch_name, base_commit)
         # pyrefly: ignore  # missing-attribute
         self.repo_local.git.commit("--allow-empty", "--message", "Dummy commit")
 
-        title = f"[test] {branch_name}"
-
         # Force push only if there is no branch or code changes.
         pushed = False
         # pyrefly: ignore  # missing-attribute
@@ -793,6 +1057,7 @@ class BranchWorker(GithubConnector):
             pushed = True
 
         self._update_e2e_pr(title, base_branch, branch_name, pushed)
+        self.e2e_synced_key = key
 
     def can_do_sync(self) -> bool:
         github_ratelimit = self.git.get_rate_limit()
@@ -817,27 +1082,112 @@ class BranchWorker(GithubConnector):
             self.repo_local.create_remote(UPSTREAM_REMOTE_NAME, self.upstream_url)
         # pyrefly: ignore  # missing-attribute
         upstream_repo = self.repo_local.remote(UPSTREAM_REMOTE_NAME)
-        upstream_repo.fetch(self.upstream_branch)
+        # In a shallow clone, limit the history of the first upstream fetch the
+        # same way. Later fetches only download what is new.
+        fetch_args = {}
+        if (
+            self.clone_config.is_shallow
+            and _ref_sha(
+                # pyrefly: ignore  # bad-argument-type
+                self.repo_local,
+                f"refs/remotes/{UPSTREAM_REMOTE_NAME}/{self.upstream_branch}",
+            )
+            is None
+        ):
+            fetch_args = self._shallow_fetch_args()
+        upstream_repo.fetch(self.upstream_branch, **fetch_args)
         upstream_branch = getattr(upstream_repo.refs, self.upstream_branch)
-        _reset_repo(self.repo_local, f"{UPSTREAM_REMOTE_NAME}/{self.upstream_branch}")
-        # pyrefly: ignore  # missing-attribute
-        self.repo_local.git.push(
-            "--force", "origin", f"{upstream_branch}:refs/heads/{self.repo_branch}"
-        )
-        self.upstream_sha = upstream_branch.object.hexsha
+        upstream_sha = upstream_branch.object.hexsha
+        # On most cycles upstream did not move and our branch, freshly
+        # fetched, is already at its state: nothing to reset or push then.
+        # pyrefly: ignore  # bad-argument-type
+        if _ref_sha(self.repo_local, f"refs/remotes/origin/{self.repo_branch}") != (
+            upstream_sha
+        ):
+            _reset_repo(
+                self.repo_local, f"{UPSTREAM_REMOTE_NAME}/{self.upstream_branch}"
+            )
+            # pyrefly: ignore  # missing-attribute
+            self.repo_local.git.push(
+                "--force", "origin", f"{upstream_branch}:refs/heads/{self.repo_branch}"
+            )
+        self.upstream_sha = upstream_sha
 
-    def full_sync(self, path: str, url: str, branch: str) -> git.Repo:
+    def _shallow_fetch_args(self) -> Dict[str, Any]:
+        """
+        Options limiting the history downloaded by a clone or fetch, as per
+        the configured clone mode.
+        """
+        if self.clone_config.depth is not None:
+            # `_series_already_applied` needs that many commits of history.
+            return {"depth": max(self.clone_config.depth, ALREADY_MERGED_LOOKBACK)}
+        if self.clone_config.shallow_since is not None:
+            return {"shallow_since": self.clone_config.shallow_since}
+        return {}
+
+    def full_sync(
+        self,
+        path: str,
+        url: str,
+        branch: str,
+        branches: Optional[Sequence[str]] = None,
+    ) -> git.Repo:
+        """
+        Clone `url` afresh at `path` and check out `branch`. With single branch
+        clones, only `branches` are fetched after the initial clone if given,
+        all of them otherwise.
+        """
         logging.info(f"Doing full clone from {redact_url(url)}, branch: {branch}")
 
         with HistogramMetricTimer(git_clone_duration, {"branch": branch}):
             shutil.rmtree(path, ignore_errors=True)
-            repo = git.Repo.clone_from(url, path)
+            clone_args = self._shallow_fetch_args()
+            if self.clone_config.filter:
+                clone_args["filter"] = self.clone_config.filter
+            if self.clone_config.single_branch:
+                clone_args.update(single_branch=True, branch=branch)
+            elif self.clone_config.is_shallow:
+                # Shallow clones otherwise only fetch the remote HEAD.
+                clone_args["no_single_branch"] = True
+
+            # Shallow and partial clones are already lean, and borrowing from a
+            # full object store would defeat their purpose.
+            if self.clone_config.is_full:
+                store = _object_store_folder(url, self.base_directory)
+                try:
+                    _update_object_store(store, url, branch)
+                    clone_args["reference_if_able"] = store
+                except git.exc.GitCommandError:
+                    logger.exception(
+                        f"Failed to update object store {store}, cloning without it"
+                    )
+            repo = git.Repo.clone_from(url, path, **clone_args)
+
+            if self.clone_config.single_branch:
+                # Only the initial transfer is limited to `branch`: PR branches
+                # are still needed to tell whether they changed. They are based
+                # on `branch`, so fetching them is cheap.
+                if branches is None:
+                    repo.git.config(
+                        "remote.origin.fetch", "+refs/heads/*:refs/remotes/origin/*"
+                    )
+                _fetch_branches(repo, branches)
             _reset_repo(repo, f"origin/{branch}")
 
         git_clone_counter.add(1, {"branch": branch})
         return repo
 
-    def fetch_repo(self, path: str, url: str, branch: str) -> git.Repo:
+    def fetch_repo(
+        self,
+        path: str,
+        url: str,
+        branch: str,
+        branches: Optional[Sequence[str]] = None,
+    ) -> git.Repo:
+        """
+        Update the clone of `url` at `path` and check out `branch`. Only
+        `branches` are fetched if given, all of them otherwise.
+        """
         logging.info(f"Checking local sync repo at {path}")
 
         if os.path.exists(f"{path}/.git"):
@@ -846,7 +1196,7 @@ class BranchWorker(GithubConnector):
                 with HistogramMetricTimer(git_fetch_duration, {"branch": branch}):
                     # Update origin URL to support GH app token refreshes
                     repo.remote(name="origin").set_url(url)
-                    repo.git.fetch("--prune", "origin")
+                    _fetch_branches(repo, branches)
                     _reset_repo(repo, f"origin/{branch}")
 
                 git_fetch_counter.add(1)
@@ -854,61 +1204,104 @@ class BranchWorker(GithubConnector):
             except git.exc.GitCommandError:
                 logger.exception("Exception fetching repo, falling back to full_sync")
 
-        return self.full_sync(path, url, branch)
+        return self.full_sync(path, url, branch, branches)
+
+    def tracked_branches(self) -> List[str]:
+        """
+        Branches of the repository this worker needs locally: the branch
+        itself, its `_base` and `_test` branches, and the heads of its open
+        PRs. As fetching a missing ref is an error, only those present in
+        `self.branches` are returned.
+        """
+        wanted = {self.repo_pr_base_branch, f"{self.repo_branch}_test"}
+        wanted.update(self.all_prs)
+        return sorted({self.repo_branch} | (wanted & set(self.branches)))
 
     def fetch_repo_branch(self) -> None:
         """
-        Fetch the repository branch of interest only once
+        Fetch the repository branch of interest only once. Expects `get_pulls`
+        and the list of branches to be up to date.
         """
         self.repo_local = self.fetch_repo(
-            self.repo_dir, self.repo_url, self.repo_branch
+            self.repo_dir, self.repo_url, self.repo_branch, self.tracked_branches()
         )
+        self.worktrees.attach(self.repo_local)
         ci_repo_local = self.fetch_repo(
             self.ci_repo_dir,
             self.ci_repo_url,
             self.ci_branch,
+            [self.ci_branch],
         )
         ci_repo_local.git.checkout(f"origin/{self.ci_branch}")
+        self.ci_sha = ci_repo_local.head.commit.hexsha
 
-    def _update_pr_base_branch(self, base_branch: str):
+    def _update_pr_base_branch(self, base_branch: str) -> str:
         """
-        Update the pull request base branch by resetting it to upstream state
-        and then adding CI files to it.
+        Update the pull request base branch to the upstream state with CI
+        files on top, and return the SHA-1 of its commit.
         """
-        # Basically, on a detached head representing upstream state, add CI
-        # files. This is the state that the base branch should have. Then see if
-        # that is already the state that it has in the remote repository. If
-        # not, push it. Lastly, always make sure to check out `base_branch`.
-        _reset_repo(self.repo_local, f"{UPSTREAM_REMOTE_NAME}/{self.upstream_branch}")
-        self._add_ci_files()
-
-        try:
+        # The base commit is made of the upstream tree with CI files laid over
+        # it. If that is already the tree of the remote base branch, reuse its
+        # commit. Otherwise commit the tree on top of upstream and push it.
+        repo = none_throws(self.repo_local)
+        upstream = f"{UPSTREAM_REMOTE_NAME}/{self.upstream_branch}"
+        tree = self._add_ci_files(repo, upstream)
+
+        sha = _ref_sha(repo, f"remotes/origin/{base_branch}")
+        if sha is None or _ref_sha(repo, f"{sha}^{{tree}}") != tree:
+            sha = repo.git.commit_tree(tree, "-p", upstream, "-m", "adding ci files")
+            repo.git.push("--force", "origin", f"{sha}:refs/heads/{base_branch}")
+        # The local branch is never checked out, so it can be moved directly.
+        repo.git.update_ref(f"refs/heads/{base_branch}", sha)
+        return sha
+
+    def _pr_base_commit(self, base_branch: str) -> str:
+        """
+        Returns the SHA-1 of the commit `base_branch` is made of, i.e., the
+        upstream state with CI files on top. It only gets rebuilt (and pushed
+        if need be) when either upstream or the CI files changed. The local
+        `base_branch` is pointed at it either way, as PR diffs are computed
+        against it.
+        """
+        key = (self.upstream_sha, self.ci_sha)
+        cached = self.pr_base_commits.get(base_branch)
+        # The commit may be gone if the repository got cloned again.
+        if (
+            cached is not None
+            and cached[0] == key
+            # pyrefly: ignore  # bad-argument-type
+            and _ref_sha(self.repo_local, f"{cached[1]}^{{commit}}") is not None
+        ):
+            # The branch may be missing, e.g., in a new clone after a restart.
             # pyrefly: ignore  # missing-attribute
-            diff = self.repo_local.git.diff(f"remotes/origin/{base_branch}")
-        except git.exc.GitCommandError:
-            # The remote may not exist, in which case we want to push.
-            diff = True
+            self.repo_local.git.update_ref(f"refs/heads/{base_branch}", cached[1])
+            return cached[1]
 
-        if diff:
-            # pyrefly: ignore  # missing-attribute
-            self.repo_local.git.checkout("-B", base_branch)
-            # pyrefly: ignore  # missing-attribute
-            self.repo_local.git.push("--force", "origin", f"refs/heads/{base_branch}")
-        else:
-            # pyrefly: ignore  # missing-attribute
-            self.repo_local.git.checkout("-B", base_branch, f"origin/{base_branch}")
+        sha = self._update_pr_base_branch(base_branch)
+        self.pr_base_commits[base_branch] = (key, sha)
+        return sha
 
-    def _create_dummy_commit(self, branch_name: str) -> None:
+    async def _create_dummy_commit(
+        self, branch_name: str, repo: Optional[git.Repo] = None
+    ) -> None:
         """
         Reset branch, create dummy commit
         """
-        _reset_repo(self.repo_local, f"{UPSTREAM_REMOTE_NAME}/{self.upstream_branch}")
-        # pyrefly: ignore  # missing-attribute
-        self.repo_local.git.checkout("-B", branch_name)
-        # pyrefly: ignore  # missing-attribute
-        self.repo_local.git.commit("--allow-empty", "--message", "Dummy commit")
-        # pyrefly: ignore  # missing-attribute
-        self.repo_local.git.push("--force", "origin", branch_name)
+        git_ = AsyncGit.for_repo(repo or none_throws(self.repo_local))
+        try:
+            await git_.run("am", "--abort")
+        except git.exc.GitCommandError:
+            pass
+        await git_.run(
+            "checkout",
+            "--force",
+            "--ignore-other-worktrees",
+            "-B",
+            branch_name,
+            f"{UPSTREAM_REMOTE_NAME}/{self.upstream_branch}",
+        )
+        await git_.run("commit", "--allow-empty", "--message", "Dummy commit")
+        await git_.run("push", "--force", "origin", branch_name)
 
     def _close_pr(self, pr: PullRequest) -> None:
         pr.edit(state="closed")
@@ -947,10 +1340,15 @@ class BranchWorker(GithubConnector):
         can_create: bool = False,
         close: bool = False,
         has_merge_conflict: bool = False,
+        repo: Optional[git.Repo] = None,
     ) -> Optional[PullRequest]:
         """
         Appends comment to a PR.
+
+        `repo` is the checkout the series was applied in, defaulting to
+        `repo_local`.
         """
+        repo = repo or self.repo_local
         title = f"{series.subject}"
         tags = await series.visible_tags()
         pr_labels = copy.copy(tags)
@@ -980,9 +1378,9 @@ class BranchWorker(GithubConnector):
 
         if not pr and can_create and not close:
             # If there is no merge conflict and no change, ignore the series
-            # pyrefly: ignore  # missing-attribute
-            if not has_merge_conflict and not self.repo_local.git.diff(
-                self.repo_pr_base_branch, branch_name
+            # pyrefly: ignore  # bad-argument-type
+            if not has_merge_conflict and not await AsyncGit.for_repo(repo).run(
+                "diff", self.repo_pr_base_branch, branch_name
             ):
                 # raise an exception so it bubbles up to the caller.
                 raise NewPRWithNoChangeException(self.repo_pr_base_branch, branch_name)
@@ -991,7 +1389,7 @@ class BranchWorker(GithubConnector):
             pr_created.add(1)
             if has_merge_conflict:
                 pr_merge_conflict.add(1)
-                self._create_dummy_commit(branch_name)
+                await self._create_dummy_commit(branch_name, repo)
 
             pr = self._create_new_pull_request(
                 title=title,
@@ -1017,7 +1415,7 @@ class BranchWorker(GithubConnector):
 
         if pr:
             if (not has_merge_conflict) or (
-                has_merge_conflict and not pr_has_label(pr, MERGE_CONFLICT_LABEL)
+                has_merge_conflict and not self.pr_has_label(pr, MERGE_CONFLICT_LABEL)
             ):
                 if message:
                     self._add_pull_request_comment(pr, message)
@@ -1028,7 +1426,8 @@ class BranchWorker(GithubConnector):
                 suffix.to_label(series.version) for suffix in StatusLabelSuffixes
             }
             labels = {label.name for label in pr.labels if label.name in status_labels}
-            pr.set_labels(*pr_labels | labels)
+            await self.async_github.set_labels(pr, *pr_labels | labels)
+            self._pr_changed(pr)
 
             if close:
                 pr_closed.add(1)
@@ -1070,63 +1469,145 @@ class BranchWorker(GithubConnector):
         branch_deleted.add(1)
         self.repo.get_git_ref(f"heads/{branch_name}").delete()
 
-    def _add_ci_files(self) -> None:
+    def _add_ci_files(self, repo: git.Repo, rev: str) -> str:
         """
-        Copy over and commit CI files (from the CI repository) to the current
-        local repository's currently checked out branch.
+        Lay the files of the CI repository over the tree of `rev` in `repo`,
+        and return the SHA-1 of the resulting tree. Only git objects are
+        involved: neither the working tree nor the index of `repo` are used.
         """
-        if Path(f"{self.ci_repo_dir}/.github").exists():
-            execute_command(f"cp --archive {self.ci_repo_dir}/.github {self.repo_dir}")
-            # pyrefly: ignore  # missing-attribute
-            self.repo_local.git.add("--force", ".github")
-        execute_command(f"cp --archive {self.ci_repo_dir}/* {self.repo_dir}")
-        # pyrefly: ignore  # missing-attribute
-        self.repo_local.git.add("--all", "--force")
-        # pyrefly: ignore  # missing-attribute
-        self.repo_local.git.commit("--all", "--message", "adding ci files")
+        repo.git.fetch("--no-tags", self.ci_repo_dir, f"+HEAD:{CI_FILES_REF}")
+        # Entries are formatted as "<mode> <type> <sha>\t<path>", as expected
+        # by `git update-index --index-info`.
+        entries = repo.git.ls_tree("-r", "-z", CI_FILES_REF).split("\0")
+        index_info = "".join(
+            f"{entry}\0"
+            for entry in entries
+            if entry and _is_ci_file(entry.partition("\t")[2])
+        )
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            env = {"GIT_INDEX_FILE": os.path.join(tmp_dir, "index")}
+            repo.git.read_tree(rev, env=env)
+            with temporary_patch_file(index_info.encode()) as f:
+                repo.git.update_index("-z", "--index-info", istream=f, env=env)
+            return repo.git.write_tree(env=env)
+
+    async def _locked_pr_base_commit(self) -> str:
+        """
+        `_pr_base_commit` of the PR base branch, run in a thread so as not to
+        block the event loop, and serialized with the other git commands run
+        in `repo_local`. Expects `base_branch_lock` to be held.
+        """
+        return await AsyncGit.for_repo(none_throws(self.repo_local)).to_thread(
+            self._pr_base_commit, self.repo_pr_base_branch
+        )
+
+    async def _checkout_pr_base(self, repo: git.Repo, branch_name: str) -> str:
+        """
+        Check out `branch_name` in `repo` at the PR base commit, and return
+        the SHA-1 of the latter. The base branch is updated and pushed first
+        if need be, all of it under `base_branch_lock` so that concurrent
+        subjects cannot move the base in between.
+
+        Leftovers of an earlier failed `git am` (an unmerged index, an
+        in-progress `.git/rebase-apply`) are discarded first.
+        """
+        git_ = AsyncGit.for_repo(repo)
+        try:
+            await git_.run("am", "--abort")
+        except git.exc.GitCommandError:
+            pass
+        await git_.run("reset", "--hard")
+        async with self.base_branch_lock:
+            base_commit = await self._locked_pr_base_commit()
+            await git_.run(
+                "checkout", "--ignore-other-worktrees", "-B", branch_name, base_commit
+            )
+        return base_commit
 
     async def try_apply_mailbox_series(
         self, branch_name: str, series: Series
     ) -> Tuple[bool, Optional[Exception], Optional[Any]]:
         """Try to apply a mailbox series and return (True, None, None) if successful"""
+        async with self.worktrees.lease() as repo:
+            return await self._try_apply_mailbox_series(repo, branch_name, series)
+
+    async def _try_apply_mailbox_series(
+        self, repo: git.Repo, branch_name: str, series: Series
+    ) -> Tuple[bool, Optional[Exception], Optional[Any]]:
+        """
+        Apply a mailbox series on top of the PR base branch in the leased
+        checkout `repo`, leaving `branch_name` pointing at the result. The
+        branch is only checked out if the series needed a 3-way merge.
+        """
         # The pull request will be created against `repo_pr_base_branch`. So
         # prepare it for that.
-        self._update_pr_base_branch(self.repo_pr_base_branch)
-        # pyrefly: ignore  # missing-attribute
-        self.repo_local.git.checkout("-B", branch_name)
+        async with self.base_branch_lock:
+            base_commit = await self._locked_pr_base_commit()
 
-        # Apply series
         patch_content = await series.get_patch_binary_content()
-        with temporary_patch_file(patch_content) as tmp_patch_file:
-            try:
-                # pyrefly: ignore  # missing-attribute
-                self.repo_local.git.am("--3way", istream=tmp_patch_file)
-            except git.exc.GitCommandError as e:
-                logger.warning(
-                    f"Failed complete 3-way merge series {series.id} patch into {branch_name} branch: {e}"
-                )
-                # pyrefly: ignore  # missing-attribute
-                conflict = self.repo_local.git.diff()
-                return (False, e, conflict)
+        cache_key = ApplyResultCache.key(
+            base_commit, hashlib.sha256(patch_content).hexdigest()
+        )
+        cached = self.apply_cache.get(cache_key)
+        if cached is not None and "head" not in cached:
+            return (False, Exception(cached["error"]), cached["conflict"])
+        # The commit may be gone if the repository got cloned again.
+        if (
+            cached is not None
+            and await _async_ref_sha(repo, f"{cached['head']}^{{commit}}") is not None
+        ):
+            await _move_branch(repo, branch_name, cached["head"])
+            return (True, None, None)
+
+        # Apply series, without a checkout if it applies cleanly.
+        head = await _apply_mbox_to_index(repo, base_commit, patch_content)
+        if head is not None:
+            await _move_branch(repo, branch_name, head)
+            self.apply_cache.put(cache_key, {"head": head})
+            return (True, None, None)
+
+        git_ = AsyncGit.for_repo(repo)
+        checkout_commit = await self._checkout_pr_base(repo, branch_name)
+        if checkout_commit != base_commit:
+            cache_key = ApplyResultCache.key(
+                checkout_commit, hashlib.sha256(patch_content).hexdigest()
+            )
+        try:
+            await git_.run("am", "--3way", stdin=patch_content)
+        except git.exc.GitCommandError as e:
+            logger.warning(
+                f"Failed complete 3-way merge series {series.id} patch into {branch_name} branch: {e}"
+            )
+            conflict = await git_.run("diff")
+            self.apply_cache.put(cache_key, {"error": str(e), "conflict": conflict})
+            return (False, e, conflict)
+        self.apply_cache.put(cache_key, {"head": await git_.run("rev-parse", "HEAD")})
         return (True, None, None)
 
     async def apply_push_comment(
         self, branch_name: str, series: Series
+    ) -> Optional[PullRequest]:
+        async with self.worktrees.lease() as repo:
+            return await self._apply_push_comment(repo, branch_name, series)
+
+    async def _apply_push_comment(
+        self, repo: git.Repo, branch_name: str, series: Series
     ) -> Optional[PullRequest]:
         comment = (
             f"Upstream branch: {self.upstream_sha}\nseries: {series.web_url}\n"
             f"version: {series.version}\n"
         )
-        success, e, conflict = await self.try_apply_mailbox_series(branch_name, series)
+        success, e, conflict = await self._try_apply_mailbox_series(
+            repo, branch_name, series
+        )
         if not success:
             # The upstream git repo could have raced with patchwork.
             #
             # In other words, patchwork could be reporting a relevant
             # status (ie. !accepted) while the series has already been
             # merged and pushed.
-            assert self.repo_local is not None
             if await _series_already_applied(
-                self.repo_local,
+                repo,
                 series,
                 f"{UPSTREAM_REMOTE_NAME}/{self.upstream_branch}",
             ):
@@ -1146,14 +1627,14 @@ class BranchWorker(GithubConnector):
                 branch_name=branch_name,
                 has_merge_conflict=True,
                 can_create=True,
+                repo=repo,
             )
         # force push only if if's a new branch or there is code or metadata diffs between old and new branches
         # which could mean that we applied new set of patches or just rebased
         if branch_name in self.branches and (
             branch_name not in self.all_prs  # NO PR yet
-            or _is_branch_changed(
-                # pyrefly: ignore  # bad-argument-type
-                self.repo_local,
+            or await _is_branch_changed(
+                repo,
                 f"remotes/origin/{self.repo_pr_base_branch}",
                 f"remotes/origin/{branch_name}",
                 branch_name,
@@ -1166,42 +1647,44 @@ class BranchWorker(GithubConnector):
                 message=comment,
                 branch_name=branch_name,
                 can_create=True,
+                repo=repo,
             )
             assert pr
-            # pyrefly: ignore  # missing-attribute
-            self.repo_local.git.push("--force", "origin", branch_name)
+            await AsyncGit.for_repo(repo).run("push", "--force", "origin", branch_name)
+            self._pr_changed(pr)
 
             # Metadata inside `pr` may be stale from the force push; refresh it
-            pr.update()
-            # pyrefly: ignore  # missing-attribute
-            wanted_sha = self.repo_local.head.commit.hexsha
+            await self.async_github.update_pr(pr)
+            wanted_sha = await AsyncGit.for_repo(repo).run("rev-parse", branch_name)
             for _ in range(30):
                 if pr.head.sha == wanted_sha:
                     break
                 logger.info(f"Waiting for {pr} sha={pr.head.sha} to go to {wanted_sha}")
                 await asyncio.sleep(1)
-                pr.update()
+                await self.async_github.update_pr(pr)
             else:
                 raise RuntimeError("Github failed to update PR after force push")
 
             return pr
         # we don't have a branch, also means no PR, push first then create PR
         elif branch_name not in self.branches:
-            # pyrefly: ignore  # missing-attribute
-            if not self.repo_local.git.diff(self.repo_pr_base_branch, branch_name):
+            git_ = AsyncGit.for_repo(repo)
+            if not await git_.run("diff", self.repo_pr_base_branch, branch_name):
                 # raise an exception so it bubbles up to the caller.
                 raise NewPRWithNoChangeException(self.repo_pr_base_branch, branch_name)
-            # pyrefly: ignore  # missing-attribute
-            self.repo_local.git.push("--force", "origin", branch_name)
+            await git_.run("push", "--force", "origin", branch_name)
             return await self._comment_series_pr(
                 series,
                 message=comment,
                 branch_name=branch_name,
                 can_create=True,
+                repo=repo,
             )
         else:
             # no code changes, just update labels
-            return await self._comment_series_pr(series, branch_name=branch_name)
+            return await self._comment_series_pr(
+                series, branch_name=branch_name, repo=repo
+            )
 
     async def checkout_and_patch(
         self, branch_name: str, series_to_apply: Series
@@ -1223,7 +1706,10 @@ class BranchWorker(GithubConnector):
         logger.info(f"Found/tracking PR {pr.title=}, {pr.head.ref=}, {pr.base.ref=}")
 
     def get_pulls(self) -> None:
+        # The worker outlives a single sync cycle, so start from a clean slate
+        # rather than accumulating PRs that have since been closed.
         self.prs = {}
+        self.all_prs = {}
         for pr in self.repo.get_pulls(state="open", base=self.repo_pr_base_branch):
             if self._is_relevant_pr(pr):
                 self.prs[pr.title] = pr
@@ -1231,6 +1717,43 @@ class BranchWorker(GithubConnector):
             # This check is probably redundant given that we are filtering for open PRs only already.
             if pr.state == "open":
                 self.add_pr(pr)
+        self._load_pr_snapshots()
+
+    def _load_pr_snapshots(self) -> None:
+        """
+        Fetch the labels, head and check suites of all open PRs in bulk, so
+        that they need not be fetched PR by PR.
+        """
+        try:
+            self.pr_snapshots = fetch_open_pr_snapshots(
+                self.repo.requester,
+                self.repo.owner.login,
+                self.repo.name,
+                self.repo_pr_base_branch,
+            )
+        except Exception:
+            # Snapshots only save requests: do without them.
+            logger.exception("Failed to fetch snapshots of open PRs")
+            self.pr_snapshots = {}
+        self.synced_checks = {
+            number: synced
+            for number, synced in self.synced_checks.items()
+            if number in self.pr_snapshots
+        }
+
+    def pr_has_label(self, pr: PullRequest, label: str) -> bool:
+        snapshot = self.pr_snapshots.get(pr.number)
+        if snapshot is not None and (
+            label in snapshot.labels or not snapshot.labels_truncated
+        ):
+            return label in snapshot.labels
+        return pr_has_label(pr, label)
+
+    def _pr_changed(self, pr: PullRequest) -> None:
+        """
+        Forget the snapshot of `pr`, after changing it.
+        """
+        self.pr_snapshots.pop(pr.number, None)
 
     def _is_relevant_pr(self, pr: PullRequest) -> bool:
         """
@@ -1255,29 +1778,57 @@ class BranchWorker(GithubConnector):
             return True
         return False
 
-    def closed_prs(self) -> List[Any]:
+    def refresh_closed_prs(self) -> None:
+        """
+        Update the index of closed PRs with the PRs updated since it was last
+        refreshed. The first refresh lists all of them.
+        """
         # GH api is not working: https://github.community/t/is-api-head-filter-even-working/135530
-        # so i have to implement local cache
-        # and local search
-        # closed prs are last resort to re-open expired PRs
-        # and also required for branch expiration
-        if not self._closed_prs:
-            # pyrefly: ignore  # bad-assignment
-            self._closed_prs = list(
-                self.repo.get_pulls(state="closed", base=self.repo_pr_base_branch)
-            )
-        # pyrefly: ignore  # bad-return
-        return self._closed_prs
+        # so the PRs of a head are looked up in a local index.
+        since = self.closed_prs_synced_at
+        self._closed_pr_objects = {}
+        for pr in self.repo.get_pulls(
+            state="closed",
+            base=self.repo_pr_base_branch,
+            sort="updated",
+            direction="desc",
+        ):
+            updated_at = pr.updated_at.timestamp()
+            if since is not None and updated_at < since - CLOSED_PRS_SINCE_MARGIN:
+                break
+            self._closed_pr_objects[pr.number] = pr
+            known = self.closed_pr_index.get(pr.head.ref)
+            if known is None or known[1] <= updated_at:
+                self.closed_pr_index[pr.head.ref] = (pr.number, updated_at)
+            if self.closed_prs_synced_at is None or (
+                updated_at > self.closed_prs_synced_at
+            ):
+                self.closed_prs_synced_at = updated_at
+        self._closed_prs_refreshed = True
+
+    def _closed_pr_entry(self, head: str) -> Optional[Tuple[int, float]]:
+        if not self._closed_prs_refreshed:
+            self.refresh_closed_prs()
+        return self.closed_pr_index.get(head)
+
+    def closed_pr_updated_at(self, head: str) -> Optional[float]:
+        """
+        Update timestamp of the most recently updated closed PR of `head`.
+        """
+        entry = self._closed_pr_entry(head)
+        return entry[1] if entry else None
 
     def filter_closed_pr(self, head: str) -> Optional[PullRequest]:
-        # this assumes only the most recent one closed PR per head
-        res = None
-        for pr in self.closed_prs():
-            if pr.head.ref == head and (
-                not res or res.updated_at.timestamp() < pr.updated_at.timestamp()
-            ):
-                res = pr
-        return res
+        """
+        The most recently updated closed PR of `head`.
+        """
+        entry = self._closed_pr_entry(head)
+        if entry is None:
+            return None
+        number = entry[0]
+        if number not in self._closed_pr_objects:
+            self._closed_pr_objects[number] = self.repo.get_pull(number)
+        return self._closed_pr_objects[number]
 
     async def subject_to_branch(self, subject: Subject) -> str:
         subj_branch = await subject.branch()
@@ -1321,12 +1872,36 @@ class BranchWorker(GithubConnector):
         return job.html_url
 
     async def sync_checks(self, pr: PullRequest, series: Series) -> None:
+        """
+        Report the CI status of `pr` to patchwork, unless neither `series`
+        nor the snapshot of `pr` changed since it was last reported.
+        """
+        snapshot = self.pr_snapshots.get(pr.number)
+        # The snapshot is stale if the branch was pushed since it was taken,
+        # and incomplete if checks did not fit in it.
+        if (
+            snapshot is not None
+            and snapshot.head_sha == pr.head.sha
+            and not snapshot.checks_truncated
+        ):
+            synced = (series.id, snapshot)
+            if self.synced_checks.get(pr.number) == synced:
+                logger.info(f"Checks of {pr} did not change, skipping sync")
+                return
+        else:
+            synced = None
+
+        await self._sync_checks(pr, series)
+        if synced is not None:
+            self.synced_checks[pr.number] = synced
+
+    async def _sync_checks(self, pr: PullRequest, series: Series) -> None:
         # Make sure that we are working with up-to-date data (as opposed to
         # cached state).
-        pr.update()
+        await self.async_github.update_pr(pr)
         # if it's merge conflict - report failure
         ctx_prefix = slugify_check_context(f"{self.repo_branch}")
-        if pr_has_label(pr, MERGE_CONFLICT_LABEL):
+        if self.pr_has_label(pr, MERGE_CONFLICT_LABEL):
             await series.set_check(
                 status=Status.CONFLICT,
                 target_url=pr.html_url,
@@ -1349,14 +1924,16 @@ class BranchWorker(GithubConnector):
         # Note that we are interested in listing *all* runs and not just, say,
         # completed ones. The reason being that the information that pending
         # ones are present is very much relevant for status reporting.
-        for run in self.repo.get_workflow_runs(
-            # pyrefly: ignore  # bad-argument-type
-            actor=self.user_login,
-            head_sha=pr.head.sha,
-        ):
+        runs = await self.async_github.get_workflow_runs(
+            self.repo, actor=self.user_login, head_sha=pr.head.sha
+        )
+        # Jobs of all the runs are listed concurrently.
+        runs_jobs = await asyncio.gather(
+            *(self.async_github.get_run_jobs(run) for run in runs)
+        )
+        for run, run_jobs in zip(runs, runs_jobs):
             status = gh_conclusion_to_status(run.conclusion)
             run_metadata[run.id] = run.name
-            run_jobs = run.jobs()
 
             # Overall run failure could have many reasons, including
             # infrastructure issues or an in-progress rebase. Make an attempt at
@@ -1397,7 +1974,11 @@ class BranchWorker(GithubConnector):
             and gh_conclusion_to_status(job.conclusion) == Status.FAILURE
             for job in jobs
         )
-        pr_comments = list(pr.get_issue_comments()) if has_ai_review_failures else []
+        pr_comments = (
+            await self.async_github.get_issue_comments(pr)
+            if has_ai_review_failures
+            else []
+        )
         jobs_logs = [
             f"{job.conclusion} -> {gh_conclusion_to_status(job.conclusion)} ({job.html_url})"
             for job in jobs
@@ -1447,7 +2028,8 @@ class BranchWorker(GithubConnector):
             new_label = StatusLabelSuffixes.FAIL.to_label(series.version)
             not_label = StatusLabelSuffixes.PASS.to_label(series.version)
 
-        pr.update()  # make sure we are looking at the up to date labels
+        # make sure we are looking at the up to date labels
+        await self.async_github.update_pr(pr)
         labels = {label.name for label in pr.labels}
         # Always make sure to remove the unused label so that we eventually
         # converge on having only one pass/fail label for each version, come
@@ -1458,6 +2040,7 @@ class BranchWorker(GithubConnector):
                 f"is now {new_label}; removing {not_label} label"
             )
             pr.remove_from_labels(not_label)
+            self._pr_changed(pr)
 
         if new_label not in labels:
             # Either this is the first run we had for this patch version (no
@@ -1465,6 +2048,7 @@ class BranchWorker(GithubConnector):
             # way, send an email notifying the submitter.
             logger.info(f"{pr} is now {new_label}; adding label")
             pr.add_to_labels(new_label)
+            self._pr_changed(pr)
 
             logger.info(f"Sending email notification for {pr}")
             failed_logs = await self.log_extractor.extract_failed_logs(jobs)
@@ -1489,12 +2073,8 @@ class BranchWorker(GithubConnector):
                     # which have our repo_branch as target
                     # that doesn't have any closed PRs
                     # with last update within defined TTL
-                    pr = self.filter_closed_pr(branch)
-                    if (
-                        not pr
-                        or not pr.updated_at
-                        or time.time() - pr.updated_at.timestamp() > BRANCH_TTL
-                    ):
+                    updated_at = self.closed_pr_updated_at(branch)
+                    if updated_at is None or time.time() - updated_at > BRANCH_TTL:
                         self.delete_branch(branch)
 
     def expire_user_prs(self) -> None:
@@ -1570,7 +2150,7 @@ class BranchWorker(GithubConnector):
         if not cfg.enabled:
             return
 
-        comments = pr.get_issue_comments()
+        comments = await self.async_github.get_issue_comments(pr)
 
         # Look for comments indicating what has already been forwarded
         # to filter them out
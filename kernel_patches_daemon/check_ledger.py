@@ -0,0 +1,101 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+# pyre-unsafe
+
+import logging
+import sqlite3
+import time
+from typing import Optional, Tuple
+
+from kernel_patches_daemon.sqlite_db import LazySqliteDb
+
+logger: logging.Logger = logging.getLogger(__name__)
+
+# Entries older than this are ignored, so that checks get compared against
+# patchwork again every now and then, catching checks edited by others.
+DEFAULT_RECONCILE_INTERVAL_SEC = 6 * 3600
+# Entries not refreshed for this long are deleted.
+LEDGER_RETENTION_SEC = 30 * 24 * 3600
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS checks (
+    patch_id INTEGER NOT NULL,
+    context TEXT NOT NULL,
+    state TEXT NOT NULL,
+    target_url TEXT,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (patch_id, context)
+)
+"""
+
+
+def _init_db(db: sqlite3.Connection) -> None:
+    db.execute(SCHEMA)
+    db.execute(
+        "DELETE FROM checks WHERE updated_at < ?",
+        (time.time() - LEDGER_RETENTION_SEC,),
+    )
+    db.commit()
+
+
+class CheckLedger:
+    """
+    The state and target URL of the check last known to patchwork for each
+    patch and (lowercased) context, stored as SQLite at `path` so that it
+    survives restarts.
+
+    Entries are only trusted for `reconcile_interval` seconds. The ledger is
+    an optimization: rather than failing, it does nothing while the database
+    cannot be opened (see `LazySqliteDb`).
+    """
+
+    def __init__(
+        self, path: str, reconcile_interval: float = DEFAULT_RECONCILE_INTERVAL_SEC
+    ) -> None:
+        self.path = path
+        self.reconcile_interval = reconcile_interval
+        self._db = LazySqliteDb(path, _init_db, "check ledger")
+
+    def _connect(self) -> Optional[sqlite3.Connection]:
+        return self._db.connect()
+
+    def get(self, patch_id: int, context: str) -> Optional[Tuple[str, Optional[str]]]:
+        """
+        The (state, target_url) recorded for the check, unless it is older
+        than the reconciliation interval.
+        """
+        db = self._connect()
+        if db is None:
+            return None
+        try:
+            row = db.execute(
+                "SELECT state, target_url FROM checks "
+                "WHERE patch_id = ? AND context = ? AND updated_at >= ?",
+                (patch_id, context, time.time() - self.reconcile_interval),
+            ).fetchone()
+        except sqlite3.Error:
+            logger.exception(f"Failed to read check ledger {self.path}")
+            return None
+        return None if row is None else (row[0], row[1])
+
+    def record(
+        self, patch_id: int, context: str, state: str, target_url: Optional[str]
+    ) -> None:
+        db = self._connect()
+        if db is None:
+            return
+        try:
+            db.execute(
+                "INSERT OR REPLACE INTO checks VALUES (?, ?, ?, ?, ?)",
+                (patch_id, context, state, target_url, time.time()),
+            )
+            db.commit()
+        except sqlite3.Error:
+            logger.exception(f"Failed to write check ledger {self.path}")
+
+    def close(self) -> None:
+        self._db.close()
@@ -10,13 +10,19 @@ import json
 import logging
 import os
 import re
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from typing import Dict, List, Optional
 
 logger = logging.getLogger(__name__)
 
 SERIES_TARGET_SEPARATOR = "=>"
 SERIES_ID_SEPARATOR = "/"
+DEFAULT_MAX_CONCURRENT_SUBJECTS = 1
+DEFAULT_WORKTREE_POOL_SIZE = 0
+DEFAULT_PW_MAX_CONNECTIONS = 32
+DEFAULT_PW_MAX_CONNECTIONS_PER_HOST = 8
+DEFAULT_PW_KEEPALIVE_TIMEOUT = 30.0
+DEFAULT_PW_MAX_BACKOFF = 120.0
 
 
 class UnsupportedConfigVersion(ValueError):
@@ -184,9 +190,31 @@ class PatchworksConfig:
     lookback: int
     user: Optional[str]
     token: Optional[str]
+    # Requests in flight to patchwork, overall and per host. Further requests
+    # wait for a connection to be available.
+    max_connections: int = DEFAULT_PW_MAX_CONNECTIONS
+    max_connections_per_host: int = DEFAULT_PW_MAX_CONNECTIONS_PER_HOST
+    # How long idle connections are kept open, in seconds.
+    keepalive_timeout: float = DEFAULT_PW_KEEPALIVE_TIMEOUT
+    # Longest pause of the requests when patchwork throttles them, in seconds.
+    max_backoff: float = DEFAULT_PW_MAX_BACKOFF
 
     @classmethod
     def from_json(cls, json: Dict) -> "PatchworksConfig":
+        limits = {}
+        for name, default, kind in (
+            ("max_connections", DEFAULT_PW_MAX_CONNECTIONS, int),
+            ("max_connections_per_host", DEFAULT_PW_MAX_CONNECTIONS_PER_HOST, int),
+            ("keepalive_timeout", DEFAULT_PW_KEEPALIVE_TIMEOUT, (int, float)),
+            ("max_backoff", DEFAULT_PW_MAX_BACKOFF, (int, float)),
+        ):
+            value = json.get(name, default)
+            if isinstance(value, bool) or not isinstance(value, kind) or value <= 0:
+                raise InvalidConfig(
+                    f"`patchwork.{name}` must be a positive number, got {value}"
+                )
+            limits[name] = value
+
         return cls(
             base_url=json["server"],
             project=json["project"],
@@ -194,6 +222,50 @@ class PatchworksConfig:
             lookback=json["lookback"],
             user=json.get("api_username", None),
             token=json.get("api_token", None),
+            **limits,
+        )
+
+
+@dataclass
+class CloneConfig:
+    # Partial clone filter, e.g. "blob:none". Missing objects are downloaded
+    # on demand.
+    filter: Optional[str] = None
+    # Only keep this many commits of history.
+    depth: Optional[int] = None
+    # Only keep the history more recent than this date, e.g. "3 months ago".
+    shallow_since: Optional[str] = None
+    # Only clone the branch being synced.
+    single_branch: bool = False
+
+    @property
+    def is_shallow(self) -> bool:
+        return self.depth is not None or self.shallow_since is not None
+
+    @property
+    def is_full(self) -> bool:
+        return not (self.filter or self.is_shallow or self.single_branch)
+
+    @classmethod
+    def from_json(cls, json: Dict) -> "CloneConfig":
+        depth = json.get("depth")
+        if depth is not None and (
+            isinstance(depth, bool) or not isinstance(depth, int) or depth < 1
+        ):
+            raise InvalidConfig(
+                f"`clone.depth` must be a positive integer, got {depth}"
+            )
+        shallow_since = json.get("shallow_since")
+        if depth is not None and shallow_since is not None:
+            raise InvalidConfig(
+                "`clone.depth` and `clone.shallow_since` are mutually exclusive"
+            )
+
+        return cls(
+            filter=json.get("filter"),
+            depth=depth,
+            shallow_since=shallow_since,
+            single_branch=json.get("single_branch", False),
         )
 
 
@@ -205,6 +277,13 @@ class KPDConfig:
     branches: Dict[str, BranchConfig]
     tag_to_branch_mapping: Dict[str, List[str]]
     base_directory: str
+    # Number of subjects synced concurrently in a single cycle.
+    max_concurrent_subjects: int = DEFAULT_MAX_CONCURRENT_SUBJECTS
+    # Number of git worktrees per branch in which series get applied. With 0,
+    # series are applied one at a time in the branch's main checkout.
+    worktree_pool_size: int = DEFAULT_WORKTREE_POOL_SIZE
+    # How repositories get cloned. Defaults to a full clone.
+    clone: CloneConfig = field(default_factory=CloneConfig)
 
     @classmethod
     def from_json(cls, json: Dict) -> "KPDConfig":
@@ -227,6 +306,28 @@ class KPDConfig:
                         f"Branch *{branch}* in `tag_to_branch_mapping` is not defined in `branches`"
                     )
 
+        max_concurrent_subjects = json.get(
+            "max_concurrent_subjects", DEFAULT_MAX_CONCURRENT_SUBJECTS
+        )
+        if (
+            isinstance(max_concurrent_subjects, bool)
+            or not isinstance(max_concurrent_subjects, int)
+            or max_concurrent_subjects < 1
+        ):
+            raise InvalidConfig(
+                f"`max_concurrent_subjects` must be a positive integer, got {max_concurrent_subjects}"
+            )
+
+        worktree_pool_size = json.get("worktree_pool_size", DEFAULT_WORKTREE_POOL_SIZE)
+        if (
+            isinstance(worktree_pool_size, bool)
+            or not isinstance(worktree_pool_size, int)
+            or worktree_pool_size < 0
+        ):
+            raise InvalidConfig(
+                f"`worktree_pool_size` must be a non-negative integer, got {worktree_pool_size}"
+            )
+
         return cls(
             version=3,
             tag_to_branch_mapping=tag_to_branch_mapping,
@@ -237,6 +338,9 @@ class KPDConfig:
                 for name, json_config in json["branches"].items()
             },
             base_directory=json["base_directory"],
+            max_concurrent_subjects=max_concurrent_subjects,
+            worktree_pool_size=worktree_pool_size,
+            clone=CloneConfig.from_json(json.get("clone", {})),
         )
 
     @classmethod
@@ -42,19 +42,6 @@ class KernelPatchesWorker:
             kpd_config=self.kpd_config, labels_cfg=self.labels_cfg
         )
 
-    def reset_github_sync(self) -> bool:
-        try:
-            self.github_sync_worker = GithubSync(
-                kpd_config=self.kpd_config, labels_cfg=self.labels_cfg
-            )
-            return True
-        except Exception:
-            logger.exception(
-                "Unhandled exception while creating GithubSync object",
-                exc_info=True,
-            )
-            return False
-
     async def submit_metrics(self) -> None:
         if self.metrics_logger is None:
             # Metrics are intentionally disabled (see __init__); nothing to do.
@@ -68,13 +55,9 @@ class KernelPatchesWorker:
             )
 
     async def run(self) -> None:
+        # The same GithubSync instance is reused across iterations; it keeps
+        # its connections and caches and rebuilds failed branch workers itself.
         while True:
-            ok = self.reset_github_sync()
-            if not ok:
-                logger.error(
-                    "Most likely something went wrong connecting to GitHub or Patchwork. Skipping this iteration without submitting metrics."
-                )
-                continue
             try:
                 await self.github_sync_worker.sync_patches()
                 self.github_sync_worker.increment_counter("runs_successful")
@@ -0,0 +1,125 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+# pyre-unsafe
+
+import logging
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+from github.Requester import Requester
+
+logger: logging.Logger = logging.getLogger(__name__)
+
+DEFAULT_GITHUB_CACHE_SIZE = 512
+
+# (status, headers, body), as returned by `Requester.__requestRaw`.
+RawResponse = Tuple[int, Dict[str, Any], Any]
+
+
+class ConditionalRequestCache:
+    """
+    Cache of GitHub REST responses, used to turn repeated GETs of the same
+    resource into conditional requests.
+
+    Responses carrying an ETag or a Last-Modified header are kept, and sent
+    back as If-None-Match/If-Modified-Since the next time the same URL is
+    requested. GitHub then answers 304 Not Modified if the resource did not
+    change, which does not count against the rate limit, and the cached
+    response is handed to PyGithub in place of the empty 304 one.
+
+    At most `size` responses are kept, evicting the least recently used ones.
+    """
+
+    def __init__(self, size: int = DEFAULT_GITHUB_CACHE_SIZE) -> None:
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        # (URL, Accept header) -> response. Dicts keep insertion order, which
+        # is used to track the least recently used entries.
+        self._entries: Dict[Tuple[str, Optional[str]], RawResponse] = {}
+        # PyGithub calls are issued from several threads.
+        self._lock = threading.Lock()
+
+    def _get(self, key: Tuple[str, Optional[str]]) -> Optional[RawResponse]:
+        with self._lock:
+            response = self._entries.pop(key, None)
+            if response is not None:
+                self._entries[key] = response
+            return response
+
+    def _put(self, key: Tuple[str, Optional[str]], response: RawResponse) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = response
+            while len(self._entries) > self.size:
+                del self._entries[next(iter(self._entries))]
+
+    def install(self, requester: Requester) -> None:
+        """
+        Make `requester` go through the cache for all its GET requests.
+        """
+        # There is no public hook between PyGithub and the HTTP connection:
+        # wrap the (name-mangled) method all requests go through.
+        request_raw = requester._Requester__requestRaw
+
+        def cached_request_raw(
+            cnx: Any,
+            verb: str,
+            url: str,
+            requestHeaders: Dict[str, str],
+            input: Any,
+            stream: bool = False,
+            follow_302_redirect: bool = False,
+        ) -> RawResponse:
+            if verb != "GET" or stream:
+                return request_raw(
+                    cnx,
+                    verb,
+                    url,
+                    requestHeaders,
+                    input,
+                    stream=stream,
+                    follow_302_redirect=follow_302_redirect,
+                )
+
+            key = (url, requestHeaders.get("Accept"))
+            cached = self._get(key)
+            if cached is not None:
+                _, cached_headers, _ = cached
+                requestHeaders = dict(requestHeaders)
+                if "etag" in cached_headers:
+                    requestHeaders["If-None-Match"] = cached_headers["etag"]
+                else:
+                    requestHeaders["If-Modified-Since"] = cached_headers[
+                        "last-modified"
+                    ]
+
+            status, headers, output = request_raw(
+                cnx,
+                verb,
+                url,
+                requestHeaders,
+                input,
+                stream=stream,
+                follow_302_redirect=follow_302_redirect,
+            )
+            if status == 304 and cached is not None:
+                self.hits += 1
+                cached_status, cached_headers, cached_output = cached
+                # Keep the fresh rate limit headers.
+                return cached_status, {**cached_headers, **headers}, cached_output
+
+            self.misses += 1
+            if (
+                status == 200
+                and isinstance(output, str)
+                and ("etag" in headers or "last-modified" in headers)
+            ):
+                self._put(key, (status, headers, output))
+            return status, headers, output
+
+        requester._Requester__requestRaw = cached_request_raw
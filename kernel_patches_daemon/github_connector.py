@@ -14,6 +14,8 @@ from typing import Optional
 from urllib.parse import urlparse
 
 from github import Auth, Github, GithubException, GithubIntegration
+from kernel_patches_daemon.async_github import AsyncGithub
+from kernel_patches_daemon.github_cache import ConditionalRequestCache
 from pyre_extensions import none_throws
 
 logger: logging.Logger = logging.getLogger(__name__)
@@ -64,6 +66,7 @@ class GithubConnector:
         github_oauth_token: Optional[str] = None,
         app_auth: Optional[Auth.AppInstallationAuth] = None,
         http_retries: Optional[int] = None,
+        async_github: Optional[AsyncGithub] = None,
     ) -> None:
         assert bool(github_oauth_token) ^ bool(
             app_auth
@@ -82,6 +85,16 @@ class GithubConnector:
             auth=auth,
             retry=http_retries,
         )
+        # Most of what is polled every cycle does not change: make polling
+        # cheap with conditional requests.
+        self.github_cache = ConditionalRequestCache()
+        # pyre-fixme[16]: `github.MainClass.Github` has no attribute `__requester`.
+        # pyrefly: ignore  # missing-attribute
+        self.github_cache.install(self.git._Github__requester)
+        # For calls made from coroutines. It may be shared with other
+        # connectors, in which case its owner closes it.
+        self._owns_async_github: bool = async_github is None
+        self.async_github: AsyncGithub = async_github or AsyncGithub()
         gh_user = self.git.get_user()
         if app_auth is None:
             self.auth_type = AuthType.OAUTH_TOKEN
@@ -175,3 +188,10 @@ class GithubConnector:
             return self.__get_repo_url_with_auth_token()
 
         return self.base_repo_url
+
+    def close(self) -> None:
+        """
+        Release the threads of the connector's own AsyncGithub.
+        """
+        if self._owns_async_github:
+            self.async_github.close()
@@ -0,0 +1,133 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+# pyre-unsafe
+
+import logging
+from dataclasses import dataclass
+from typing import Any, Dict, FrozenSet, Optional, Tuple
+
+from github.Requester import Requester
+
+logger: logging.Logger = logging.getLogger(__name__)
+
+# Page sizes are kept small enough for the nested connections to stay well
+# below GitHub's limit of 500,000 nodes per query. Nested connections are not
+# paginated: snapshots record whether they got truncated instead.
+OPEN_PRS_QUERY = """
+query($owner: String!, $name: String!, $base: String!, $cursor: String) {
+  repository(owner: $owner, name: $name) {
+    pullRequests(states: OPEN, baseRefName: $base, first: 50, after: $cursor) {
+      pageInfo { hasNextPage endCursor }
+      nodes {
+        number
+        state
+        headRefOid
+        labels(first: 100) {
+          pageInfo { hasNextPage }
+          nodes { name }
+        }
+        comments(last: 1) { nodes { databaseId } }
+        commits(last: 1) {
+          nodes {
+            commit {
+              checkSuites(first: 20) {
+                pageInfo { hasNextPage }
+                nodes {
+                  databaseId
+                  status
+                  conclusion
+                  checkRuns(first: 50) {
+                    pageInfo { hasNextPage }
+                    nodes { databaseId status conclusion }
+                  }
+                }
+              }
+            }
+          }
+        }
+      }
+    }
+  }
+}
+"""
+
+# (id, status, conclusion) of a check suite or run.
+CheckState = Tuple[Optional[int], Optional[str], Optional[str]]
+
+
+@dataclass(frozen=True)
+class PullRequestSnapshot:
+    """
+    The state of a pull request relevant to syncing its checks, as returned by
+    a single GraphQL query.
+    """
+
+    number: int
+    state: str
+    head_sha: str
+    labels: FrozenSet[str]
+    last_comment_id: Optional[int]
+    # Suites and runs of the head commit, in the order GitHub returns them.
+    check_suites: Tuple[Tuple[CheckState, Tuple[CheckState, ...]], ...]
+    # Whether PR labels, check suites or check runs were left out, past the
+    # page sizes of the query. Truncated parts cannot tell whether the PR
+    # changed.
+    labels_truncated: bool = False
+    checks_truncated: bool = False
+
+    @classmethod
+    def from_graphql(cls, node: Dict[str, Any]) -> "PullRequestSnapshot":
+        comments = node["comments"]["nodes"]
+        suites = []
+        checks_truncated = False
+        for commit in node["commits"]["nodes"]:
+            check_suites = commit["commit"]["checkSuites"]
+            checks_truncated |= check_suites["pageInfo"]["hasNextPage"]
+            for suite in check_suites["nodes"]:
+                checks_truncated |= suite["checkRuns"]["pageInfo"]["hasNextPage"]
+                runs = tuple(
+                    (run["databaseId"], run["status"], run["conclusion"])
+                    for run in suite["checkRuns"]["nodes"]
+                )
+                suites.append(
+                    (
+                        (suite["databaseId"], suite["status"], suite["conclusion"]),
+                        runs,
+                    )
+                )
+        return cls(
+            number=node["number"],
+            state=node["state"],
+            head_sha=node["headRefOid"],
+            labels=frozenset(label["name"] for label in node["labels"]["nodes"]),
+            last_comment_id=comments[-1]["databaseId"] if comments else None,
+            check_suites=tuple(suites),
+            labels_truncated=node["labels"]["pageInfo"]["hasNextPage"],
+            checks_truncated=checks_truncated,
+        )
+
+
+def fetch_open_pr_snapshots(
+    requester: Requester, owner: str, name: str, base: str
+) -> Dict[int, PullRequestSnapshot]:
+    """
+    Fetch the snapshots of all open pull requests against `base`, keyed by
+    PR number, in one query per page of PRs.
+    """
+    snapshots = {}
+    variables: Dict[str, Any] = {"owner": owner, "name": name, "base": base}
+    while True:
+        _, data = requester.graphql_query(OPEN_PRS_QUERY, dict(variables))
+        prs = data["data"]["repository"]["pullRequests"]
+        for node in prs["nodes"]:
+            snapshot = PullRequestSnapshot.from_graphql(node)
+            snapshots[snapshot.number] = snapshot
+        if not prs["pageInfo"]["hasNextPage"]:
+            break
+        variables["cursor"] = prs["pageInfo"]["endCursor"]
+    logger.info(f"Fetched snapshots of {len(snapshots)} open PRs against {base}")
+    return snapshots
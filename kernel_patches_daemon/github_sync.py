@@ -7,21 +7,25 @@
 # pyre-unsafe
 
 import asyncio
+import datetime
 import logging
+import os
 import time
-from typing import Dict, Final, List, Optional, Sequence
+from dataclasses import dataclass
+from typing import Dict, Final, List, Optional, Sequence, Tuple
 
 from github import Auth
 from github.PullRequest import PullRequest
+from kernel_patches_daemon.async_github import AsyncGithub
 from kernel_patches_daemon.branch_worker import (
     BranchWorker,
     MERGE_CONFLICT_LABEL,
     NewPRWithNoChangeException,
     parse_pr_ref,
     parsed_pr_ref_ok,
-    pr_has_label,
     prs_for_the_same_series,
 )
+from kernel_patches_daemon.check_ledger import CheckLedger
 from kernel_patches_daemon.config import BranchConfig, KPDConfig
 from kernel_patches_daemon.github_logs import (
     BpfGithubLogExtractor,
@@ -29,6 +33,8 @@ from kernel_patches_daemon.github_logs import (
     GithubLogExtractor,
 )
 from kernel_patches_daemon.patchwork import Patchwork, Series, Subject
+from kernel_patches_daemon.patchwork_events import DirtySet, PatchworkEventFeed
+from kernel_patches_daemon.state_store import BranchState, StateStore
 from kernel_patches_daemon.stats import HistogramMetricTimer, Stats
 from opentelemetry import metrics
 from pyre_extensions import none_throws
@@ -53,6 +59,35 @@ github_ratelimit_remaining: metrics.Histogram = meter.create_histogram(
 )
 
 DEFAULT_HTTP_RETRIES: Final[int] = 3
+CHECK_LEDGER_FILENAME: Final[str] = "pw_check_ledger.sqlite3"
+STATE_STORE_FILENAME: Final[str] = "kpd_state.sqlite3"
+
+
+@dataclass(frozen=True)
+class SyncedSubject:
+    """
+    What a subject was last synced with: its latest series, the branch its PR
+    targets and the bases (upstream and CI SHA-1s) of all the branches it was
+    mapped to.
+    """
+
+    series_id: int
+    branch: str
+    bases: Tuple[Tuple[str, Optional[str], Optional[str]], ...]
+
+
+def _monotonic_of(wall_time: float) -> float:
+    """
+    The `time.monotonic()` value of a `time.time()` one.
+    """
+    return time.monotonic() - (time.time() - wall_time)
+
+
+def _time_of(monotonic_time: float) -> float:
+    """
+    The `time.time()` value of a `time.monotonic()` one.
+    """
+    return time.time() - (time.monotonic() - monotonic_time)
 
 
 def github_app_auth_from_branch_config(
@@ -83,55 +118,187 @@ def _log_extractor_from_project(project: str) -> GithubLogExtractor:
 
 
 class GithubSync(Stats):
+    """
+    Long-lived sync engine. A single instance is kept across sync cycles so
+    that the Patchwork client (and its HTTP session) and the per-branch
+    BranchWorkers (and their GitHub connections) are reused. BranchWorkers
+    that fail to be created or refreshed are dropped and rebuilt on the
+    next cycle.
+    """
+
     def __init__(
         self,
         kpd_config: KPDConfig,
         labels_cfg: Dict[str, str],
         http_retries: int = DEFAULT_HTTP_RETRIES,
     ) -> None:
+        super().__init__(
+            {
+                "full_cycle_duration",  # Duration of one sync cycle
+                "mirror_duration",  # Duration of mirroring upstream
+                "pw_fetch_duration",  # Duration of initial search in PW, exclusing time to map existing PRs to PW entities
+                "patch_and_update_duration",  # Duration of git apply and git push
+                "prs_total",  # All prs within the scope of work for this worker
+                "empty_pr",  # Series that would result in an empty PR creation
+                "all_known_subjects",  # All known subjects from PW and GH, including expired patches
+                "runs_successful",  # Successful KernelPatchesWorker.run() iteration
+                "runs_failed",  # Failed KernelPatchesWorker.run() iteration
+                "worker_failures",  # BranchWorkers that failed to be created or refreshed
+            }
+        )
+        self.kpd_config = kpd_config
+        self.labels_cfg = labels_cfg
+        self.http_retries = http_retries
         self.pw = Patchwork(
             server=kpd_config.patchwork.base_url,
             search_patterns=kpd_config.patchwork.search_patterns,
             lookback_in_days=kpd_config.patchwork.lookback,
             auth_token=kpd_config.patchwork.token,
             http_retries=http_retries,
+            max_connections=kpd_config.patchwork.max_connections,
+            max_connections_per_host=kpd_config.patchwork.max_connections_per_host,
+            keepalive_timeout=kpd_config.patchwork.keepalive_timeout,
+            max_backoff=kpd_config.patchwork.max_backoff,
+            check_ledger=CheckLedger(
+                os.path.join(kpd_config.base_directory, CHECK_LEDGER_FILENAME)
+            ),
         )
         self.tag_to_branch_mapping = kpd_config.tag_to_branch_mapping
-        self.workers: Dict[str, BranchWorker] = {
-            branch: BranchWorker(
-                patchwork=self.pw,
-                labels_cfg=labels_cfg,
-                repo_branch=branch,
-                repo_url=branch_config.repo,
-                upstream_url=branch_config.upstream_repo,
-                upstream_branch=branch_config.upstream_branch,
-                ci_repo_url=branch_config.ci_repo,
-                ci_branch=branch_config.ci_branch,
-                log_extractor=_log_extractor_from_project(kpd_config.patchwork.project),
-                base_directory=kpd_config.base_directory,
-                http_retries=http_retries,
-                github_oauth_token=branch_config.github_oauth_token,
-                app_auth=github_app_auth_from_branch_config(branch_config),
-                email=kpd_config.email,
-            )
-            for branch, branch_config in kpd_config.branches.items()
-        }
+        self.max_concurrent_subjects = kpd_config.max_concurrent_subjects
+        # State saved at the end of each cycle, to start from after a restart.
+        self.state_store = StateStore(
+            os.path.join(kpd_config.base_directory, STATE_STORE_FILENAME)
+        )
+        # Bounds the GitHub calls made from coroutines by all the workers, and
+        # outlives them.
+        self.async_github = AsyncGithub()
+        self.workers: Dict[str, BranchWorker] = {}
+        self.rebuild_failed_workers()
 
         # member variable initializations
         self.subjects: Sequence[Subject] = []
-        super().__init__(
+        self.pw_events = PatchworkEventFeed(self.pw)
+        # Series and patches changed since the previous cycle, None if unknown.
+        self.dirty: Optional[DirtySet] = None
+        # Subject -> how it was last synced.
+        self.synced_subjects: Dict[str, SyncedSubject] = {}
+        self.load_state()
+
+    def load_state(self) -> None:
+        """
+        Start from the state saved by the previous run, if any. It gets
+        reconciled with patchwork and GitHub by the next cycle.
+        """
+        store = self.state_store
+        self.pw.series_index, self.pw.high_water_marks = store.load_series_index()
+        last_full_scan = store.get_value("pw_last_full_scan")
+        if last_full_scan is not None:
+            self.pw.last_full_scan = _monotonic_of(last_full_scan)
+
+        events_high_water_mark = store.get_value("pw_events_high_water_mark")
+        events_last_full_scan = store.get_value("pw_events_last_full_scan")
+        if events_high_water_mark is not None and events_last_full_scan is not None:
+            self.pw_events.high_water_mark = datetime.datetime.fromisoformat(
+                events_high_water_mark
+            )
+            self.pw_events.last_full_scan = _monotonic_of(events_last_full_scan)
+
+        self.synced_subjects = {
+            subject: SyncedSubject(*synced)
+            for subject, synced in store.load_subjects().items()
+        }
+
+    def save_state(self) -> None:
+        store = self.state_store
+        store.save_series_index(self.pw.series_index, self.pw.high_water_marks)
+        if self.pw.last_full_scan is not None:
+            store.set_value("pw_last_full_scan", _time_of(self.pw.last_full_scan))
+        if (
+            self.pw_events.high_water_mark is not None
+            and self.pw_events.last_full_scan is not None
+        ):
+            store.set_value(
+                "pw_events_high_water_mark",
+                self.pw_events.high_water_mark.isoformat(),
+            )
+            store.set_value(
+                "pw_events_last_full_scan", _time_of(self.pw_events.last_full_scan)
+            )
+        store.save_subjects(
             {
-                "full_cycle_duration",  # Duration of one sync cycle
-                "mirror_duration",  # Duration of mirroring upstream
-                "pw_fetch_duration",  # Duration of initial search in PW, exclusing time to map existing PRs to PW entities
-                "patch_and_update_duration",  # Duration of git apply and git push
-                "prs_total",  # All prs within the scope of work for this worker
-                "empty_pr",  # Series that would result in an empty PR creation
-                "all_known_subjects",  # All known subjects from PW and GH, including expired patches
-                "runs_successful",  # Successful KernelPatchesWorker.run() iteration
-                "runs_failed",  # Failed KernelPatchesWorker.run() iteration
+                subject: (synced.series_id, synced.branch, synced.bases)
+                for subject, synced in self.synced_subjects.items()
             }
         )
+        for branch, worker in self.workers.items():
+            store.save_branch_state(
+                branch,
+                BranchState(
+                    upstream_sha=worker.upstream_sha,
+                    e2e_synced_key=worker.e2e_synced_key,
+                    pr_base_commits=worker.pr_base_commits,
+                    closed_prs=worker.closed_pr_index,
+                    closed_prs_synced_at=worker.closed_prs_synced_at,
+                ),
+            )
+
+    def _create_worker(self, branch: str, branch_config: BranchConfig) -> BranchWorker:
+        return BranchWorker(
+            patchwork=self.pw,
+            labels_cfg=self.labels_cfg,
+            repo_branch=branch,
+            repo_url=branch_config.repo,
+            upstream_url=branch_config.upstream_repo,
+            upstream_branch=branch_config.upstream_branch,
+            ci_repo_url=branch_config.ci_repo,
+            ci_branch=branch_config.ci_branch,
+            log_extractor=_log_extractor_from_project(
+                self.kpd_config.patchwork.project
+            ),
+            base_directory=self.kpd_config.base_directory,
+            http_retries=self.http_retries,
+            github_oauth_token=branch_config.github_oauth_token,
+            app_auth=github_app_auth_from_branch_config(branch_config),
+            email=self.kpd_config.email,
+            worktree_pool_size=self.kpd_config.worktree_pool_size,
+            clone_config=self.kpd_config.clone,
+            async_github=self.async_github,
+        )
+
+    def rebuild_failed_workers(self) -> None:
+        """
+        (Re-)create BranchWorkers for all configured branches that do not have
+        a live worker, either because this is the first cycle or because the
+        worker failed during a previous one. Healthy workers are left alone.
+        """
+        for branch, branch_config in self.kpd_config.branches.items():
+            if branch in self.workers:
+                continue
+            try:
+                worker = self._create_worker(branch, branch_config)
+            except Exception:
+                self.increment_counter("worker_failures")
+                logger.exception(
+                    f"Failed to create BranchWorker for {branch}, will retry next cycle"
+                )
+                continue
+            state = self.state_store.load_branch_state(branch)
+            worker.upstream_sha = state.upstream_sha
+            worker.e2e_synced_key = state.e2e_synced_key
+            worker.pr_base_commits = state.pr_base_commits
+            worker.closed_pr_index = state.closed_prs
+            worker.closed_prs_synced_at = state.closed_prs_synced_at
+            self.workers[branch] = worker
+
+    def drop_worker(self, branch: str) -> None:
+        """
+        Forget about a failed BranchWorker so that it gets rebuilt on the next
+        cycle.
+        """
+        self.increment_counter("worker_failures")
+        worker = self.workers.pop(branch, None)
+        if worker is not None:
+            worker.close()
 
     async def get_mapped_branches(self, series: Series) -> List[str]:
         for tag in self.tag_to_branch_mapping:
@@ -209,7 +376,7 @@ class GithubSync(Stats):
             worker = self.workers[branch]
             subj_branch = await worker.subject_to_branch(subject)
             for pr in worker.prs.values():
-                if pr.head.ref == subj_branch and not pr_has_label(
+                if pr.head.ref == subj_branch and not worker.pr_has_label(
                     pr, MERGE_CONFLICT_LABEL
                 ):
                     subject_pr_targets.append(branch)
@@ -228,6 +395,10 @@ class GithubSync(Stats):
         4. Start from first branch, try to apply and generate PR,
            if fails continue to next branch, if no more branches, generate a merge-conflict PR
         """
+        # Dropped until the subject is synced again: the events that marked it
+        # dirty are already consumed, so a failure past this point must not
+        # leave it looking clean next cycle.
+        synced = self.synced_subjects.pop(subject.subject, None)
         series = none_throws(await subject.latest_series())
         tags = await series.all_tags()
         logging.info(f"Processing {series.id}: {subject.subject} (tags: {tags})")
@@ -239,6 +410,21 @@ class GithubSync(Stats):
             )
             return
 
+        missing_workers = [b for b in mapped_branches if b not in self.workers]
+        if missing_workers:
+            logging.warning(
+                f"Skipping {series.id}: {subject.subject} as workers for {missing_workers} are unavailable."
+            )
+            return
+
+        bases = tuple(
+            (b, self.workers[b].upstream_sha, self.workers[b].ci_sha)
+            for b in mapped_branches
+        )
+        if await self.sync_clean_subject(subject, series, bases, synced):
+            self.synced_subjects[subject.subject] = none_throws(synced)
+            return
+
         target_branches = await self.select_target_branches_for_subject(
             subject, mapped_branches
         )
@@ -270,10 +456,79 @@ class GithubSync(Stats):
             await worker.forward_pr_comments(pr, series)
             # Close out other PRs if exists
             self.close_existing_prs_for_series(list(self.workers.values()), pr)
+            self.synced_subjects[subject.subject] = SyncedSubject(
+                series.id, branch, bases
+            )
 
             break
         pass
 
+    async def sync_clean_subject(
+        self,
+        subject: Subject,
+        series: Series,
+        bases: Tuple[Tuple[str, Optional[str], Optional[str]], ...],
+        synced: Optional[SyncedSubject],
+    ) -> bool:
+        """
+        If neither the series of `subject` nor the bases of its branches
+        changed since it was last `synced`, only sync the checks and comments
+        of its PR, as nothing would change from applying it again.
+
+        Returns whether `subject` was synced.
+        """
+        if (
+            self.dirty is None
+            or synced is None
+            or synced != SyncedSubject(series.id, synced.branch, bases)
+            or self.dirty.is_dirty(series)
+        ):
+            return False
+
+        worker = self.workers[synced.branch]
+        pr = worker.prs.get(subject.subject)
+        if pr is None or pr.head.ref != await worker.subject_to_branch(subject):
+            return False
+
+        logging.info(f"Series {series.id}: {subject.subject} did not change")
+        await worker.sync_checks(pr, series)
+        await worker.forward_pr_comments(pr, series)
+        return True
+
+    async def sync_relevant_subjects(self, subjects: Sequence[Subject]) -> None:
+        """
+        Sync `subjects` concurrently, with at most `max_concurrent_subjects`
+        of them in flight at any time. Work that needs a git checkout waits
+        for one from the worker's WorktreePool, everything else (Patchwork and
+        GitHub requests) overlaps freely.
+
+        A failing subject does not interrupt the others, which could leave
+        their branches half-updated: every subject runs to completion, each
+        failure is logged, and the first one (in `subjects` order) is then
+        re-raised.
+        """
+        semaphore = asyncio.Semaphore(self.max_concurrent_subjects)
+
+        async def sync_bounded(subject: Subject) -> None:
+            async with semaphore:
+                await self.sync_relevant_subject(subject)
+
+        results = await asyncio.gather(
+            *[sync_bounded(subject) for subject in subjects], return_exceptions=True
+        )
+        failures = [
+            (subject, result)
+            for subject, result in zip(subjects, results)
+            if isinstance(result, BaseException)
+        ]
+        for subject, exc in failures:
+            logger.error(
+                f"Failed to sync subject {subject.subject}",
+                exc_info=exc,
+            )
+        if failures:
+            raise failures[0][1]
+
     async def sync_patches(self) -> None:
         """
         One subject = one branch
@@ -284,11 +539,17 @@ class GithubSync(Stats):
         as separate commit
         """
 
-        sync_workers = [
-            (branch, worker)
-            for (branch, worker) in self.workers.items()
-            if worker.can_do_sync()
-        ]
+        self.drop_counters()
+        self.rebuild_failed_workers()
+
+        sync_workers = []
+        for branch, worker in list(self.workers.items()):
+            try:
+                if worker.can_do_sync():
+                    sync_workers.append((branch, worker))
+            except Exception:
+                logger.exception(f"Failed to check rate limits for {branch}")
+                self.drop_worker(branch)
         if not sync_workers:
             # pyrefly: ignore  # deprecated
             logger.warn("No branch workers that can_do_sync(), skipping sync_patches()")
@@ -297,21 +558,34 @@ class GithubSync(Stats):
         # sync mirror and fetch current states of PRs
         loop = asyncio.get_event_loop()
 
-        self.drop_counters()
         sync_start = time.time()
 
+        refreshed_workers = []
         for branch, worker in sync_workers:
             logging.info(f"Refreshing repo info for {branch}.")
-            # pyrefly: ignore  # bad-argument-type
-            await loop.run_in_executor(None, worker.fetch_repo_branch)
-            # pyrefly: ignore  # bad-argument-type
-            await loop.run_in_executor(None, worker.get_pulls)
-            # pyrefly: ignore  # bad-argument-type
-            await loop.run_in_executor(None, worker.do_sync)
-            worker._closed_prs = None
-            branches = worker.repo.get_branches()
-            # pyrefly: ignore  # bad-assignment
-            worker.branches = [b.name for b in branches]
+            try:
+                # PRs and branches go first: they determine which refs get
+                # fetched.
+                # pyrefly: ignore  # bad-argument-type
+                await loop.run_in_executor(None, worker.get_pulls)
+                branches = await worker.async_github.get_branches(worker.repo)
+                # pyrefly: ignore  # bad-assignment
+                worker.branches = [b.name for b in branches]
+                # pyrefly: ignore  # bad-argument-type
+                await loop.run_in_executor(None, worker.fetch_repo_branch)
+                # pyrefly: ignore  # bad-argument-type
+                await loop.run_in_executor(None, worker.do_sync)
+                worker._closed_prs_refreshed = False
+                # Failures to apply series are retried once per cycle.
+                worker.apply_cache.forget_failures()
+            except Exception:
+                logger.exception(
+                    f"Failed to refresh repo info for {branch}, rebuilding worker next cycle"
+                )
+                self.drop_worker(branch)
+                continue
+            refreshed_workers.append((branch, worker))
+        sync_workers = refreshed_workers
 
         mirror_done = time.time()
 
@@ -321,13 +595,20 @@ class GithubSync(Stats):
                     None, worker.update_e2e_test_branch_and_update_pr, branch
                 )
 
+            # Changes are polled first, so that none is missed by the listing.
+            self.dirty = await self.pw_events.poll()
             # fetch recent subjects
             self.subjects = await self.pw.get_relevant_subjects()
+            subject_names = {x.subject for x in self.subjects}
+            self.synced_subjects = {
+                name: synced
+                for name, synced in self.synced_subjects.items()
+                if name in subject_names
+            }
 
         pw_done = time.time()
 
-        for subject in self.subjects:
-            await self.sync_relevant_subject(subject)
+        await self.sync_relevant_subjects(self.subjects)
 
         # sync old subjects
         subject_names = {x.subject for x in self.subjects}
@@ -400,3 +681,4 @@ class GithubSync(Stats):
                 if worker._is_relevant_pr(pr):
                     self.increment_counter("prs_total")
                     processed_prs.add(1)
+        self.save_state()
@@ -0,0 +1,103 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+# pyre-unsafe
+
+import json
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from multidict import CIMultiDictProxy, MultiDictProxy
+from yarl import URL
+
+# Patches embed their diff: bound the cache by size rather than entries.
+DEFAULT_HTTP_CACHE_BYTES = 64 * 1024 * 1024
+
+
+class CachedResponse:
+    """
+    A response whose body was read and kept, exposing the subset of
+    `aiohttp.ClientResponse` the Patchwork client relies upon.
+    """
+
+    def __init__(
+        self,
+        url: URL,
+        status: int,
+        headers: CIMultiDictProxy[str],
+        links: MultiDictProxy[MultiDictProxy[Any]],
+        body: bytes,
+    ) -> None:
+        self.url = url
+        self.status = status
+        self.headers = headers
+        self.links = links
+        self.body = body
+
+    @property
+    def ok(self) -> bool:
+        return self.status < 400
+
+    def validators(self) -> Dict[str, str]:
+        """
+        Headers making a request for the same resource conditional.
+        """
+        validators = {}
+        if "ETag" in self.headers:
+            validators["If-None-Match"] = self.headers["ETag"]
+        if "Last-Modified" in self.headers:
+            validators["If-Modified-Since"] = self.headers["Last-Modified"]
+        return validators
+
+    async def read(self) -> bytes:
+        return self.body
+
+    async def text(self, encoding: str = "utf-8") -> str:
+        return self.body.decode(encoding)
+
+    async def json(self, **kwargs: Any) -> Any:
+        return json.loads(self.body)
+
+
+class HttpCache:
+    """
+    Responses carrying an ETag or a Last-Modified header, keyed by the URL
+    (query included) they were fetched from, so that fetching the same URL
+    again can be made conditional.
+
+    Holds at most `max_bytes` worth of bodies, evicting the least recently
+    used responses.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_HTTP_CACHE_BYTES) -> None:
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries: OrderedDict[str, CachedResponse] = OrderedDict()
+
+    @staticmethod
+    def is_cacheable(status: int, headers: CIMultiDictProxy[str]) -> bool:
+        return status == 200 and ("ETag" in headers or "Last-Modified" in headers)
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        response = self._entries.get(key)
+        if response is not None:
+            self._entries.move_to_end(key)
+        return response
+
+    def put(self, key: str, response: CachedResponse) -> None:
+        self.drop(key)
+        if len(response.body) > self.max_bytes:
+            return
+        self._entries[key] = response
+        self.size += len(response.body)
+        while self.size > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.size -= len(evicted.body)
+
+    def drop(self, key: str) -> None:
+        response = self._entries.pop(key, None)
+        if response is not None:
+            self.size -= len(response.body)
@@ -0,0 +1,84 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+# pyre-unsafe
+
+import asyncio
+import datetime
+import email.utils
+import time
+from typing import Mapping, Optional
+
+# Statuses servers answer with when requests should slow down.
+THROTTLING_STATUSES = {429, 503}
+
+DEFAULT_MIN_BACKOFF = 1.0
+DEFAULT_MAX_BACKOFF = 120.0
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Seconds to wait according to a Retry-After header, either a number of
+    seconds or an HTTP date.
+    """
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        date = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    now = datetime.datetime.now(tz=date.tzinfo or datetime.timezone.utc)
+    return max((date - now).total_seconds(), 0.0)
+
+
+class AdaptiveThrottle:
+    """
+    Pauses all requests to a server after it throttled one of them.
+
+    The pause doubles, up to `max_backoff` seconds, as long as requests keep
+    being throttled, and halves with each request that is not. A Retry-After
+    header sent along with the throttling status is honored, up to
+    `max_backoff` seconds as well.
+    """
+
+    def __init__(
+        self,
+        min_backoff: float = DEFAULT_MIN_BACKOFF,
+        max_backoff: float = DEFAULT_MAX_BACKOFF,
+    ) -> None:
+        self.min_backoff = min(min_backoff, max_backoff)
+        self.max_backoff = max_backoff
+        self.backoff = 0.0
+        # time.monotonic() value until which requests are paused.
+        self.paused_until = 0.0
+
+    async def wait(self) -> None:
+        """
+        Return once requests are no longer paused.
+        """
+        while (remaining := self.paused_until - time.monotonic()) > 0:
+            await asyncio.sleep(remaining)
+
+    def record(self, status: int, headers: Mapping[str, str]) -> None:
+        """
+        Adapt the pause to the status of a response.
+        """
+        if status not in THROTTLING_STATUSES:
+            self.backoff /= 2
+            if self.backoff < self.min_backoff:
+                self.backoff = 0.0
+            return
+
+        self.backoff = min(max(self.backoff * 2, self.min_backoff), self.max_backoff)
+        delay = self.backoff
+        retry_after = parse_retry_after(headers.get("Retry-After"))
+        if retry_after is not None:
+            delay = min(max(delay, retry_after), self.max_backoff)
+        self.paused_until = max(self.paused_until, time.monotonic() + delay)
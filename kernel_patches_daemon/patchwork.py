@@ -11,21 +11,41 @@ import datetime
 import json
 import logging
 import re
+import time
 from functools import update_wrapper
 from types import SimpleNamespace
-from typing import Any, AnyStr, Dict, Final, List, Optional, Sequence, Set, Tuple
+from typing import (
+    Any,
+    AnyStr,
+    Dict,
+    Final,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+)
 from urllib.parse import urljoin
 
 import aiohttp
-import cachetools.keys
 import dateutil.parser as dateparser
 from aiohttp_retry import ExponentialRetry, RetryClient
-from cachetools import TTLCache
-from kernel_patches_daemon.config import SERIES_ID_SEPARATOR
+from kernel_patches_daemon.check_ledger import CheckLedger
+from kernel_patches_daemon.config import (
+    DEFAULT_PW_KEEPALIVE_TIMEOUT,
+    DEFAULT_PW_MAX_BACKOFF,
+    DEFAULT_PW_MAX_CONNECTIONS,
+    DEFAULT_PW_MAX_CONNECTIONS_PER_HOST,
+    SERIES_ID_SEPARATOR,
+)
+from kernel_patches_daemon.http_cache import CachedResponse, HttpCache
+from kernel_patches_daemon.http_throttle import AdaptiveThrottle, THROTTLING_STATUSES
 from kernel_patches_daemon.status import Status
 from multidict import MultiDict
 from opentelemetry import metrics
 from pyre_extensions import none_throws
+from yarl import URL
 
 DEFAULT_HTTP_RETRIES = 3
 
@@ -42,6 +62,14 @@ RFC_TAG: str = "RFC"
 # with these tags will be closed if no updates within TTL
 TTL = {"changes-requested": 3600, "rfc": 3600}
 
+# Between full listings of the lookback window, only patches dated after the
+# latest one seen are listed, minus this margin for mail delivered late.
+INCREMENTAL_SINCE_MARGIN = datetime.timedelta(hours=6)
+# How often to list the whole lookback window anyway, to pick up patches
+# that moved back into relevant states or arrived later than the margin.
+FULL_RESCAN_INTERVAL_SEC = 3600
+PATCHWORK_DATE_FORMAT = "%Y-%m-%dT%H:%M:%S"
+
 # when we are not interested in this patch anymore
 IRRELEVANT_STATES: Dict[str, int] = {
     "rejected": 4,
@@ -85,6 +113,9 @@ api_requests: metrics.Counter = meter.create_counter(name="requests.status")
 api_requests_time: metrics.Histogram = meter.create_histogram(
     name="requests.duration_ms"
 )
+api_cache_hits: metrics.Counter = meter.create_counter(name="requests.cache_hits")
+api_cache_misses: metrics.Counter = meter.create_counter(name="requests.cache_misses")
+api_coalesced: metrics.Counter = meter.create_counter(name="requests.coalesced")
 err_tag_parsing_failures: metrics.Counter = meter.create_counter(
     name="errors.tag_parsing_failures"
 )
@@ -247,59 +278,85 @@ def parse_subject(input: str) -> str:
         return ""
 
 
-# An asyncio compatible cachetools.cached method.
-# https://github.com/tkem/cachetools/issues/137
-# We may want to use asyncache, aiocache or the likes.
-def cached(cache, key=cachetools.keys.hashkey, lock=None):
+# Attribute of the instances holding their memoized results.
+MEMO_ATTR = "_memoized"
+
+
+def cached(ttl: float):
     """
-    Decorator to wrap an async function with a memoizing callable that saves results in a cache.
+    Decorator memoizing the results of an async method per instance (and
+    arguments) for `ttl` seconds.
+
+    Concurrent calls share a single in-flight call rather than each issuing
+    their own. Failures are not memoized. See `invalidate` to drop memoized
+    results before they expire.
     """
 
     def decorator(func):
-        if cache is None:
-
-            async def wrapper(*args, **kwargs):
-                return await func(*args, **kwargs)
-
-        elif lock is None:
-
-            async def wrapper(*args, **kwargs):
-                k = key(*args, **kwargs)
-                try:
-                    return cache[k]
-                except KeyError:
-                    pass  # key not found
-                v = await func(*args, **kwargs)
-                try:
-                    cache[k] = v
-                except ValueError:
-                    pass  # value too large
-                return v
-
-        else:
-
-            async def wrapper(*args, **kwargs):
-                k = key(*args, **kwargs)
-                try:
-                    # pyrefly: ignore  # bad-context-manager
-                    with lock:
-                        return cache[k]
-                except KeyError:
-                    pass  # key not found
-                v = await func(*args, **kwargs)
-                try:
-                    # pyrefly: ignore  # bad-context-manager
-                    with lock:
-                        cache[k] = v
-                except ValueError:
-                    pass  # value too large
-                return v
+        async def wrapper(self, *args, **kwargs):
+            memo = self.__dict__.setdefault(MEMO_ATTR, {})
+            key = (func.__name__, args, tuple(sorted(kwargs.items())))
+            entry = memo.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                future = asyncio.ensure_future(func(self, *args, **kwargs))
+                entry = (time.monotonic() + ttl, future)
+                memo[key] = entry
+
+                def forget_failure(future: asyncio.Future, entry=entry) -> None:
+                    if (
+                        future.cancelled() or future.exception() is not None
+                    ) and memo.get(key) is entry:
+                        del memo[key]
+
+                future.add_done_callback(forget_failure)
+            # Shielded, so that a cancelled caller does not cancel the call
+            # for everybody else.
+            return await asyncio.shield(entry[1])
 
         return update_wrapper(wrapper, func)
 
     return decorator
 
 
+def invalidate(obj: Any, *methods: str) -> None:
+    """
+    Drop the results memoized by `cached` for `methods` of `obj`, or for all
+    of its methods if none is given.
+    """
+    memo = obj.__dict__.get(MEMO_ATTR, {})
+    for key in list(memo):
+        if not methods or key[0] in methods:
+            del memo[key]
+
+
+def check_needs_update(
+    patch_id: int,
+    state: str,
+    target_url: Optional[str],
+    status: Status,
+    new_target_url: Optional[str],
+) -> bool:
+    """
+    Whether a check in `state` pointing at `target_url` needs to be updated
+    to `status` and `new_target_url`.
+    """
+    new_state = PW_CHECK_STATES.get(status, PW_CHECK_STATES[Status.PENDING])
+    if status in PW_CHECK_PENDING_STATES and PW_CHECK_PENDING_STATES[status] != state:
+        logger.info(
+            f"Not posting state update for patch {patch_id}: "
+            f"existing state '{state}' can't be changed "
+            f"to pending state '{new_state}'"
+        )
+        return False
+
+    if state == new_state and target_url == new_target_url:
+        logger.debug(
+            f"Not posting state update for patch {patch_id}: previous state '{new_state}' and url are the same"
+        )
+        return False
+    return True
+
+
 class Subject:
     def __init__(self, subject: str, pw_client: "Patchwork") -> None:
         self.pw_client = pw_client
@@ -317,7 +374,7 @@ class Subject:
             return None
         return relevant_series[-1]
 
-    @cached(cache=TTLCache(maxsize=1, ttl=600))
+    @cached(ttl=600)
     async def relevant_series(self) -> List["Series"]:
         """
         cache and return sorted list of relevant series
@@ -407,7 +464,7 @@ class Series:
     def age(self) -> float:
         return time_since_secs(self.date)
 
-    @cached(cache=TTLCache(maxsize=1, ttl=600))
+    @cached(ttl=600)
     async def get_patches(self) -> Tuple[Dict]:
         """
         Returns patches preserving original order
@@ -427,7 +484,7 @@ class Series:
                 return True
         return False
 
-    @cached(cache=TTLCache(maxsize=1, ttl=120))
+    @cached(ttl=120)
     async def all_tags(self) -> Set[str]:
         """
         Tags fetched from series name, diffs and cover letter
@@ -452,7 +509,7 @@ class Series:
             *[diff["state"] for diff in await self.get_patches()],
         }
 
-    @cached(cache=TTLCache(maxsize=1, ttl=120))
+    @cached(ttl=120)
     async def patch_subjects(self) -> List[str]:
         """
         Returns an ordered list of all patch subjects (tags removed)
@@ -466,7 +523,7 @@ class Series:
                     return True
         return False
 
-    @cached(cache=TTLCache(maxsize=1, ttl=120))
+    @cached(ttl=120)
     async def get_patch_binary_content(self) -> bytes:
         content = await self.pw_client.get_blob(self.mbox)
         logger.debug(
@@ -530,23 +587,52 @@ class Patchwork:
         lookback_in_days: int = -1,
         api_version: str = "1.2",
         http_retries: int = DEFAULT_HTTP_RETRIES,
+        max_connections: int = DEFAULT_PW_MAX_CONNECTIONS,
+        max_connections_per_host: int = DEFAULT_PW_MAX_CONNECTIONS_PER_HOST,
+        keepalive_timeout: float = DEFAULT_PW_KEEPALIVE_TIMEOUT,
+        max_backoff: float = DEFAULT_PW_MAX_BACKOFF,
+        check_ledger: Optional[CheckLedger] = None,
     ) -> None:
         self.api_url = f"https://{server}/api/{api_version}/"
         self.auth_token = auth_token
         if not auth_token:
             logger.warning("Patchwork client runs in read-only mode")
         self.search_patterns = search_patterns
+        # The lookback window moves along with the cycles: `since` is
+        # recomputed at the start of each of them.
+        self.lookback_in_days = lookback_in_days
         self.since = (
             self.format_since(lookback_in_days) if lookback_in_days > 0 else None
         )
+        # Checks last known to patchwork, to skip posting unchanged checks
+        # without reading them back first.
+        self.check_ledger = check_ledger
         # member variable initializations
         self.known_series: Dict[int, Series] = {}
         self.known_subjects: Dict[str, Subject] = {}
+        # Search pattern index -> ID of the series with relevant patches ->
+        # date of their latest such patch. Kept between cycles, so that only
+        # patches submitted since the previous cycle need to be listed.
+        self.series_index: Dict[int, Dict[int, datetime.datetime]] = {}
+        # Search pattern index -> date of the latest patch listed.
+        self.high_water_marks: Dict[int, datetime.datetime] = {}
+        self.last_full_scan: Optional[float] = None
 
         # aiohttp's ClientSession needs to be initialized within an async function.
         # We will differ this initialization to a separate function and memoize it during first call.
         self.http_retries = http_retries
         self.http_session = None
+        # The fan-out of a cycle easily amounts to thousands of requests: bound
+        # the connections they are sent over, and pause them all whenever
+        # patchwork throttles one.
+        self.max_connections = max_connections
+        self.max_connections_per_host = max_connections_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.throttle = AdaptiveThrottle(max_backoff=max_backoff)
+        # Responses kept across cycles, to make re-fetching them cheap.
+        self.http_cache = HttpCache()
+        # URL -> GET of it in flight, shared by concurrent callers.
+        self.inflight_gets: Dict[str, asyncio.Future] = {}
 
     async def get_http_session(self) -> aiohttp.ClientSession:
         """
@@ -556,20 +642,33 @@ class Patchwork:
             # Setup aiohttp client tracing so we can log metrics/requests
             # https://docs.aiohttp.org/en/stable/client_advanced.html#aiohttp-client-tracing
             trace_config = aiohttp.TraceConfig(trace_config_ctx_factory=TraceContext)
+            # Retries of throttled requests start over, and wait as well.
+            # pyrefly: ignore  # bad-argument-type
+            trace_config.on_request_start.append(self.wait_throttle)
+            # pyrefly: ignore  # bad-argument-type
+            trace_config.on_request_end.append(self.record_throttle)
             # pyre-fixme[6]: In call `typing.MutableSequence.append`, for 1st positional argument, expected `_SignalCallback[TraceRequestStartParams]` but got `typing.Callable(on_request_start)[[Named(session, ClientSession), Named(trace_ctx, TraceContext), Named(params, TraceRequestStartParams)], Coroutine[typing.Any, typing.Any, None]]`.
             # pyrefly: ignore  # bad-argument-type
             trace_config.on_request_start.append(on_request_start)
             # pyre-fixme[6]: In call `typing.MutableSequence.append`, for 1st positional argument, expected `_SignalCallback[TraceRequestEndParams]` but got `typing.Callable(on_request_end)[[Named(session, ClientSession), Named(trace_ctx, TraceContext), Named(params, TraceRequestEndParams)], Coroutine[typing.Any, typing.Any, None]]`.
             # pyrefly: ignore  # bad-argument-type
             trace_config.on_request_end.append(on_request_end)
+            connector = aiohttp.TCPConnector(
+                limit=self.max_connections,
+                limit_per_host=self.max_connections_per_host,
+                keepalive_timeout=self.keepalive_timeout,
+            )
             client_session = aiohttp.ClientSession(
+                connector=connector,
                 trace_configs=[trace_config],
                 # Read proxy from env var
                 trust_env=True,
             )
 
             # Work around intermittent issues by adding some retry logic.
-            retry_options = ExponentialRetry(attempts=self.http_retries)
+            retry_options = ExponentialRetry(
+                attempts=self.http_retries, statuses=THROTTLING_STATUSES
+            )
             # pyrefly: ignore  # bad-assignment
             self.http_session = RetryClient(
                 client_session=client_session, retry_options=retry_options
@@ -577,25 +676,107 @@ class Patchwork:
         # pyrefly: ignore  # bad-return
         return self.http_session
 
+    async def wait_throttle(
+        self,
+        session: aiohttp.ClientSession,
+        trace_ctx: TraceContext,
+        params: aiohttp.TraceRequestStartParams,
+    ) -> None:
+        await self.throttle.wait()
+
+    async def record_throttle(
+        self,
+        session: aiohttp.ClientSession,
+        trace_ctx: TraceContext,
+        params: aiohttp.TraceRequestEndParams,
+    ) -> None:
+        self.throttle.record(params.response.status, params.response.headers)
+
     def format_since(self, pw_lookback: int) -> str:
         # pyrefly: ignore  # deprecated
         today = datetime.datetime.utcnow().date()
         lookback = today - datetime.timedelta(days=pw_lookback)
-        return lookback.strftime("%Y-%m-%dT%H:%M:%S")
+        return lookback.strftime(PATCHWORK_DATE_FORMAT)
+
+    @staticmethod
+    def request_key(url: URL, params: Optional[Mapping[str, Any]] = None) -> str:
+        """
+        Key of a GET of `url` with `params`, which does not depend on the
+        order of the parameters.
+        """
+        if params:
+            url = url.extend_query(sorted(params.items()))
+        return str(url.with_query(sorted(url.query.items())))
 
     async def __get(
-        self, path: AnyStr, allow_redirects=True, **kwargs: Dict
-    ) -> aiohttp.ClientResponse:
+        self,
+        path: AnyStr,
+        allow_redirects=True,
+        params: Optional[Mapping[str, Any]] = None,
+        **kwargs: Dict,
+    ) -> CachedResponse:
+        """
+        GET `path`. Concurrent GETs of the same URL share a single request,
+        and thus a single response.
+        """
+        # pyre-ignore
+        # pyrefly: ignore  # bad-argument-type
+        url = URL(urljoin(self.api_url, path))
+        key = self.request_key(url, params)
+        if kwargs or not allow_redirects:
+            return await self.__fetch(url, key, allow_redirects, params, **kwargs)
+
+        future = self.inflight_gets.get(key)
+        if future is None:
+            future = asyncio.ensure_future(
+                self.__fetch(url, key, allow_redirects, params)
+            )
+            self.inflight_gets[key] = future
+            future.add_done_callback(lambda _: self.inflight_gets.pop(key, None))
+        else:
+            api_coalesced.add(1)
+        # Shielded, so that a cancelled caller does not cancel the request
+        # for everybody else.
+        return await asyncio.shield(future)
+
+    async def __fetch(
+        self,
+        url: URL,
+        key: str,
+        allow_redirects: bool,
+        params: Optional[Mapping[str, Any]],
+        **kwargs: Dict,
+    ) -> CachedResponse:
+        """
+        GET `url`, revalidating the response cached for `key` if any: if
+        patchwork answers 304 Not Modified, the cached response is returned.
+        The body of the response is read, so that it can be shared.
+        """
         http_session = await self.get_http_session()
+        cached = self.http_cache.get(key)
         resp = await http_session.get(
-            # pyre-ignore
-            # pyrefly: ignore  # bad-argument-type
-            urljoin(self.api_url, path),
+            url,
+            allow_redirects=allow_redirects,
+            params=params,
+            headers=cached.validators() if cached else None,
             # pyre-ignore
             # pyrefly: ignore  # bad-argument-type
             **kwargs,
         )
-        return resp
+        if resp.status == 304 and cached is not None:
+            resp.release()
+            api_cache_hits.add(1)
+            return cached
+
+        api_cache_misses.add(1)
+        response = CachedResponse(
+            resp.url, resp.status, resp.headers, resp.links, await resp.read()
+        )
+        if HttpCache.is_cacheable(resp.status, resp.headers):
+            self.http_cache.put(key, response)
+        else:
+            self.http_cache.drop(key)
+        return response
 
     async def __get_object_by_id(self, object_type: str, object_id: int) -> Dict:
         resp = await self.__get(f"{object_type}/{object_id}/")
@@ -653,36 +834,25 @@ class Patchwork:
         resp = await self.__get(url, allow_redirects=True)
         return await resp.read()
 
-    async def get_latest_check_for_patch(
-        self,
-        patch_id: int,
-        context: str,
-    ) -> Dict[str, Any]:
+    @cached(ttl=600)
+    async def get_check_states(self, patch_id: int) -> Dict[str, Dict[str, Any]]:
         """
-        Return dict of the latest check with matching context and patch_id if exists.
-        Returns None if such check does not exist.
+        Latest check of each context of a patch, keyed by lowercased context
+        as patchwork ignores its case.
+
+        All the checks of the patch are fetched at once, so that checks of all
+        contexts can be diffed against them locally. Checks posted afterwards
+        are recorded into the returned mapping.
         """
-        # get single latest one with matching context value
-        # patchwork.kernel.org api ignores case for context query
-        resp = await self.__get(
-            f"patches/{patch_id}/checks/",
-            params={
-                "context": context,
-                "order": "-date",
-                "per_page": "1",
-            },
-        )
-        checks = await resp.json()
-        logger.debug(
-            f"Received latest check for patch {patch_id} with context {context}: {json_pprint(checks)}"
+        checks = await self.__get_objects_recursive(
+            f"patches/{patch_id}/checks", params={"order": "-date", "per_page": "100"}
         )
-
-        if len(checks) == 0:
-            raise ValueError(
-                f"Patch {patch_id} doesn't have any checks with '{context}' context"
-            )
-
-        return checks[0]
+        states = {}
+        for check in checks:
+            # Latest first: keep the first check of each context.
+            states.setdefault(check["context"].lower(), check)
+        logger.debug(f"Received checks of {len(states)} contexts for patch {patch_id}")
+        return states
 
     async def post_check_for_patch_id(
         self, patch_id: int, status: Status, check_data: Dict[str, Any]
@@ -695,40 +865,41 @@ class Patchwork:
         logger.debug(
             f"Trying to update check for {patch_id} with a new content: {json_pprint(updated_check_data)}"
         )
-        try:
-            check = await self.get_latest_check_for_patch(
-                patch_id, check_data["context"]
-            )
-            if (
-                status in PW_CHECK_PENDING_STATES
-                and PW_CHECK_PENDING_STATES[status] != check["state"]
+        context = check_data["context"].lower()
+        target_url = check_data["target_url"]
+        if self.check_ledger is not None:
+            recorded = self.check_ledger.get(patch_id, context)
+            if recorded is not None and not check_needs_update(
+                patch_id, *recorded, status, target_url
             ):
-                logger.info(
-                    f"Not posting state update for patch {patch_id}: "
-                    f"existing state '{check['state']}' can't be changed "
-                    f"to pending state '{new_state}'"
-                )
                 return None
 
-            if (
-                check.get("state") == new_state
-                and check.get("target_url") == check_data["target_url"]
-            ):
-                logger.debug(
-                    f"Not posting state update for patch {patch_id}: previous state '{new_state}' and url are the same"
+        states = await self.get_check_states(patch_id)
+        check = states.get(context)
+        if check is None:
+            logger.debug(f"Setting patch {patch_id} check to '{new_state}' state")
+        else:
+            if self.check_ledger is not None:
+                self.check_ledger.record(
+                    patch_id, context, check["state"], check.get("target_url")
                 )
+            if not check_needs_update(
+                patch_id, check["state"], check.get("target_url"), status, target_url
+            ):
                 return None
-
             logger.debug(
-                f"Updating patch {patch_id} check, current state: '{check.get('state')}', new state: '{new_state}'"
+                f"Updating patch {patch_id} check, current state: '{check['state']}', new state: '{new_state}'"
             )
-        except ValueError:
-            logger.debug(f"Setting patch {patch_id} check to '{new_state}' state")
 
-        return await self.__try_post(
+        resp = await self.__try_post(
             f"patches/{patch_id}/checks/",
             data=updated_check_data,
         )
+        if resp is not None and resp.ok:
+            states[context] = updated_check_data
+            if self.check_ledger is not None:
+                self.check_ledger.record(patch_id, context, new_state, target_url)
+        return resp
 
     async def get_series_by_id(self, series_id: int) -> Series:
         # fetches directly only if series is not available in local scope
@@ -751,8 +922,24 @@ class Patchwork:
         filtered_subjects = []
         self.known_series = {}
         self.known_subjects = {}
+        # Checks are fetched once per cycle.
+        invalidate(self, "get_check_states")
+        if self.lookback_in_days > 0:
+            self.since = self.format_since(self.lookback_in_days)
+
+        full_scan = (
+            self.last_full_scan is None
+            or time.monotonic() - self.last_full_scan >= FULL_RESCAN_INTERVAL_SEC
+        )
+        if full_scan:
+            self.last_full_scan = time.monotonic()
+            self.series_index = {}
+            self.high_water_marks = {}
+        lookback_start = (
+            dateparser.parse(self.since) if self.since is not None else None
+        )
 
-        for pattern in self.search_patterns:
+        for pattern_idx, pattern in enumerate(self.search_patterns):
             patch_filters = MultiDict(
                 # pyrefly: ignore  # bad-argument-type
                 [
@@ -760,8 +947,14 @@ class Patchwork:
                     *[("state", val) for val in RELEVANT_STATES.values()],
                 ]
             )
-            if self.since is not None:
-                patch_filters.add("since", self.since)
+            since = self.since
+            high_water_mark = self.high_water_marks.get(pattern_idx)
+            if high_water_mark is not None:
+                start = high_water_mark - INCREMENTAL_SINCE_MARGIN
+                if lookback_start is None or start > lookback_start:
+                    since = start.strftime(PATCHWORK_DATE_FORMAT)
+            if since is not None:
+                patch_filters.add("since", since)
             patch_filters.update({k: str(v) for k, v in pattern.items()})
             logger.info(
                 f"Searching for Patchwork patches that match the criteria: {patch_filters}"
@@ -773,8 +966,17 @@ class Patchwork:
                 params=patch_filters,
             )
 
-            series_ids = set()
+            # Patches listed in previous cycles are still relevant unless
+            # they left the lookback window.
+            index = {
+                series_id: date
+                for series_id, date in self.series_index.get(pattern_idx, {}).items()
+                if lookback_start is None or date >= lookback_start
+            }
             for patch in all_patches:
+                date = dateparser.parse(patch["date"])
+                if high_water_mark is None or date > high_water_mark:
+                    high_water_mark = date
                 for series_data in patch["series"]:
                     if not series_data.get("name"):
                         logger.error(f"Malformed series name in: {series_data}")
@@ -783,13 +985,16 @@ class Patchwork:
 
                     try:
                         series_id = int(series_data["id"])
-                        series_ids.add(series_id)
+                        index[series_id] = max(index.get(series_id, date), date)
                     except ValueError:
                         logger.error(f"Malformed series ID in: {series_data}")
                         err_malformed_series.add(1)
                         continue
+            self.series_index[pattern_idx] = index
+            if high_water_mark is not None:
+                self.high_water_marks[pattern_idx] = high_water_mark
 
-            tasks = [self.get_series_by_id(series_id) for series_id in series_ids]
+            tasks = [self.get_series_by_id(series_id) for series_id in index]
             all_series = await asyncio.gather(*tasks)
 
             for series in all_series:
@@ -843,6 +1048,9 @@ class Patchwork:
     async def get_patch_by_id(self, id: int) -> Dict:
         return await self.__get_object_by_id("patches", id)
 
+    async def get_events(self, params: Dict[str, str]) -> List[Dict]:
+        return await self.__get_objects_recursive("events", params=params)
+
     async def get_series(self, params: Optional[Dict]) -> List[Series]:
         return [
             Series(self, json)
@@ -0,0 +1,133 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+# pyre-unsafe
+
+import datetime
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set
+
+import dateutil.parser as dateparser
+from kernel_patches_daemon.patchwork import (
+    FULL_RESCAN_INTERVAL_SEC,
+    Patchwork,
+    PATCHWORK_DATE_FORMAT,
+    Series,
+)
+from opentelemetry import metrics
+
+logger: logging.Logger = logging.getLogger(__name__)
+meter: metrics.Meter = metrics.get_meter("patchwork_events")
+
+events_processed: metrics.Counter = meter.create_counter(name="events.processed")
+
+# Events that may require a series to be applied (again) or its PR closed.
+# `check-created` events are not among them: checks are mostly created by
+# KPD itself, and they get synced for every subject regardless.
+SERIES_EVENT_CATEGORIES = {"series-created", "series-completed"}
+PATCH_EVENT_CATEGORIES = {"patch-created", "patch-completed", "patch-state-changed"}
+
+# Events are listed from the date of the latest one seen, minus this margin
+# for events committed out of order. Duplicates are filtered by ID.
+EVENTS_SINCE_MARGIN = datetime.timedelta(minutes=10)
+
+
+@dataclass
+class DirtySet:
+    """
+    Series and patches that had events since the previous poll.
+    """
+
+    series_ids: Set[int] = field(default_factory=set)
+    patch_ids: Set[int] = field(default_factory=set)
+
+    def is_dirty(self, series: Series) -> bool:
+        return series.id in self.series_ids or any(
+            patch["id"] in self.patch_ids for patch in series.patches
+        )
+
+
+class PatchworkEventFeed:
+    """
+    Tails the `events/` feed of Patchwork to tell which series changed since
+    the previous poll.
+
+    `poll` returns None when changes cannot be told, in which case everything
+    must be considered changed: on the first poll, when the feed cannot be
+    fetched, and once every `FULL_RESCAN_INTERVAL_SEC` as a safety net.
+    """
+
+    def __init__(self, pw: Patchwork) -> None:
+        self.pw = pw
+        self.high_water_mark: Optional[datetime.datetime] = None
+        # ID -> date of the events seen within the margin.
+        self.seen_events: Dict[int, datetime.datetime] = {}
+        self.last_full_scan: Optional[float] = None
+
+    def _projects(self) -> List[Optional[str]]:
+        """
+        Projects of the search patterns; None if a pattern covers them all.
+        """
+        patterns = self.pw.search_patterns
+        if any("project" not in pattern for pattern in patterns):
+            return [None]
+        return sorted({str(pattern["project"]) for pattern in patterns})
+
+    async def _fetch(self, since: datetime.datetime) -> List[Dict]:
+        events = []
+        for project in self._projects():
+            params = {"since": since.strftime(PATCHWORK_DATE_FORMAT)}
+            if project is not None:
+                params["project"] = project
+            events += await self.pw.get_events(params)
+        return events
+
+    async def poll(self) -> Optional[DirtySet]:
+        if self.high_water_mark is None:
+            # pyrefly: ignore  # deprecated
+            self.high_water_mark = datetime.datetime.utcnow()
+            self.last_full_scan = time.monotonic()
+            return None
+
+        since = self.high_water_mark - EVENTS_SINCE_MARGIN
+        try:
+            events = await self._fetch(since)
+        except Exception:
+            logger.exception("Failed to fetch Patchwork events")
+            return None
+
+        dirty = DirtySet()
+        for event in events:
+            if event["id"] in self.seen_events:
+                continue
+            date = dateparser.parse(event["date"])
+            self.seen_events[event["id"]] = date
+            self.high_water_mark = max(self.high_water_mark, date)
+            events_processed.add(1, {"category": event["category"]})
+
+            payload = event.get("payload") or {}
+            if event["category"] in SERIES_EVENT_CATEGORIES and payload.get("series"):
+                dirty.series_ids.add(payload["series"]["id"])
+            elif event["category"] in PATCH_EVENT_CATEGORIES and payload.get("patch"):
+                dirty.patch_ids.add(payload["patch"]["id"])
+
+        since = self.high_water_mark - EVENTS_SINCE_MARGIN
+        self.seen_events = {
+            event_id: date
+            for event_id, date in self.seen_events.items()
+            if date >= since
+        }
+        logger.info(
+            f"Patchwork events: {len(dirty.series_ids)} series and "
+            f"{len(dirty.patch_ids)} patches changed"
+        )
+
+        if time.monotonic() - (self.last_full_scan or 0) >= FULL_RESCAN_INTERVAL_SEC:
+            self.last_full_scan = time.monotonic()
+            return None
+        return dirty
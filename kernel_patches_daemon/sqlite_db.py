@@ -0,0 +1,65 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+# pyre-unsafe
+
+import logging
+import os
+import sqlite3
+import time
+from typing import Callable, Optional
+
+logger: logging.Logger = logging.getLogger(__name__)
+
+# How long to wait before opening a database again after failing to.
+REOPEN_INTERVAL_SEC = 60
+
+
+class LazySqliteDb:
+    """
+    A SQLite database at `path`, opened on first use, for stores that are an
+    optimization: rather than raising, `connect` returns None while the
+    database cannot be opened, and tries again every `REOPEN_INTERVAL_SEC`.
+
+    `init` is run on every new connection, e.g., to create the schema.
+    `description` names the database in logs.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        init: Callable[[sqlite3.Connection], None],
+        description: str,
+    ) -> None:
+        self.path = path
+        self.init = init
+        self.description = description
+        self._db: Optional[sqlite3.Connection] = None
+        # time.monotonic() value before which the database is not opened
+        # again, after failing to.
+        self._reopen_at = 0.0
+
+    def connect(self) -> Optional[sqlite3.Connection]:
+        if self._db is None and time.monotonic() >= self._reopen_at:
+            try:
+                # The base directory may not have been created yet.
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                db = sqlite3.connect(self.path)
+                try:
+                    self.init(db)
+                except sqlite3.Error:
+                    db.close()
+                    raise
+                self._db = db
+            except (OSError, sqlite3.Error):
+                logger.exception(f"Failed to open {self.description} {self.path}")
+                self._reopen_at = time.monotonic() + REOPEN_INTERVAL_SEC
+        return self._db
+
+    def close(self) -> None:
+        if self._db is not None:
+            self._db.close()
+            self._db = None
@@ -0,0 +1,289 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+# pyre-unsafe
+
+import datetime
+import json
+import logging
+import sqlite3
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from kernel_patches_daemon.sqlite_db import LazySqliteDb
+
+logger: logging.Logger = logging.getLogger(__name__)
+
+SCHEMA = """
+-- Series with relevant patches, per search pattern, and the date of their
+-- latest such patch.
+CREATE TABLE IF NOT EXISTS series (
+    pattern INTEGER NOT NULL,
+    series_id INTEGER NOT NULL,
+    latest_patch_date TEXT NOT NULL,
+    PRIMARY KEY (pattern, series_id)
+);
+-- Date of the latest patch listed, per search pattern.
+CREATE TABLE IF NOT EXISTS high_water_marks (
+    pattern INTEGER PRIMARY KEY,
+    high_water_mark TEXT NOT NULL
+);
+-- How subjects were last synced: series, PR branch and bases.
+CREATE TABLE IF NOT EXISTS subjects (
+    subject TEXT PRIMARY KEY,
+    series_id INTEGER NOT NULL,
+    branch TEXT NOT NULL,
+    bases TEXT NOT NULL
+);
+-- What the branches of each worker were last built from.
+CREATE TABLE IF NOT EXISTS branches (
+    repo_branch TEXT NOT NULL,
+    name TEXT NOT NULL,
+    upstream_sha TEXT,
+    ci_sha TEXT,
+    sha TEXT,
+    PRIMARY KEY (repo_branch, name)
+);
+CREATE TABLE IF NOT EXISTS workers (
+    repo_branch TEXT PRIMARY KEY,
+    upstream_sha TEXT
+);
+-- Most recently updated closed PR of each head branch.
+CREATE TABLE IF NOT EXISTS closed_prs (
+    repo_branch TEXT NOT NULL,
+    head TEXT NOT NULL,
+    number INTEGER NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (repo_branch, head)
+);
+-- Miscellaneous values, JSON encoded.
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+def _init_db(db: sqlite3.Connection) -> None:
+    # Readers (e.g. debugging tools) do not block the daemon.
+    db.execute("PRAGMA journal_mode=WAL")
+    db.executescript(SCHEMA)
+
+
+# Name of the e2e test branch in the `branches` table, as it has no base
+# commit of its own.
+E2E_BRANCH = ""
+
+
+@dataclass
+class BranchState:
+    """
+    What a BranchWorker knows about the branches it maintains.
+    """
+
+    upstream_sha: Optional[str] = None
+    # (upstream SHA-1, CI SHA-1) the e2e test branch was last updated for.
+    e2e_synced_key: Optional[Tuple[Optional[str], Optional[str]]] = None
+    # Base branch name -> ((upstream SHA-1, CI SHA-1), base commit SHA-1).
+    pr_base_commits: Dict[str, Tuple[Tuple[Optional[str], Optional[str]], str]] = field(
+        default_factory=dict
+    )
+    # Head branch -> (number, update timestamp) of its latest closed PR.
+    closed_prs: Dict[str, Tuple[int, float]] = field(default_factory=dict)
+    # Latest update timestamp of the closed PRs.
+    closed_prs_synced_at: Optional[float] = None
+
+
+class StateStore:
+    """
+    What KPD learnt about patchwork and its branches, stored as SQLite at
+    `path` so that the daemon can start from it after a restart, and only
+    reconcile what changed since with patchwork and GitHub.
+
+    Open PRs and branches are not stored: they are listed again at the start
+    of every cycle anyway, which conditional GitHub requests make cheap when
+    nothing changed.
+
+    The store is an optimization: rather than failing, it does nothing while
+    the database cannot be opened (see `LazySqliteDb`). Everything loaded from
+    it is then empty.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._db = LazySqliteDb(path, _init_db, "state store")
+        # Repository branch -> closed PRs as last loaded or saved, so that
+        # only the ones that changed since get written.
+        self._closed_prs: Dict[str, Dict[str, Tuple[int, float]]] = {}
+
+    def _connect(self) -> Optional[sqlite3.Connection]:
+        return self._db.connect()
+
+    def _read(self, query: str, *params: Any) -> List[Tuple]:
+        db = self._connect()
+        if db is None:
+            return []
+        try:
+            return db.execute(query, params).fetchall()
+        except sqlite3.Error:
+            logger.exception(f"Failed to read state store {self.path}")
+            return []
+
+    def _write(self, *statements: Tuple[str, List[Tuple]]) -> bool:
+        """
+        Run `statements`, each with its list of parameters, in a single
+        transaction. Returns whether they were committed.
+        """
+        db = self._connect()
+        if db is None:
+            return False
+        try:
+            with db:
+                for query, rows in statements:
+                    db.executemany(query, rows)
+        except sqlite3.Error:
+            logger.exception(f"Failed to write state store {self.path}")
+            return False
+        return True
+
+    def get_value(self, key: str) -> Any:
+        rows = self._read("SELECT value FROM meta WHERE key = ?", key)
+        return json.loads(rows[0][0]) if rows else None
+
+    def set_value(self, key: str, value: Any) -> None:
+        self._write(
+            ("INSERT OR REPLACE INTO meta VALUES (?, ?)", [(key, json.dumps(value))])
+        )
+
+    def load_series_index(
+        self,
+    ) -> Tuple[Dict[int, Dict[int, datetime.datetime]], Dict[int, datetime.datetime]]:
+        """
+        Returns the series index and the high-water marks of the Patchwork
+        client, as saved by `save_series_index`.
+        """
+        series_index = {}
+        for pattern, series_id, date in self._read("SELECT * FROM series"):
+            series_index.setdefault(pattern, {})[series_id] = (
+                datetime.datetime.fromisoformat(date)
+            )
+        high_water_marks = {
+            pattern: datetime.datetime.fromisoformat(date)
+            for pattern, date in self._read("SELECT * FROM high_water_marks")
+        }
+        return series_index, high_water_marks
+
+    def save_series_index(
+        self,
+        series_index: Dict[int, Dict[int, datetime.datetime]],
+        high_water_marks: Dict[int, datetime.datetime],
+    ) -> None:
+        self._write(
+            ("DELETE FROM series", [()]),
+            (
+                "INSERT INTO series VALUES (?, ?, ?)",
+                [
+                    (pattern, series_id, date.isoformat())
+                    for pattern, series in series_index.items()
+                    for series_id, date in series.items()
+                ],
+            ),
+            ("DELETE FROM high_water_marks", [()]),
+            (
+                "INSERT INTO high_water_marks VALUES (?, ?)",
+                [
+                    (pattern, date.isoformat())
+                    for pattern, date in high_water_marks.items()
+                ],
+            ),
+        )
+
+    def load_subjects(self) -> Dict[str, Tuple[int, str, Tuple]]:
+        """
+        Returns subject -> (series ID, branch, bases), as saved by
+        `save_subjects`.
+        """
+        return {
+            subject: (
+                series_id,
+                branch,
+                tuple(tuple(base) for base in json.loads(bases)),
+            )
+            for subject, series_id, branch, bases in self._read(
+                "SELECT * FROM subjects"
+            )
+        }
+
+    def save_subjects(self, subjects: Dict[str, Tuple[int, str, Tuple]]) -> None:
+        self._write(
+            ("DELETE FROM subjects", [()]),
+            (
+                "INSERT INTO subjects VALUES (?, ?, ?, ?)",
+                [
+                    (subject, series_id, branch, json.dumps(bases))
+                    for subject, (series_id, branch, bases) in subjects.items()
+                ],
+            ),
+        )
+
+    def load_branch_state(self, repo_branch: str) -> BranchState:
+        state = BranchState()
+        for (upstream_sha,) in self._read(
+            "SELECT upstream_sha FROM workers WHERE repo_branch = ?", repo_branch
+        ):
+            state.upstream_sha = upstream_sha
+        for name, upstream_sha, ci_sha, sha in self._read(
+            "SELECT name, upstream_sha, ci_sha, sha FROM branches "
+            "WHERE repo_branch = ?",
+            repo_branch,
+        ):
+            if name == E2E_BRANCH:
+                state.e2e_synced_key = (upstream_sha, ci_sha)
+            else:
+                state.pr_base_commits[name] = ((upstream_sha, ci_sha), sha)
+        for head, number, updated_at in self._read(
+            "SELECT head, number, updated_at FROM closed_prs WHERE repo_branch = ?",
+            repo_branch,
+        ):
+            state.closed_prs[head] = (number, updated_at)
+        self._closed_prs[repo_branch] = dict(state.closed_prs)
+        state.closed_prs_synced_at = self.get_value(
+            f"closed_prs_synced_at:{repo_branch}"
+        )
+        return state
+
+    def save_branch_state(self, repo_branch: str, state: BranchState) -> None:
+        rows = [
+            (repo_branch, name, key[0], key[1], sha)
+            for name, (key, sha) in state.pr_base_commits.items()
+        ]
+        if state.e2e_synced_key is not None:
+            rows.append((repo_branch, E2E_BRANCH, *state.e2e_synced_key, None))
+        # Closed PRs never leave the index, and few of them change between
+        # cycles: only upsert those.
+        saved_closed_prs = self._closed_prs.get(repo_branch, {})
+        closed_prs = [
+            (repo_branch, head, number, updated_at)
+            for head, (number, updated_at) in state.closed_prs.items()
+            if saved_closed_prs.get(head) != (number, updated_at)
+        ]
+        committed = self._write(
+            (
+                "INSERT OR REPLACE INTO workers VALUES (?, ?)",
+                [(repo_branch, state.upstream_sha)],
+            ),
+            ("DELETE FROM branches WHERE repo_branch = ?", [(repo_branch,)]),
+            ("INSERT INTO branches VALUES (?, ?, ?, ?, ?)", rows),
+            ("INSERT OR REPLACE INTO closed_prs VALUES (?, ?, ?, ?)", closed_prs),
+        )
+        if committed:
+            self._closed_prs[repo_branch] = dict(state.closed_prs)
+        self.set_value(
+            f"closed_prs_synced_at:{repo_branch}", state.closed_prs_synced_at
+        )
+
+    def close(self) -> None:
+        self._db.close()
@@ -0,0 +1,142 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+# pyre-unsafe
+
+import asyncio
+import logging
+import shutil
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+
+import git
+from kernel_patches_daemon.async_git import AsyncGit
+from pyre_extensions import none_throws
+
+logger: logging.Logger = logging.getLogger(__name__)
+
+
+async def _abort_am(git_: AsyncGit) -> None:
+    try:
+        await git_.run("am", "--abort")
+    except git.exc.GitCommandError:
+        pass
+
+
+class WorktreePool:
+    """
+    A pool of `git worktree` checkouts of a single local clone.
+
+    Leasing and releasing checkouts runs git through `AsyncGit`, so that
+    cleaning up kernel-sized trees does not block the event loop.
+
+    All worktrees share the object store and the refs of the clone they were
+    created from, so a series applied in one of them is immediately visible
+    (as a branch) in all the others. Each worktree can only be used by a
+    single lease holder at a time, which allows several series to be applied
+    concurrently.
+
+    With a size of 0 the pool does not create any worktree and instead hands
+    out the clone itself, one lease at a time.
+    """
+
+    def __init__(self, path: str, size: int = 0) -> None:
+        self.path = path
+        self.size = size
+        self.repo: Optional[git.Repo] = None
+        self._free: asyncio.Queue[int] = asyncio.Queue()
+        for slot in range(max(size, 1)):
+            self._free.put_nowait(slot)
+
+    def worktree_path(self, slot: int) -> str:
+        return f"{self.path}_worktree{slot}"
+
+    def attach(self, repo: git.Repo) -> None:
+        """
+        Bind the pool to the (possibly freshly cloned) repository at `path`,
+        forgetting about worktrees whose directories disappeared.
+        """
+        self.repo = repo
+        if not self.size:
+            return
+        try:
+            repo.git.worktree("prune")
+        except git.exc.GitCommandError:
+            logger.exception(f"Failed to prune worktrees of {self.path}")
+
+    async def _remove(self, slot: int) -> None:
+        repo = none_throws(self.repo)
+        git_ = AsyncGit.for_repo(repo)
+        path = self.worktree_path(slot)
+        try:
+            await git_.run("worktree", "remove", "--force", path)
+        except git.exc.GitCommandError:
+            pass
+        await asyncio.to_thread(shutil.rmtree, path, ignore_errors=True)
+        await git_.run("worktree", "prune")
+
+    async def _open(self, slot: int) -> git.Repo:
+        """
+        Return the checkout for `slot` in a clean state, (re-)creating it if
+        it does not exist or was left unusable, e.g., by a crash in the
+        middle of `git am`.
+        """
+        repo = none_throws(self.repo)
+        if not self.size:
+            # The clone itself is never re-created, but is still cleaned up
+            # after a failed `git am`.
+            git_ = AsyncGit.for_repo(repo)
+            await _abort_am(git_)
+            await git_.run("reset", "--hard")
+            return repo
+
+        path = self.worktree_path(slot)
+        try:
+            worktree = git.Repo(path)
+            git_ = AsyncGit.for_repo(worktree)
+            await _abort_am(git_)
+            await git_.run("reset", "--hard")
+            await git_.run("clean", "-ffdx")
+            return worktree
+        except git.exc.GitError as e:
+            logger.warning(f"Worktree {path} is unusable, re-creating it: {e}")
+
+        await self._remove(slot)
+        await AsyncGit.for_repo(repo).run(
+            "worktree", "add", "--detach", "--force", path
+        )
+        return git.Repo(path)
+
+    async def _release(self, slot: int, worktree: git.Repo) -> None:
+        """
+        Detach the worktree from whatever branch it has checked out, so that
+        the branch can be checked out in another worktree.
+        """
+        if not self.size:
+            return
+        git_ = AsyncGit.for_repo(worktree)
+        try:
+            await _abort_am(git_)
+            await git_.run("checkout", "--detach", "--force")
+        except git.exc.GitCommandError:
+            logger.exception(f"Failed to release worktree {worktree.working_dir}")
+            await self._remove(slot)
+
+    @asynccontextmanager
+    async def lease(self) -> AsyncIterator[git.Repo]:
+        """
+        Lease a checkout for exclusive use, waiting for one to become
+        available if need be.
+        """
+        slot = await self._free.get()
+        try:
+            worktree = await self._open(slot)
+            try:
+                yield worktree
+            finally:
+                await self._release(slot, worktree)
+        finally:
+            self._free.put_nowait(slot)
@@ -0,0 +1,83 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+# pyre-unsafe
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from kernel_patches_daemon.apply_cache import ApplyResultCache
+
+
+class TestApplyResultCache(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+        self.path = os.path.join(self.tmp_dir, "apply_cache.json")
+
+    def test_get_put(self) -> None:
+        cache = ApplyResultCache(self.path)
+        key = ApplyResultCache.key("base", "digest")
+        self.assertIsNone(cache.get(key))
+
+        cache.put(key, {"head": "sha"})
+        self.assertEqual(cache.get(key), {"head": "sha"})
+
+        cache.drop(key)
+        self.assertIsNone(cache.get(key))
+
+    def test_persisted(self) -> None:
+        cache = ApplyResultCache(self.path)
+        cache.put("a", {"head": "sha"})
+        cache.put("b", {"error": "failed", "conflict": "diff"})
+        self.assertEqual(cache.get("b"), {"error": "failed", "conflict": "diff"})
+
+        # Only successful applies are persisted.
+        cache = ApplyResultCache(self.path)
+        self.assertEqual(cache.get("a"), {"head": "sha"})
+        self.assertIsNone(cache.get("b"))
+
+    def test_forget_failures(self) -> None:
+        cache = ApplyResultCache(self.path)
+        cache.put("a", {"head": "sha"})
+        cache.put("b", {"error": "failed", "conflict": "diff"})
+
+        cache.forget_failures()
+        self.assertEqual(cache.get("a"), {"head": "sha"})
+        self.assertIsNone(cache.get("b"))
+
+    def test_persisted_failures_ignored(self) -> None:
+        with open(self.path, "w") as f:
+            json.dump({"a": {"head": "sha"}, "b": {"error": "failed"}}, f)
+
+        cache = ApplyResultCache(self.path)
+        self.assertEqual(cache.get("a"), {"head": "sha"})
+        self.assertIsNone(cache.get("b"))
+
+    def test_bounded(self) -> None:
+        cache = ApplyResultCache(self.path, size=2)
+        cache.put("a", {"head": "a"})
+        cache.put("b", {"head": "b"})
+        # "a" becomes the most recently used entry, "b" gets evicted.
+        cache.get("a")
+        cache.put("c", {"head": "c"})
+
+        cache = ApplyResultCache(self.path, size=2)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), {"head": "a"})
+        self.assertEqual(cache.get("c"), {"head": "c"})
+
+    def test_corrupted(self) -> None:
+        with open(self.path, "w") as f:
+            f.write("{not json")
+
+        cache = ApplyResultCache(self.path)
+        self.assertIsNone(cache.get("a"))
+        cache.put("a", {"head": "a"})
+        self.assertEqual(ApplyResultCache(self.path).get("a"), {"head": "a"})
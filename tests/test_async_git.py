@@ -0,0 +1,99 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+# pyre-unsafe
+
+import asyncio
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+import git
+from git.exc import GitCommandError
+
+from kernel_patches_daemon.async_git import AsyncGit
+
+
+class TestAsyncGit(unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.mkdtemp()
+        self.repo = git.Repo.init(self.tmp_dir)
+        self.repo.git.config("user.name", "test")
+        self.repo.git.config("user.email", "test@test.com")
+        self.repo.index.commit("Initial commit\n")
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.tmp_dir)
+
+    async def test_run(self) -> None:
+        git_ = AsyncGit.for_repo(self.repo)
+        self.assertEqual(
+            await git_.run("rev-parse", "HEAD"), self.repo.head.commit.hexsha
+        )
+        self.assertEqual(await git_.run("log", "--format=%s"), "Initial commit")
+
+    async def test_stdin_and_env(self) -> None:
+        git_ = AsyncGit.for_repo(self.repo)
+        sha = await git_.run(
+            "commit-tree",
+            self.repo.head.commit.tree.hexsha,
+            stdin=b"message\n",
+            env={"GIT_AUTHOR_NAME": "author"},
+        )
+        commit = self.repo.commit(sha)
+        self.assertEqual(commit.message, "message\n")
+        self.assertEqual(commit.author.name, "author")
+
+    async def test_failure(self) -> None:
+        git_ = AsyncGit.for_repo(self.repo)
+        with self.assertRaises(GitCommandError) as cm:
+            await git_.run("rev-parse", "--verify", "refs/heads/missing")
+        self.assertEqual(cm.exception.status, 128)
+        self.assertIn("Needed a single revision", cm.exception.stderr)
+
+    async def test_timeout_kills_command(self) -> None:
+        git_ = AsyncGit(self.tmp_dir, timeout=0.2)
+        start = time.monotonic()
+        with self.assertRaises(GitCommandError):
+            await git_.run("-c", "alias.slow=!sleep 10", "slow")
+        self.assertLess(time.monotonic() - start, 5)
+
+    async def test_commands_serialized_per_repo(self) -> None:
+        other_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, other_dir)
+
+        # Equivalent paths share the lock; other repositories do not.
+        self.assertIs(
+            AsyncGit(self.tmp_dir).lock,
+            AsyncGit(os.path.join(self.tmp_dir, ".")).lock,
+        )
+        self.assertIsNot(AsyncGit(self.tmp_dir).lock, AsyncGit(other_dir).lock)
+
+        git_ = AsyncGit(self.tmp_dir)
+        async with git_.lock:
+            task = asyncio.create_task(git_.run("status"))
+            await asyncio.sleep(0.1)
+            self.assertFalse(task.done())
+        await task
+
+    async def test_to_thread_serialized(self) -> None:
+        git_ = AsyncGit.for_repo(self.repo)
+        lock = git_.lock
+
+        def head() -> str:
+            self.assertTrue(lock.locked())
+            return self.repo.git.rev_parse("HEAD")
+
+        self.assertEqual(await git_.to_thread(head), self.repo.head.commit.hexsha)
+        self.assertFalse(lock.locked())
+
+        async with lock:
+            task = asyncio.create_task(git_.to_thread(head))
+            await asyncio.sleep(0.1)
+            self.assertFalse(task.done())
+        await task
@@ -0,0 +1,68 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+# pyre-unsafe
+
+import asyncio
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock
+
+from kernel_patches_daemon.async_github import AsyncGithub
+
+
+class TestAsyncGithub(unittest.IsolatedAsyncioTestCase):
+    async def test_calls_run_off_the_loop_thread(self) -> None:
+        gh = AsyncGithub()
+        pr = MagicMock()
+        threads = []
+        pr.update.side_effect = lambda: threads.append(threading.get_ident())
+
+        await gh.update_pr(pr)
+        await gh.set_labels(pr, "a", "b")
+
+        pr.update.assert_called_once_with()
+        pr.set_labels.assert_called_once_with("a", "b")
+        self.assertNotEqual(threads, [threading.get_ident()])
+
+    async def test_lists_are_fetched(self) -> None:
+        gh = AsyncGithub()
+        repo = MagicMock()
+        repo.get_workflow_runs.return_value = iter(["run1", "run2"])
+        run = MagicMock()
+        run.jobs.return_value = iter(["job"])
+
+        self.assertEqual(
+            await gh.get_workflow_runs(repo, head_sha="sha"), ["run1", "run2"]
+        )
+        repo.get_workflow_runs.assert_called_once_with(head_sha="sha")
+        self.assertEqual(await gh.get_run_jobs(run), ["job"])
+
+    async def test_concurrency_is_bounded(self) -> None:
+        gh = AsyncGithub(max_workers=2)
+        lock = threading.Lock()
+        active = 0
+        max_active = 0
+
+        def slow_call() -> None:
+            nonlocal active, max_active
+            with lock:
+                active += 1
+                max_active = max(max_active, active)
+            time.sleep(0.05)
+            with lock:
+                active -= 1
+
+        await asyncio.gather(*(gh.call(slow_call) for _ in range(6)))
+        self.assertEqual(max_active, 2)
+
+    async def test_close(self) -> None:
+        gh = AsyncGithub()
+        await gh.call(lambda: None)
+        gh.close()
+        with self.assertRaises(RuntimeError):
+            await gh.call(lambda: None)
@@ -0,0 +1,103 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+# pyre-unsafe
+
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from kernel_patches_daemon.check_ledger import CheckLedger, LEDGER_RETENTION_SEC
+from kernel_patches_daemon.sqlite_db import REOPEN_INTERVAL_SEC
+
+
+class TestCheckLedger(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, "ledger.sqlite3")
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    def test_record_survives_reopening(self) -> None:
+        ledger = CheckLedger(self.path)
+        self.assertIsNone(ledger.get(1, "ctx"))
+        ledger.record(1, "ctx", "pending", "https://url")
+        ledger.record(1, "ctx", "success", "https://url")
+        ledger.close()
+
+        ledger = CheckLedger(self.path)
+        self.assertEqual(ledger.get(1, "ctx"), ("success", "https://url"))
+        self.assertIsNone(ledger.get(1, "other"))
+        self.assertIsNone(ledger.get(2, "ctx"))
+
+    def test_reconcile_interval(self) -> None:
+        ledger = CheckLedger(self.path, reconcile_interval=60)
+        with patch("kernel_patches_daemon.check_ledger.time.time", return_value=1000):
+            ledger.record(1, "ctx", "success", None)
+        with patch("kernel_patches_daemon.check_ledger.time.time", return_value=1060):
+            self.assertEqual(ledger.get(1, "ctx"), ("success", None))
+        with patch("kernel_patches_daemon.check_ledger.time.time", return_value=1061):
+            self.assertIsNone(ledger.get(1, "ctx"))
+
+    def test_retention(self) -> None:
+        ledger = CheckLedger(self.path, reconcile_interval=float("inf"))
+        with patch(
+            "kernel_patches_daemon.check_ledger.time.time",
+            return_value=1000 + LEDGER_RETENTION_SEC,
+        ):
+            ledger.record(1, "ctx", "success", None)
+            ledger.record(2, "ctx", "success", None)
+        with patch("kernel_patches_daemon.check_ledger.time.time", return_value=1000):
+            ledger.record(1, "ctx", "success", None)
+        ledger.close()
+
+        # Entries past their retention are deleted when the ledger is opened.
+        with patch(
+            "kernel_patches_daemon.check_ledger.time.time",
+            return_value=1001 + LEDGER_RETENTION_SEC,
+        ):
+            ledger = CheckLedger(self.path, reconcile_interval=float("inf"))
+            self.assertIsNone(ledger.get(1, "ctx"))
+            self.assertEqual(ledger.get(2, "ctx"), ("success", None))
+
+    def test_missing_directory(self) -> None:
+        """
+        The directory of the ledger is created if need be, e.g., before the
+        first clone of a fresh deployment.
+        """
+        path = os.path.join(self.tmp_dir.name, "missing", "ledger.sqlite3")
+        ledger = CheckLedger(path)
+        ledger.record(1, "ctx", "success", None)
+        self.assertEqual(ledger.get(1, "ctx"), ("success", None))
+        self.assertTrue(os.path.exists(path))
+
+    def test_unusable_database(self) -> None:
+        """
+        The ledger does nothing while the database cannot be opened, and
+        opens it again later.
+        """
+        # A directory cannot be opened as a database.
+        os.mkdir(self.path)
+        ledger = CheckLedger(self.path)
+        with patch("kernel_patches_daemon.sqlite_db.time.monotonic", return_value=1000):
+            ledger.record(1, "ctx", "success", None)
+            self.assertIsNone(ledger.get(1, "ctx"))
+
+        os.rmdir(self.path)
+        with patch(
+            "kernel_patches_daemon.sqlite_db.time.monotonic",
+            return_value=999 + REOPEN_INTERVAL_SEC,
+        ):
+            ledger.record(1, "ctx", "success", None)
+            self.assertIsNone(ledger.get(1, "ctx"))
+        with patch(
+            "kernel_patches_daemon.sqlite_db.time.monotonic",
+            return_value=1000 + REOPEN_INTERVAL_SEC,
+        ):
+            ledger.record(1, "ctx", "success", None)
+            self.assertEqual(ledger.get(1, "ctx"), ("success", None))
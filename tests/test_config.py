@@ -15,6 +15,7 @@ from unittest.mock import mock_open, patch
 
 from kernel_patches_daemon.config import (
     BranchConfig,
+    CloneConfig,
     EmailConfig,
     GithubAppAuthConfig,
     InvalidConfig,
@@ -222,6 +223,62 @@ class TestConfig(unittest.TestCase):
         )
         self.assertEqual(config, expected_config)
 
+    def test_max_concurrent_subjects(self) -> None:
+        kpd_config_json = load_kpd_config("kpd_config.json")
+        with patch("builtins.open", mock_open(read_data="TEST_KEY_FILE_CONTENT")):
+            config = KPDConfig.from_json(kpd_config_json)
+            self.assertEqual(config.max_concurrent_subjects, 1)
+
+            kpd_config_json["max_concurrent_subjects"] = 8
+            config = KPDConfig.from_json(kpd_config_json)
+            self.assertEqual(config.max_concurrent_subjects, 8)
+
+            for invalid in (0, -1, "8", True):
+                with self.subTest(value=invalid):
+                    kpd_config_json["max_concurrent_subjects"] = invalid
+                    with self.assertRaises(InvalidConfig):
+                        KPDConfig.from_json(kpd_config_json)
+
+    def test_worktree_pool_size(self) -> None:
+        kpd_config_json = load_kpd_config("kpd_config.json")
+        with patch("builtins.open", mock_open(read_data="TEST_KEY_FILE_CONTENT")):
+            config = KPDConfig.from_json(kpd_config_json)
+            self.assertEqual(config.worktree_pool_size, 0)
+
+            kpd_config_json["worktree_pool_size"] = 4
+            config = KPDConfig.from_json(kpd_config_json)
+            self.assertEqual(config.worktree_pool_size, 4)
+
+            for invalid in (-1, "4", True):
+                with self.subTest(value=invalid):
+                    kpd_config_json["worktree_pool_size"] = invalid
+                    with self.assertRaises(InvalidConfig):
+                        KPDConfig.from_json(kpd_config_json)
+
+    def test_clone(self) -> None:
+        kpd_config_json = load_kpd_config("kpd_config.json")
+        with patch("builtins.open", mock_open(read_data="TEST_KEY_FILE_CONTENT")):
+            config = KPDConfig.from_json(kpd_config_json)
+            self.assertEqual(config.clone, CloneConfig())
+            self.assertTrue(config.clone.is_full)
+
+            kpd_config_json["clone"] = {"filter": "blob:none", "depth": 500}
+            config = KPDConfig.from_json(kpd_config_json)
+            self.assertEqual(config.clone, CloneConfig(filter="blob:none", depth=500))
+            self.assertTrue(config.clone.is_shallow)
+            self.assertFalse(config.clone.is_full)
+
+            for invalid in (
+                {"depth": 0},
+                {"depth": "500"},
+                {"depth": True},
+                {"depth": 500, "shallow_since": "1 month ago"},
+            ):
+                with self.subTest(value=invalid):
+                    kpd_config_json["clone"] = invalid
+                    with self.assertRaises(InvalidConfig):
+                        KPDConfig.from_json(kpd_config_json)
+
 
 class TestEmailConfig(unittest.TestCase):
     """Tests for EmailConfig parsing."""
@@ -277,3 +334,22 @@ class TestEmailConfig(unittest.TestCase):
             }
         )
         self.assertEqual(cfg.email_ignore_workflows, [])
+
+    def test_patchwork_limits(self) -> None:
+        kpd_config_json = load_kpd_config("kpd_config.json")
+        with patch("builtins.open", mock_open(read_data="TEST_KEY_FILE_CONTENT")):
+            config = KPDConfig.from_json(kpd_config_json)
+            self.assertEqual(config.patchwork.max_connections, 32)
+            self.assertEqual(config.patchwork.max_backoff, 120.0)
+
+            kpd_config_json["patchwork"]["max_connections_per_host"] = 4
+            kpd_config_json["patchwork"]["keepalive_timeout"] = 7.5
+            config = KPDConfig.from_json(kpd_config_json)
+            self.assertEqual(config.patchwork.max_connections_per_host, 4)
+            self.assertEqual(config.patchwork.keepalive_timeout, 7.5)
+
+            for invalid in (0, -1, "8", True):
+                with self.subTest(value=invalid):
+                    kpd_config_json["patchwork"]["max_connections"] = invalid
+                    with self.assertRaises(InvalidConfig):
+                        KPDConfig.from_json(kpd_config_json)
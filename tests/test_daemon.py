@@ -6,7 +6,7 @@
 
 import unittest
 from typing import Any, Dict, List
-from unittest.mock import AsyncMock, MagicMock, patch
+from unittest.mock import AsyncMock, patch
 
 from kernel_patches_daemon.config import KPDConfig
 from kernel_patches_daemon.daemon import KernelPatchesWorker
@@ -62,13 +62,18 @@ class TestKernelPatchesWorker(unittest.IsolatedAsyncioTestCase):
         self.git_patcher.start()
         self.addCleanup(self.git_patcher.stop)
 
+        self.state_patcher = patch(
+            "kernel_patches_daemon.state_store.StateStore._connect", return_value=None
+        )
+        self.state_patcher.start()
+        self.addCleanup(self.state_patcher.stop)
+
         kpd_config = KPDConfig.from_json(TEST_CONFIG)
         self.worker = KernelPatchesWorker(
             kpd_config, {}, metrics_logger=metrics_logger_mock
         )
 
         self.worker.github_sync_worker.sync_patches = AsyncMock()
-        self.worker.reset_github_sync = MagicMock(return_value=True)
 
     async def test_run_ok(self) -> None:
         with (
@@ -83,12 +88,28 @@ class TestKernelPatchesWorker(unittest.IsolatedAsyncioTestCase):
         gh_sync = self.worker.github_sync_worker
         # pyrefly: ignore  # missing-attribute
         gh_sync.sync_patches.assert_called_once()
-        # pyrefly: ignore  # missing-attribute
-        self.worker.reset_github_sync.assert_called_once()
         self.assertEqual(len(LOGGED_METRICS), 1)
         stats = LOGGED_METRICS[0][self.worker.project]
         self.assertEqual(stats["runs_successful"], 1)
 
+    async def test_run_reuses_github_sync(self) -> None:
+        """The same GithubSync instance is used across loop iterations."""
+        gh_sync = self.worker.github_sync_worker
+
+        with (
+            patch(
+                "asyncio.sleep",
+                AsyncMock(side_effect=[None, TestException("Test complete")]),
+            ),
+            self.assertRaises(TestException),
+        ):
+            await self.worker.run()
+
+        self.assertIs(self.worker.github_sync_worker, gh_sync)
+        # pyrefly: ignore  # missing-attribute
+        self.assertEqual(gh_sync.sync_patches.call_count, 2)
+        self.assertEqual(len(LOGGED_METRICS), 2)
+
     async def test_run_exception(self) -> None:
         """Test that stats are correctly collected when an exception occurs."""
         gh_sync = self.worker.github_sync_worker
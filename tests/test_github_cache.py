@@ -0,0 +1,78 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+# pyre-unsafe
+
+import json
+import unittest
+from typing import Any, Dict, List
+
+from github import Github
+
+from kernel_patches_daemon.github_cache import ConditionalRequestCache
+
+
+class FakeServer:
+    """
+    Stands in for the HTTP connection underneath a PyGithub requester,
+    honoring If-None-Match.
+    """
+
+    def __init__(self) -> None:
+        self.etag = '"v1"'
+        self.body: Dict[str, Any] = {"name": "repo"}
+        self.requests: List[Dict[str, str]] = []
+
+    def request_raw(
+        self, cnx, verb, url, requestHeaders, input, stream=False, **kwargs
+    ):
+        self.requests.append(requestHeaders)
+        headers = {"etag": self.etag, "x-ratelimit-remaining": "4999"}
+        if requestHeaders.get("If-None-Match") == self.etag:
+            return 304, headers, ""
+        return 200, headers, json.dumps(self.body)
+
+
+class TestConditionalRequestCache(unittest.TestCase):
+    def setUp(self) -> None:
+        self.requester = Github()._Github__requester
+        self.server = FakeServer()
+        self.requester._Requester__requestRaw = self.server.request_raw
+        self.cache = ConditionalRequestCache()
+        self.cache.install(self.requester)
+
+    def get(self, url: str = "/repos/org/repo") -> Any:
+        _, data = self.requester.requestJsonAndCheck("GET", url)
+        return data
+
+    def test_not_modified_served_from_cache(self) -> None:
+        self.assertEqual(self.get()["name"], "repo")
+        self.assertNotIn("If-None-Match", self.server.requests[0])
+
+        self.assertEqual(self.get()["name"], "repo")
+        self.assertEqual(self.server.requests[1]["If-None-Match"], '"v1"')
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+
+    def test_modified_refreshes_cache(self) -> None:
+        self.get()
+        self.server.etag = '"v2"'
+        self.server.body = {"name": "renamed"}
+
+        self.assertEqual(self.get()["name"], "renamed")
+        self.assertEqual(self.get()["name"], "renamed")
+        self.assertEqual(self.server.requests[2]["If-None-Match"], '"v2"')
+
+    def test_only_gets_are_cached(self) -> None:
+        self.requester.requestJsonAndCheck("PATCH", "/repos/org/repo", input={})
+        self.get()
+        self.assertNotIn("If-None-Match", self.server.requests[1])
+
+    def test_eviction(self) -> None:
+        self.cache.size = 1
+        self.get("/repos/org/a")
+        self.get("/repos/org/b")
+        self.get("/repos/org/a")
+        self.assertNotIn("If-None-Match", self.server.requests[2])
@@ -96,6 +96,23 @@ class TestGithubConnector(unittest.TestCase):
         self._get_app_mock = get_app_patcher.start()
         self.addCleanup(get_app_patcher.stop)
 
+    def test_close(self) -> None:
+        """
+        A connector only closes the AsyncGithub it created itself.
+        """
+        gc = get_default_gc_oauth_client()
+        with patch.object(gc.async_github, "close") as close:
+            gc.close()
+            close.assert_called_once_with()
+
+        shared = MagicMock()
+        gc = GithubConnectorMock(
+            github_oauth_token="random_gh_oauth_token", async_github=shared
+        )
+        self.assertIs(gc.async_github, shared)
+        gc.close()
+        shared.close.assert_not_called()
+
     def test_oauth_get_repo_no_fallback(self) -> None:
         """
         We first try to get the repo from the logged user unless it throws an exception.
@@ -0,0 +1,148 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+# pyre-unsafe
+
+import unittest
+from typing import Any, Dict
+from unittest.mock import MagicMock
+
+from kernel_patches_daemon.github_graphql import (
+    fetch_open_pr_snapshots,
+    OPEN_PRS_QUERY,
+    PullRequestSnapshot,
+)
+
+
+def _pr_node(number: int, **kwargs: Any) -> Dict[str, Any]:
+    node = {
+        "number": number,
+        "state": "OPEN",
+        "headRefOid": f"sha{number}",
+        "labels": {"pageInfo": {"hasNextPage": False}, "nodes": [{"name": "bpf-next"}]},
+        "comments": {"nodes": []},
+        "commits": {"nodes": [{"commit": {"checkSuites": _connection([])}}]},
+    }
+    node.update(kwargs)
+    return node
+
+
+def _connection(nodes, has_next_page: bool = False) -> Dict[str, Any]:
+    return {"pageInfo": {"hasNextPage": has_next_page}, "nodes": nodes}
+
+
+def _suite(suite_id: int, runs, has_next_page: bool = False) -> Dict[str, Any]:
+    return {
+        "databaseId": suite_id,
+        "status": "COMPLETED",
+        "conclusion": "FAILURE",
+        "checkRuns": _connection(runs, has_next_page),
+    }
+
+
+def _page(nodes, end_cursor=None) -> Dict[str, Any]:
+    return {
+        "data": {
+            "repository": {
+                "pullRequests": {
+                    "pageInfo": {
+                        "hasNextPage": end_cursor is not None,
+                        "endCursor": end_cursor,
+                    },
+                    "nodes": nodes,
+                }
+            }
+        }
+    }
+
+
+class TestGithubGraphql(unittest.TestCase):
+    def test_snapshot_from_graphql(self) -> None:
+        node = _pr_node(
+            1,
+            comments={"nodes": [{"databaseId": 42}]},
+            commits={
+                "nodes": [
+                    {
+                        "commit": {
+                            "checkSuites": _connection(
+                                [
+                                    _suite(
+                                        7,
+                                        [
+                                            {
+                                                "databaseId": 8,
+                                                "status": "COMPLETED",
+                                                "conclusion": "FAILURE",
+                                            }
+                                        ],
+                                    )
+                                ]
+                            )
+                        }
+                    }
+                ]
+            },
+        )
+        self.assertEqual(
+            PullRequestSnapshot.from_graphql(node),
+            PullRequestSnapshot(
+                number=1,
+                state="OPEN",
+                head_sha="sha1",
+                labels=frozenset(["bpf-next"]),
+                last_comment_id=42,
+                check_suites=(
+                    ((7, "COMPLETED", "FAILURE"), ((8, "COMPLETED", "FAILURE"),)),
+                ),
+            ),
+        )
+
+    def test_snapshot_truncated(self) -> None:
+        snapshot = PullRequestSnapshot.from_graphql(_pr_node(1))
+        self.assertFalse(snapshot.labels_truncated)
+        self.assertFalse(snapshot.checks_truncated)
+
+        def commits(check_suites: Dict[str, Any]) -> Dict[str, Any]:
+            return {"nodes": [{"commit": {"checkSuites": check_suites}}]}
+
+        for name, node in [
+            ("suites", _pr_node(1, commits=commits(_connection([], True)))),
+            (
+                "runs",
+                _pr_node(1, commits=commits(_connection([_suite(7, [], True)]))),
+            ),
+        ]:
+            with self.subTest(name):
+                snapshot = PullRequestSnapshot.from_graphql(node)
+                self.assertTrue(snapshot.checks_truncated)
+                self.assertFalse(snapshot.labels_truncated)
+
+        snapshot = PullRequestSnapshot.from_graphql(
+            _pr_node(1, labels=_connection([], True))
+        )
+        self.assertTrue(snapshot.labels_truncated)
+        self.assertFalse(snapshot.checks_truncated)
+
+    def test_fetch_paginates(self) -> None:
+        requester = MagicMock()
+        requester.graphql_query.side_effect = [
+            ({}, _page([_pr_node(1), _pr_node(2)], end_cursor="c1")),
+            ({}, _page([_pr_node(3)])),
+        ]
+
+        snapshots = fetch_open_pr_snapshots(requester, "org", "repo", "base")
+
+        self.assertEqual(sorted(snapshots), [1, 2, 3])
+        self.assertEqual(snapshots[3].head_sha, "sha3")
+        self.assertEqual(requester.graphql_query.call_count, 2)
+        first, second = requester.graphql_query.call_args_list
+        self.assertEqual(first.args[0], OPEN_PRS_QUERY)
+        self.assertNotIn("cursor", first.args[1])
+        self.assertEqual(
+            second.args[1],
+            {"owner": "org", "name": "repo", "base": "base", "cursor": "c1"},
+        )
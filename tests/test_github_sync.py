@@ -6,8 +6,12 @@
 
 # pyre-unsafe
 
+import asyncio
 import copy
+import datetime
 import os
+import tempfile
+import time
 import unittest
 from dataclasses import dataclass
 from typing import Any, Dict, Optional
@@ -19,7 +23,8 @@ from kernel_patches_daemon.branch_worker import (
     NewPRWithNoChangeException,
 )
 from kernel_patches_daemon.config import KPDConfig, SERIES_TARGET_SEPARATOR
-from kernel_patches_daemon.github_sync import GithubSync
+from kernel_patches_daemon.github_sync import GithubSync, SyncedSubject
+from kernel_patches_daemon.patchwork_events import DirtySet
 from tests.common.patchwork_mock import init_pw_responses, PatchworkMock
 from tests.common.utils import load_test_data
 
@@ -83,6 +88,29 @@ class TestGithubSync(unittest.IsolatedAsyncioTestCase):
         patcher = patch("kernel_patches_daemon.branch_worker.git.Repo")
         self._git_repo_mock = patcher.start()
         self.addCleanup(patcher.stop)
+        patcher = patch("kernel_patches_daemon.branch_worker.AsyncGit")
+        async_git = patcher.start().for_repo.return_value
+        async_git.run = AsyncMock()
+        async_git.to_thread = AsyncMock(side_effect=lambda func, *args: func(*args))
+        self.addCleanup(patcher.stop)
+        patcher = patch("kernel_patches_daemon.worktree_pool.AsyncGit")
+        patcher.start().for_repo.return_value.run = AsyncMock()
+        self.addCleanup(patcher.stop)
+        # nor writes of apply results to disk
+        patcher = patch("kernel_patches_daemon.apply_cache.ApplyResultCache.save")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        # nor reads or writes of the state store
+        self._state_store_patcher = patch(
+            "kernel_patches_daemon.state_store.StateStore._connect", return_value=None
+        )
+        self._state_store_patcher.start()
+        self.addCleanup(self._state_store_patcher.stop)
+        self._save_state_patcher = patch(
+            "kernel_patches_daemon.github_sync.GithubSync.save_state"
+        )
+        self._save_state_patcher.start()
+        self.addCleanup(self._save_state_patcher.stop)
 
         self._gh = GithubSyncMock()
         for worker in self._gh.workers.values():
@@ -126,6 +154,71 @@ class TestGithubSync(unittest.IsolatedAsyncioTestCase):
                     gh.workers[TEST_BRANCH].ci_repo_dir.startswith(case.prefix),
                 )
 
+    def test_rebuild_failed_workers(self) -> None:
+        """Only branches without a live worker get a new BranchWorker."""
+        healthy_worker = self._gh.workers[TEST_BRANCH]
+        self._gh.drop_worker(TEST_BPF_NEXT_BRANCH)
+        self.assertNotIn(TEST_BPF_NEXT_BRANCH, self._gh.workers)
+
+        self._gh.rebuild_failed_workers()
+
+        self.assertIs(self._gh.workers[TEST_BRANCH], healthy_worker)
+        self.assertIn(TEST_BPF_NEXT_BRANCH, self._gh.workers)
+        self.assertEqual(self._gh.stats["worker_failures"], 1)
+
+    def test_workers_share_async_github(self) -> None:
+        """
+        Workers share the AsyncGithub of GithubSync, which outlives dropped
+        workers.
+        """
+        worker = self._gh.workers[TEST_BRANCH]
+        self.assertIs(worker.async_github, self._gh.async_github)
+        self.assertIs(
+            self._gh.workers[TEST_BPF_NEXT_BRANCH].async_github, self._gh.async_github
+        )
+
+        with (
+            patch.object(worker, "close", wraps=worker.close) as close,
+            patch.object(self._gh.async_github, "close") as async_github_close,
+        ):
+            self._gh.drop_worker(TEST_BRANCH)
+            close.assert_called_once_with()
+            async_github_close.assert_not_called()
+
+    def test_rebuild_failed_workers_creation_error(self) -> None:
+        """A worker that cannot be created is skipped and retried later."""
+        self._gh.drop_worker(TEST_BPF_NEXT_BRANCH)
+        with patch.object(
+            self._gh, "_create_worker", side_effect=Exception("GitHub is down")
+        ):
+            self._gh.rebuild_failed_workers()
+        self.assertNotIn(TEST_BPF_NEXT_BRANCH, self._gh.workers)
+
+        self._gh.rebuild_failed_workers()
+        self.assertIn(TEST_BPF_NEXT_BRANCH, self._gh.workers)
+
+    async def test_sync_patches_drops_failed_worker(self) -> None:
+        """A worker failing to refresh is dropped without aborting the cycle."""
+        failing_worker = self._gh.workers[TEST_BRANCH]
+        failing_worker.fetch_repo_branch = MagicMock(side_effect=Exception("boom"))
+        healthy_worker = self._gh.workers[TEST_BPF_NEXT_BRANCH]
+        healthy_worker.fetch_repo_branch = MagicMock()
+        healthy_worker.get_pulls = MagicMock()
+        healthy_worker.do_sync = MagicMock()
+        healthy_worker.update_e2e_test_branch_and_update_pr = MagicMock()
+        healthy_worker.expire_branches = MagicMock()
+        healthy_worker.expire_user_prs = MagicMock()
+        self._gh.pw.get_relevant_subjects = AsyncMock(return_value=[])
+
+        await self._gh.sync_patches()
+
+        self.assertNotIn(TEST_BRANCH, self._gh.workers)
+        healthy_worker.update_e2e_test_branch_and_update_pr.assert_called_once_with(
+            TEST_BPF_NEXT_BRANCH
+        )
+        healthy_worker.expire_branches.assert_called_once()
+        self.assertEqual(self._gh.stats["worker_failures"], 1)
+
     def test_close_existing_prs_for_series(self) -> None:
         matching_pr_mock = MagicMock()
         matching_pr_mock.title = "matching"
@@ -288,6 +381,158 @@ class TestGithubSync(unittest.IsolatedAsyncioTestCase):
             list(self._gh.workers.values()), pr_mock
         )
 
+    async def test_sync_relevant_subject_clean(self) -> None:
+        """Subjects that did not change since last synced are not applied again."""
+        series_branch_name = f"series/987654{SERIES_TARGET_SEPARATOR}{TEST_BRANCH}"
+        subject_mock, series_mock = self._setup_sync_relevant_subject_mocks()
+        series_mock.patches = [{"id": 1}]
+        pr_mock = MagicMock()
+        pr_mock.head.ref = series_branch_name
+
+        self._gh.get_mapped_branches = AsyncMock(return_value=[TEST_BRANCH])
+        self._gh.checkout_and_patch_safe = AsyncMock(return_value=pr_mock)
+        self._gh.close_existing_prs_for_series = MagicMock()
+        worker_mock = self._gh.workers[TEST_BRANCH]
+        worker_mock.sync_checks = AsyncMock()
+        worker_mock.forward_pr_comments = AsyncMock()
+        worker_mock.subject_to_branch = AsyncMock(return_value=series_branch_name)
+        worker_mock.try_apply_mailbox_series = AsyncMock(
+            return_value=(True, None, None)
+        )
+        worker_mock.prs = {subject_mock.subject: pr_mock}
+
+        # Changes are unknown: the subject is applied.
+        self._gh.dirty = None
+        await self._gh.sync_relevant_subject(subject_mock)
+        self.assertEqual(self._gh.checkout_and_patch_safe.call_count, 1)
+
+        # Nothing changed: only checks and comments are synced.
+        self._gh.dirty = DirtySet()
+        await self._gh.sync_relevant_subject(subject_mock)
+        self.assertEqual(self._gh.checkout_and_patch_safe.call_count, 1)
+        self.assertEqual(worker_mock.sync_checks.call_count, 2)
+        self.assertEqual(worker_mock.forward_pr_comments.call_count, 2)
+
+        # One of its patches changed.
+        self._gh.dirty = DirtySet(patch_ids={1})
+        await self._gh.sync_relevant_subject(subject_mock)
+        self.assertEqual(self._gh.checkout_and_patch_safe.call_count, 2)
+
+        # Upstream moved.
+        self._gh.dirty = DirtySet()
+        worker_mock.upstream_sha = "new"
+        await self._gh.sync_relevant_subject(subject_mock)
+        self.assertEqual(self._gh.checkout_and_patch_safe.call_count, 3)
+        await self._gh.sync_relevant_subject(subject_mock)
+        self.assertEqual(self._gh.checkout_and_patch_safe.call_count, 3)
+
+        # One of its patches changed, but syncing it failed early.
+        self._gh.dirty = DirtySet(patch_ids={1})
+        series_mock.all_tags.side_effect = Exception("Patchwork is down")
+        with self.assertRaises(Exception):
+            await self._gh.sync_relevant_subject(subject_mock)
+        self.assertNotIn(subject_mock.subject, self._gh.synced_subjects)
+        # The change was consumed already: it still gets applied next cycle.
+        self._gh.dirty = DirtySet()
+        series_mock.all_tags.side_effect = None
+        await self._gh.sync_relevant_subject(subject_mock)
+        self.assertEqual(self._gh.checkout_and_patch_safe.call_count, 4)
+
+    def test_state_warm_start(self) -> None:
+        """State saved by a run is loaded by the next one."""
+        self._state_store_patcher.stop()
+        self._save_state_patcher.stop()
+        date = datetime.datetime(2010, 7, 23)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            config = copy.copy(TEST_CONFIG)
+            config["base_directory"] = tmp_dir
+            kpd_config = KPDConfig.from_json(config)
+            gh = GithubSyncMock(kpd_config=kpd_config)
+            gh.pw.series_index = {0: {1: date}}
+            gh.pw.high_water_marks = {0: date}
+            gh.pw.last_full_scan = time.monotonic() - 60
+            gh.pw_events.high_water_mark = date
+            gh.pw_events.last_full_scan = time.monotonic() - 60
+            gh.synced_subjects = {
+                "subject": SyncedSubject(1, TEST_BRANCH, ((TEST_BRANCH, "a", "b"),))
+            }
+            worker = gh.workers[TEST_BRANCH]
+            worker.upstream_sha = "a"
+            worker.e2e_synced_key = ("a", "b")
+            worker.pr_base_commits = {"base": (("a", "b"), "c")}
+            worker.closed_pr_index = {"series/1=>branch": (42, 1000.0)}
+            worker.closed_prs_synced_at = 1000.0
+            gh.save_state()
+            gh.state_store.close()
+
+            restarted = GithubSyncMock(kpd_config=kpd_config)
+            restarted.state_store.close()
+
+        self.assertEqual(restarted.pw.series_index, {0: {1: date}})
+        self.assertEqual(restarted.pw.high_water_marks, {0: date})
+        self.assertAlmostEqual(
+            restarted.pw.last_full_scan, time.monotonic() - 60, delta=5
+        )
+        self.assertEqual(restarted.pw_events.high_water_mark, date)
+        self.assertEqual(restarted.synced_subjects, gh.synced_subjects)
+        worker = restarted.workers[TEST_BRANCH]
+        self.assertEqual(worker.upstream_sha, "a")
+        self.assertEqual(worker.e2e_synced_key, ("a", "b"))
+        self.assertEqual(worker.pr_base_commits, {"base": (("a", "b"), "c")})
+        self.assertEqual(worker.closed_pr_index, {"series/1=>branch": (42, 1000.0)})
+        self.assertEqual(worker.closed_prs_synced_at, 1000.0)
+
+    async def test_sync_relevant_subjects_bounded_concurrency(self) -> None:
+        """Subjects are synced concurrently, up to max_concurrent_subjects."""
+        self._gh.max_concurrent_subjects = 3
+        in_flight = 0
+        max_in_flight = 0
+        synced = []
+
+        async def fake_sync(subject):
+            nonlocal in_flight, max_in_flight
+            in_flight += 1
+            max_in_flight = max(max_in_flight, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            synced.append(subject)
+
+        self._gh.sync_relevant_subject = fake_sync
+        subjects = [MagicMock() for _ in range(10)]
+
+        await self._gh.sync_relevant_subjects(subjects)
+
+        self.assertEqual(max_in_flight, 3)
+        self.assertCountEqual(synced, subjects)
+
+    async def test_sync_relevant_subjects_failure(self) -> None:
+        """
+        Failures do not interrupt other subjects: all of them are logged, and
+        the first one is propagated as-is.
+        """
+        self._gh.max_concurrent_subjects = 2
+        finished = []
+
+        async def fake_sync(subject):
+            if subject.subject.startswith("bad"):
+                raise ValueError(subject.subject)
+            await asyncio.sleep(0.01)
+            finished.append(subject.subject)
+
+        self._gh.sync_relevant_subject = fake_sync
+        subjects = [
+            MagicMock(subject=name) for name in ("good", "bad1", "other", "bad2")
+        ]
+
+        with patch("kernel_patches_daemon.github_sync.logger") as logger:
+            with self.assertRaisesRegex(ValueError, "^bad1$"):
+                await self._gh.sync_relevant_subjects(subjects)
+        self.assertCountEqual(finished, ["good", "other"])
+        self.assertEqual(
+            [call.args[0] for call in logger.error.call_args_list],
+            ["Failed to sync subject bad1", "Failed to sync subject bad2"],
+        )
+
     def _setup_test_select_target_branches_for_subject(self):
         series_prefix = "series/123123"
         subject_mock = MagicMock()
@@ -0,0 +1,57 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+# pyre-unsafe
+
+import unittest
+
+from kernel_patches_daemon.http_cache import CachedResponse, HttpCache
+from multidict import CIMultiDict, CIMultiDictProxy, MultiDict, MultiDictProxy
+from yarl import URL
+
+
+def _response(body: bytes, **headers: str) -> CachedResponse:
+    return CachedResponse(
+        URL("https://127.0.0.1/"),
+        200,
+        CIMultiDictProxy(CIMultiDict(headers)),
+        MultiDictProxy(MultiDict()),
+        body,
+    )
+
+
+class TestHttpCache(unittest.IsolatedAsyncioTestCase):
+    async def test_response(self) -> None:
+        resp = _response(b'{"a": 1}', ETag='"v1"')
+        self.assertEqual(await resp.json(), {"a": 1})
+        self.assertEqual(await resp.read(), b'{"a": 1}')
+        self.assertEqual(resp.validators(), {"If-None-Match": '"v1"'})
+        resp = _response(b"", **{"Last-Modified": "yesterday"})
+        self.assertEqual(resp.validators(), {"If-Modified-Since": "yesterday"})
+
+    def test_is_cacheable(self) -> None:
+        headers = CIMultiDictProxy(CIMultiDict(etag='"v1"'))
+        self.assertTrue(HttpCache.is_cacheable(200, headers))
+        self.assertFalse(HttpCache.is_cacheable(404, headers))
+        self.assertFalse(HttpCache.is_cacheable(200, CIMultiDictProxy(CIMultiDict())))
+
+    def test_eviction_by_size(self) -> None:
+        cache = HttpCache(max_bytes=10)
+        cache.put("a", _response(b"12345"))
+        cache.put("b", _response(b"12345"))
+        # Using "a" makes "b" the least recently used response.
+        self.assertIsNotNone(cache.get("a"))
+        cache.put("c", _response(b"1"))
+        self.assertIsNone(cache.get("b"))
+        self.assertIsNotNone(cache.get("a"))
+        self.assertEqual(cache.size, 6)
+
+        # Responses larger than the cache are not kept.
+        cache.put("d", _response(b"12345678901"))
+        self.assertIsNone(cache.get("d"))
+
+        cache.drop("a")
+        self.assertEqual(cache.size, 1)
@@ -0,0 +1,53 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+# pyre-unsafe
+
+import unittest
+from unittest.mock import patch
+
+from kernel_patches_daemon.http_throttle import AdaptiveThrottle, parse_retry_after
+
+
+class TestAdaptiveThrottle(unittest.IsolatedAsyncioTestCase):
+    def test_parse_retry_after(self) -> None:
+        self.assertEqual(parse_retry_after("12"), 12.0)
+        self.assertEqual(parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT"), 0.0)
+        self.assertIsNone(parse_retry_after(None))
+        self.assertIsNone(parse_retry_after("soon"))
+
+    @patch("kernel_patches_daemon.http_throttle.time.monotonic", return_value=100.0)
+    def test_backoff(self, _) -> None:
+        throttle = AdaptiveThrottle(min_backoff=1, max_backoff=5)
+        for backoff in (1, 2, 4, 5):
+            throttle.record(429, {})
+            self.assertEqual(throttle.backoff, backoff)
+        self.assertEqual(throttle.paused_until, 105.0)
+
+        throttle.record(200, {})
+        self.assertEqual(throttle.backoff, 2.5)
+        throttle.record(200, {})
+        throttle.record(200, {})
+        self.assertEqual(throttle.backoff, 0)
+
+    @patch("kernel_patches_daemon.http_throttle.time.monotonic", return_value=100.0)
+    def test_retry_after(self, _) -> None:
+        throttle = AdaptiveThrottle(min_backoff=1, max_backoff=60)
+        throttle.record(503, {"Retry-After": "30"})
+        self.assertEqual(throttle.paused_until, 130.0)
+        # Retry-After is capped as well.
+        throttle.record(503, {"Retry-After": "3600"})
+        self.assertEqual(throttle.paused_until, 160.0)
+
+    async def test_wait(self) -> None:
+        throttle = AdaptiveThrottle(min_backoff=0.05)
+        await throttle.wait()
+        throttle.record(429, {})
+        with patch("asyncio.sleep") as sleep:
+            sleep.side_effect = lambda _: setattr(throttle, "paused_until", 0)
+            await throttle.wait()
+            sleep.assert_called_once()
+            self.assertLessEqual(sleep.call_args.args[0], 0.05)
@@ -6,23 +6,34 @@
 
 # pyre-unsafe
 
+import asyncio
 import copy
 import datetime
 import os
 import re
+import tempfile
 import unittest
 from dataclasses import dataclass
 from typing import Any, Callable, Dict, List, Optional, Set, Union
+from unittest.mock import AsyncMock, MagicMock, patch
 
 from aioresponses import aioresponses
 from freezegun import freeze_time
-from kernel_patches_daemon.patchwork import parse_tags, RELEVANT_STATES, Subject, TTL
+from kernel_patches_daemon.check_ledger import CheckLedger
+from kernel_patches_daemon.patchwork import (
+    FULL_RESCAN_INTERVAL_SEC,
+    invalidate,
+    parse_tags,
+    RELEVANT_STATES,
+    Subject,
+    TTL,
+)
 from kernel_patches_daemon.status import Status
 from multidict import MultiDict
 from pyre_extensions import none_throws
 from tests.common.patchwork_mock import (
     DEFAULT_CHECK_CTX,
-    DEFAULT_CHECK_CTX_QUERY,
+    DEFAULT_CHECKS_QUERY,
     DEFAULT_FREEZE_DATE,
     DEFAULT_TEST_RESPONSES,
     FOO_SERIES_FIRST,
@@ -33,6 +44,7 @@ from tests.common.patchwork_mock import (
     PatchworkMock,
 )
 from tests.common.utils import load_test_data
+from yarl import URL
 
 
 class PatchworkTestCase(unittest.IsolatedAsyncioTestCase):
@@ -60,6 +72,90 @@ class TestPatchwork(PatchworkTestCase):
         json_resp = await resp.json()
         self.assertEqual(json_resp["key1"], "value1")
 
+    @aioresponses()
+    async def test_get_revalidates_cached_response(self, m: aioresponses) -> None:
+        """
+        Responses with an ETag are revalidated, and served from the cache when
+        not modified.
+        """
+        url = "https://127.0.0.1/api/1.1/object/?a=1"
+        m.get(url, status=200, body=b'{"key": 1}', headers={"ETag": '"v1"'})
+        m.get(url, status=304)
+        m.get(url, status=200, body=b'{"key": 2}')
+
+        for expected in (1, 1, 2):
+            # pyrefly: ignore  # missing-attribute
+            resp = await self._pw._Patchwork__get("object/", params={"a": "1"})
+            self.assertEqual((await resp.json())["key"], expected)
+
+        calls = m.requests[("GET", URL(url))]
+        self.assertIsNone(calls[0].kwargs["headers"])
+        self.assertEqual(calls[1].kwargs["headers"], {"If-None-Match": '"v1"'})
+        self.assertEqual(calls[2].kwargs["headers"], {"If-None-Match": '"v1"'})
+        # The last response had no ETag: it is not cached.
+        self.assertIsNone(self._pw.http_cache.get(url))
+
+    @aioresponses()
+    async def test_concurrent_gets_coalesced(self, m: aioresponses) -> None:
+        """
+        Concurrent GETs of the same URL, whatever the order of their
+        parameters, share a single request.
+        """
+        url = "https://127.0.0.1/api/1.1/object/?a=1&b=2"
+        m.get(url, status=200, body=b'{"key": 1}')
+        m.get(url, status=200, body=b'{"key": 2}')
+
+        responses = await asyncio.gather(
+            # pyrefly: ignore  # missing-attribute
+            self._pw._Patchwork__get("object/", params={"a": "1", "b": "2"}),
+            # pyrefly: ignore  # missing-attribute
+            self._pw._Patchwork__get("object/", params={"b": "2", "a": "1"}),
+            # pyrefly: ignore  # missing-attribute
+            self._pw._Patchwork__get("object/?b=2", params={"a": "1"}),
+        )
+        for resp in responses:
+            self.assertEqual((await resp.json())["key"], 1)
+        self.assertEqual(len(m.requests[("GET", URL(url))]), 1)
+        self.assertEqual(self._pw.inflight_gets, {})
+
+        # Once completed, the GET is issued again.
+        # pyrefly: ignore  # missing-attribute
+        resp = await self._pw._Patchwork__get("object/", params={"a": "1", "b": "2"})
+        self.assertEqual((await resp.json())["key"], 2)
+
+    @aioresponses()
+    async def test_throttled_request_retried(self, m: aioresponses) -> None:
+        url = "https://127.0.0.1/api/1.1/object/"
+        m.get(url, status=429)
+        m.get(url, status=200, body=b'{"key": 1}')
+
+        # pyrefly: ignore  # missing-attribute
+        resp = await self._pw._Patchwork__get("object/")
+        self.assertEqual((await resp.json())["key"], 1)
+        self.assertEqual(len(m.requests[("GET", URL(url))]), 2)
+
+    async def test_throttle_trace_hooks(self) -> None:
+        """
+        Every response, retries included, adapts the pause of the requests.
+        """
+        params = MagicMock()
+        params.response.status = 503
+        params.response.headers = {"Retry-After": "5"}
+        await self._pw.record_throttle(None, None, params)
+        self.assertEqual(self._pw.throttle.backoff, 1)
+        self.assertGreater(self._pw.throttle.paused_until, 0)
+
+        with patch.object(self._pw.throttle, "wait") as wait:
+            await self._pw.wait_throttle(None, None, None)
+            wait.assert_awaited_once()
+
+    async def test_connection_limits(self) -> None:
+        pw = get_default_pw_client(max_connections=4, max_connections_per_host=2)
+        session = await pw.get_http_session()
+        connector = session._client.connector
+        self.assertEqual((connector.limit, connector.limit_per_host), (4, 2))
+        await session.close()
+
     @aioresponses()
     async def test_post_wrapper(self, m: aioresponses) -> None:
         """
@@ -340,8 +436,152 @@ class TestPatchwork(PatchworkTestCase):
         """
         await self._test_lookback(m, -1, lambda url: self.assertNotIn("since=", url))
 
+    @freeze_time(DEFAULT_FREEZE_DATE)
+    async def test_get_relevant_subjects_incremental(self) -> None:
+        """
+        After a full listing, only patches dated after the latest one seen are
+        listed, and series seen before remain known.
+        """
+        self._pw = get_default_pw_client(lookback_in_days=7)
+
+        def patch_json(series_id: int, date: str) -> Dict[str, Any]:
+            return {"date": date, "series": [{"id": series_id, "name": "foo"}]}
+
+        listings = [
+            [patch_json(1, "2010-07-22T12:00:00")],
+            [patch_json(2, "2010-07-22T20:00:00")],
+            [],
+        ]
+        since = []
+
+        async def get_objects_recursive(object_type, params):
+            since.append(params["since"])
+            return listings.pop(0)
+
+        requested_series = []
+
+        async def get_series_by_id(series_id: int) -> MagicMock:
+            requested_series.append(series_id)
+            series = MagicMock()
+            series.subject = f"subject {series_id}"
+            return series
+
+        with (
+            patch.object(
+                self._pw,
+                "_Patchwork__get_objects_recursive",
+                side_effect=get_objects_recursive,
+            ),
+            patch.object(self._pw, "get_series_by_id", side_effect=get_series_by_id),
+            patch.object(Subject, "latest_series", AsyncMock(return_value=None)),
+        ):
+            await self._pw.get_relevant_subjects()
+            await self._pw.get_relevant_subjects()
+            # A full listing is due.
+            self._pw.last_full_scan -= FULL_RESCAN_INTERVAL_SEC
+            await self._pw.get_relevant_subjects()
+
+        self.assertEqual(
+            since,
+            [
+                "2010-07-16T00:00:00",
+                # The latest patch date, minus the margin.
+                "2010-07-22T06:00:00",
+                "2010-07-16T00:00:00",
+            ],
+        )
+        # Series 1 is still known when series 2 gets listed. The last full
+        # listing starts over from what it lists.
+        self.assertEqual(requested_series, [1, 1, 2])
+
+    async def test_get_relevant_subjects_lookback_moves(self) -> None:
+        """
+        The lookback window moves forward with each cycle, and series whose
+        latest patch left it are no longer relevant.
+        """
+        self._pw = get_default_pw_client(lookback_in_days=7)
+
+        listings = [
+            [{"date": "2010-07-22T12:00:00", "series": [{"id": 1, "name": "foo"}]}],
+            [],
+        ]
+        since = []
+
+        async def get_objects_recursive(object_type, params):
+            since.append(params["since"])
+            return listings.pop(0)
+
+        requested_series = []
+
+        async def get_series_by_id(series_id: int) -> MagicMock:
+            requested_series.append(series_id)
+            series = MagicMock()
+            series.subject = f"subject {series_id}"
+            return series
+
+        with (
+            patch.object(
+                self._pw,
+                "_Patchwork__get_objects_recursive",
+                side_effect=get_objects_recursive,
+            ),
+            patch.object(self._pw, "get_series_by_id", side_effect=get_series_by_id),
+            patch.object(Subject, "latest_series", AsyncMock(return_value=None)),
+        ):
+            with freeze_time(DEFAULT_FREEZE_DATE):
+                await self._pw.get_relevant_subjects()
+            with freeze_time("2010-08-01T00:00:00"):
+                await self._pw.get_relevant_subjects()
+
+        self.assertEqual(since[0], "2010-07-16T00:00:00")
+        # The incremental listing starts at the moved lookback window, past
+        # the latest patch seen.
+        self.assertEqual(since[1], "2010-07-25T00:00:00")
+        self.assertEqual(self._pw.since, "2010-07-25T00:00:00")
+        # Series 1 left the lookback window.
+        self.assertEqual(requested_series, [1])
+        self.assertEqual(self._pw.series_index, {0: {}})
+
 
 class TestSeries(PatchworkTestCase):
+    @aioresponses()
+    async def test_get_patches_memoized(self, m: aioresponses) -> None:
+        """
+        Concurrent callers of a memoized method share a single call, and
+        results are memoized per series.
+        """
+        init_pw_responses(m, DEFAULT_TEST_RESPONSES)
+        series = await self._pw.get_series_by_id(665)
+        other = await self._pw.get_series_by_id(666)
+        with patch.object(
+            self._pw, "get_patch_by_id", wraps=self._pw.get_patch_by_id
+        ) as get_patch:
+            await asyncio.gather(
+                series.is_closed(), series.visible_tags(), series.all_tags()
+            )
+            self.assertEqual(get_patch.call_count, len(series.patches))
+            await other.get_patches()
+            self.assertEqual(
+                get_patch.call_count, len(series.patches) + len(other.patches)
+            )
+
+            invalidate(series, "get_patches")
+            await series.get_patches()
+            self.assertEqual(
+                get_patch.call_count, 2 * len(series.patches) + len(other.patches)
+            )
+
+    @aioresponses()
+    async def test_get_patches_failure_not_memoized(self, m: aioresponses) -> None:
+        init_pw_responses(m, DEFAULT_TEST_RESPONSES)
+        series = await self._pw.get_series_by_id(665)
+        with patch.object(
+            self._pw, "get_patch_by_id", side_effect=RuntimeError("boom")
+        ):
+            with self.assertRaises(RuntimeError):
+                await series.get_patches()
+        self.assertEqual(len(await series.get_patches()), len(series.patches))
+
     @aioresponses()
     async def test_series_closed(self, m: aioresponses) -> None:
         """
@@ -469,33 +709,6 @@ class TestSeries(PatchworkTestCase):
         with freeze_time(now):
             self.assertFalse(await series.is_expired())
 
-    @aioresponses()
-    async def test_get_latest_check_for_patch(self, m: aioresponses) -> None:
-        """
-        Tests `get_latest_check_for_patch` function,
-        which now makes a GET request with additional queries to ensure that
-        it's fetching single latest data with matching context value
-        """
-        # space intentional to test urlencoding
-        CTX = "vmtest bpf-next-PR"
-        # not using requests.utils.requote_uri() since that encodes space to %20, while requests.get() encodes space to +
-        CTX_URLENCODED = "vmtest+bpf-next-PR"
-        EXPECTED_ID = 42
-        contexts_responses = {
-            f"https://127.0.0.1/api/1.1/patches/12859379/checks/?context={CTX_URLENCODED}&order=-date&per_page=1": [
-                {
-                    "context": CTX,
-                    "date": "2010-01-02T00:00:00",
-                    "state": "pending",
-                    "id": EXPECTED_ID,
-                },
-            ],
-        }
-        init_pw_responses(m, contexts_responses)
-
-        check = await self._pw.get_latest_check_for_patch(12859379, CTX)
-        self.assertEqual(check["id"], EXPECTED_ID)
-
     @aioresponses()
     async def test_series_checks_update_all_diffs(self, m: aioresponses) -> None:
         """
@@ -506,7 +719,7 @@ class TestSeries(PatchworkTestCase):
         contexts_responses.update(
             {
                 # Patch with existing context
-                f"https://127.0.0.1/api/1.1/patches/6651/checks/{DEFAULT_CHECK_CTX_QUERY}": [
+                f"https://127.0.0.1/api/1.1/patches/6651/checks/{DEFAULT_CHECKS_QUERY}": [
                     {
                         "context": DEFAULT_CHECK_CTX,
                         "date": "2010-01-01T00:00:00",
@@ -514,8 +727,8 @@ class TestSeries(PatchworkTestCase):
                     },
                 ],
                 # Patches without existing context
-                f"https://127.0.0.1/api/1.1/patches/6652/checks/{DEFAULT_CHECK_CTX_QUERY}": [],
-                f"https://127.0.0.1/api/1.1/patches/6653/checks/{DEFAULT_CHECK_CTX_QUERY}": [],
+                f"https://127.0.0.1/api/1.1/patches/6652/checks/{DEFAULT_CHECKS_QUERY}": [],
+                f"https://127.0.0.1/api/1.1/patches/6653/checks/{DEFAULT_CHECKS_QUERY}": [],
             }
         )
 
@@ -548,7 +761,7 @@ class TestSeries(PatchworkTestCase):
         contexts_responses.update(
             {
                 # Patch with existing context
-                f"https://127.0.0.1/api/1.1/patches/6651/checks/{DEFAULT_CHECK_CTX_QUERY}": [
+                f"https://127.0.0.1/api/1.1/patches/6651/checks/{DEFAULT_CHECKS_QUERY}": [
                     {
                         "context": DEFAULT_CHECK_CTX,
                         "date": "2010-01-01T00:00:00",
@@ -557,8 +770,8 @@ class TestSeries(PatchworkTestCase):
                     },
                 ],
                 # Patches without existing context
-                f"https://127.0.0.1/api/1.1/patches/6652/checks/{DEFAULT_CHECK_CTX_QUERY}": [],
-                f"https://127.0.0.1/api/1.1/patches/6653/checks/{DEFAULT_CHECK_CTX_QUERY}": [],
+                f"https://127.0.0.1/api/1.1/patches/6652/checks/{DEFAULT_CHECKS_QUERY}": [],
+                f"https://127.0.0.1/api/1.1/patches/6653/checks/{DEFAULT_CHECKS_QUERY}": [],
             }
         )
 
@@ -590,7 +803,7 @@ class TestSeries(PatchworkTestCase):
         contexts_responses.update(
             {
                 # Patch with existing context
-                f"https://127.0.0.1/api/1.1/patches/6651/checks/{DEFAULT_CHECK_CTX_QUERY}": [
+                f"https://127.0.0.1/api/1.1/patches/6651/checks/{DEFAULT_CHECKS_QUERY}": [
                     {
                         "context": DEFAULT_CHECK_CTX,
                         "date": "2010-01-01T00:00:00",
@@ -600,8 +813,8 @@ class TestSeries(PatchworkTestCase):
                     },
                 ],
                 # Patches without existing context
-                f"https://127.0.0.1/api/1.1/patches/6652/checks/{DEFAULT_CHECK_CTX_QUERY}": [],
-                f"https://127.0.0.1/api/1.1/patches/6653/checks/{DEFAULT_CHECK_CTX_QUERY}": [],
+                f"https://127.0.0.1/api/1.1/patches/6652/checks/{DEFAULT_CHECKS_QUERY}": [],
+                f"https://127.0.0.1/api/1.1/patches/6653/checks/{DEFAULT_CHECKS_QUERY}": [],
             }
         )
 
@@ -633,7 +846,7 @@ class TestSeries(PatchworkTestCase):
         contexts_responses.update(
             {
                 # Patch with existing context
-                f"https://127.0.0.1/api/1.1/patches/6651/checks/{DEFAULT_CHECK_CTX_QUERY}": [
+                f"https://127.0.0.1/api/1.1/patches/6651/checks/{DEFAULT_CHECKS_QUERY}": [
                     {
                         "context": DEFAULT_CHECK_CTX,
                         "date": "2010-01-01T00:00:00",
@@ -645,8 +858,8 @@ class TestSeries(PatchworkTestCase):
                     },
                 ],
                 # Patches without existing context
-                f"https://127.0.0.1/api/1.1/patches/6652/checks/{DEFAULT_CHECK_CTX_QUERY}": [],
-                f"https://127.0.0.1/api/1.1/patches/6653/checks/{DEFAULT_CHECK_CTX_QUERY}": [],
+                f"https://127.0.0.1/api/1.1/patches/6652/checks/{DEFAULT_CHECKS_QUERY}": [],
+                f"https://127.0.0.1/api/1.1/patches/6653/checks/{DEFAULT_CHECKS_QUERY}": [],
             }
         )
 
@@ -667,6 +880,109 @@ class TestSeries(PatchworkTestCase):
             len(series.patches),
         )
 
+    @aioresponses()
+    async def test_series_checks_fetched_once(self, m: aioresponses) -> None:
+        """
+        Checks of a patch are fetched once for all contexts, and checks posted
+        are not posted again.
+        """
+        contexts_responses = copy.deepcopy(DEFAULT_TEST_RESPONSES)
+        contexts_responses.update(
+            {
+                f"https://127.0.0.1/api/1.1/patches/6651/checks/{DEFAULT_CHECKS_QUERY}": [
+                    {
+                        "context": "Other",
+                        "date": "2010-01-02T00:00:00",
+                        "state": "success",
+                        "target_url": "https://127.0.0.1/other",
+                    },
+                    {
+                        "context": "other",
+                        "date": "2010-01-01T00:00:00",
+                        "state": "pending",
+                        "target_url": "https://127.0.0.1/other",
+                    },
+                ],
+                f"https://127.0.0.1/api/1.1/patches/6652/checks/{DEFAULT_CHECKS_QUERY}": [],
+                f"https://127.0.0.1/api/1.1/patches/6653/checks/{DEFAULT_CHECKS_QUERY}": [],
+            }
+        )
+        init_pw_responses(m, contexts_responses)
+        m.post(re.compile(r"^.*$"), status=200, repeat=True)
+
+        series = await self._pw.get_series_by_id(665)
+        for _ in range(2):
+            for context in (DEFAULT_CHECK_CTX, "other"):
+                await series.set_check(
+                    context=context,
+                    status=Status.SUCCESS,
+                    target_url="https://127.0.0.1/other",
+                )
+
+        # pyrefly: ignore  # missing-attribute
+        requests = m.requests.items()
+        gets = [
+            calls
+            for (method, url), calls in requests
+            if method == "GET" and "/checks/" in str(url)
+        ]
+        self.assertEqual([len(calls) for calls in gets], [1, 1, 1])
+        # Patch 6651 already has the "other" check: only the other context
+        # is posted for it. Nothing is posted the second time around.
+        posts = [calls for (method, _), calls in requests if method == "POST"]
+        self.assertEqual(sorted(len(calls) for calls in posts), [1, 2, 2])
+
+    @aioresponses()
+    async def test_series_checks_ledger(self, m: aioresponses) -> None:
+        """
+        Checks recorded in the ledger as unchanged are neither read back nor
+        posted. Checks read back from patchwork are recorded.
+        """
+        TARGET_URL = "https://127.0.0.1/target"
+        contexts_responses = copy.deepcopy(DEFAULT_TEST_RESPONSES)
+        contexts_responses.update(
+            {
+                f"https://127.0.0.1/api/1.1/patches/6652/checks/{DEFAULT_CHECKS_QUERY}": [
+                    {
+                        "context": DEFAULT_CHECK_CTX,
+                        "date": "2010-01-01T00:00:00",
+                        "state": "success",
+                        "target_url": TARGET_URL,
+                    },
+                ],
+                f"https://127.0.0.1/api/1.1/patches/6653/checks/{DEFAULT_CHECKS_QUERY}": [],
+            }
+        )
+        init_pw_responses(m, contexts_responses)
+        m.post(re.compile(r"^.*$"), status=200, repeat=True)
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            ledger = CheckLedger(os.path.join(tmp_dir, "ledger.sqlite3"))
+            ledger.record(6651, DEFAULT_CHECK_CTX, "success", TARGET_URL)
+            self._pw.check_ledger = ledger
+
+            series = await self._pw.get_series_by_id(665)
+            await series.set_check(
+                context=DEFAULT_CHECK_CTX, status=Status.SUCCESS, target_url=TARGET_URL
+            )
+
+            # pyrefly: ignore  # missing-attribute
+            urls = [str(url) for _, url in m.requests.keys()]
+            self.assertFalse(any("/patches/6651/checks/" in url for url in urls))
+            self.assertEqual(
+                ledger.get(6652, DEFAULT_CHECK_CTX), ("success", TARGET_URL)
+            )
+            self.assertEqual(
+                ledger.get(6653, DEFAULT_CHECK_CTX), ("success", TARGET_URL)
+            )
+            # pyrefly: ignore  # missing-attribute
+            posts = [url for method, url in m.requests.keys() if method == "POST"]
+            self.assertEqual(
+                [str(url) for url in posts],
+                ["https://127.0.0.1/api/1.1/patches/6653/checks/"],
+            )
+            ledger.close()
+
     @aioresponses()
     async def test_series_checks_no_update_diff_pending_state(
         self, m: aioresponses
@@ -679,7 +995,7 @@ class TestSeries(PatchworkTestCase):
         contexts_responses.update(
             {
                 # Patch with existing context
-                f"https://127.0.0.1/api/1.1/patches/6651/checks/{DEFAULT_CHECK_CTX_QUERY}": [
+                f"https://127.0.0.1/api/1.1/patches/6651/checks/{DEFAULT_CHECKS_QUERY}": [
                     {
                         "context": DEFAULT_CHECK_CTX,
                         "date": "2010-01-01T00:00:00",
@@ -689,8 +1005,8 @@ class TestSeries(PatchworkTestCase):
                     },
                 ],
                 # Patches without existing context
-                f"https://127.0.0.1/api/1.1/patches/6652/checks/{DEFAULT_CHECK_CTX_QUERY}": [],
-                f"https://127.0.0.1/api/1.1/patches/6653/checks/{DEFAULT_CHECK_CTX_QUERY}": [],
+                f"https://127.0.0.1/api/1.1/patches/6652/checks/{DEFAULT_CHECKS_QUERY}": [],
+                f"https://127.0.0.1/api/1.1/patches/6653/checks/{DEFAULT_CHECKS_QUERY}": [],
             }
         )
 
@@ -0,0 +1,79 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+# pyre-unsafe
+
+import datetime
+import unittest
+from typing import Any, Dict
+from unittest.mock import AsyncMock, MagicMock
+
+from kernel_patches_daemon.patchwork import FULL_RESCAN_INTERVAL_SEC
+from kernel_patches_daemon.patchwork_events import DirtySet, PatchworkEventFeed
+from tests.common.patchwork_mock import get_default_pw_client, PROJECT
+
+
+def _event(event_id: int, category: str, date: str, **payload: Any) -> Dict:
+    return {"id": event_id, "category": category, "date": date, "payload": payload}
+
+
+class TestPatchworkEventFeed(unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        self.pw = get_default_pw_client()
+        self.pw.get_events = AsyncMock(return_value=[])
+        self.feed = PatchworkEventFeed(self.pw)
+
+    async def test_first_poll_is_unknown(self) -> None:
+        self.assertIsNone(await self.feed.poll())
+        self.pw.get_events.assert_not_called()
+
+    async def test_poll(self) -> None:
+        await self.feed.poll()
+        self.feed.high_water_mark = datetime.datetime(2010, 7, 23, 0, 0, 0)
+        self.pw.get_events.return_value = [
+            _event(1, "series-created", "2010-07-23T00:01:00", series={"id": 10}),
+            _event(2, "patch-state-changed", "2010-07-23T00:02:00", patch={"id": 20}),
+            _event(3, "check-created", "2010-07-23T00:03:00", patch={"id": 30}),
+        ]
+
+        dirty = await self.feed.poll()
+
+        self.assertEqual(dirty, DirtySet(series_ids={10}, patch_ids={20}))
+        self.pw.get_events.assert_called_once_with(
+            {"since": "2010-07-22T23:50:00", "project": str(PROJECT)}
+        )
+        self.assertEqual(
+            self.feed.high_water_mark, datetime.datetime(2010, 7, 23, 0, 3, 0)
+        )
+
+        # Events are listed again within the margin, but only reported once.
+        self.pw.get_events.return_value.append(
+            _event(4, "patch-created", "2010-07-23T00:04:00", patch={"id": 21})
+        )
+        self.assertEqual(await self.feed.poll(), DirtySet(patch_ids={21}))
+        self.assertEqual(
+            self.pw.get_events.call_args.args[0]["since"], "2010-07-22T23:53:00"
+        )
+
+    async def test_fetch_failure_is_unknown(self) -> None:
+        await self.feed.poll()
+        self.pw.get_events.side_effect = RuntimeError("boom")
+        self.assertIsNone(await self.feed.poll())
+
+    async def test_periodic_full_rescan(self) -> None:
+        await self.feed.poll()
+        self.assertIsNotNone(await self.feed.poll())
+        self.feed.last_full_scan -= FULL_RESCAN_INTERVAL_SEC
+        self.assertIsNone(await self.feed.poll())
+        self.assertIsNotNone(await self.feed.poll())
+
+    def test_is_dirty(self) -> None:
+        series = MagicMock()
+        series.id = 1
+        series.patches = [{"id": 11}, {"id": 12}]
+        self.assertFalse(DirtySet().is_dirty(series))
+        self.assertTrue(DirtySet(series_ids={1}).is_dirty(series))
+        self.assertTrue(DirtySet(patch_ids={12}).is_dirty(series))
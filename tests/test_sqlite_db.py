@@ -0,0 +1,55 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+# pyre-unsafe
+
+import os
+import sqlite3
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+
+from kernel_patches_daemon.sqlite_db import LazySqliteDb, REOPEN_INTERVAL_SEC
+
+
+class TestLazySqliteDb(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.path = os.path.join(self.tmp_dir.name, "missing", "db.sqlite3")
+
+    def test_connect(self) -> None:
+        init = MagicMock()
+        db = LazySqliteDb(self.path, init, "test db")
+        conn = db.connect()
+        self.assertIsNotNone(conn)
+        # The connection is reused.
+        self.assertIs(db.connect(), conn)
+        init.assert_called_once_with(conn)
+
+        # Closing it opens a new one, initialized again.
+        db.close()
+        self.assertIsNot(db.connect(), conn)
+        self.assertEqual(init.call_count, 2)
+        db.close()
+
+    def test_init_failure(self) -> None:
+        """
+        The database is not used when failing to initialize it, and is opened
+        again later.
+        """
+        init = MagicMock(side_effect=sqlite3.OperationalError("locked"))
+        db = LazySqliteDb(self.path, init, "test db")
+        monotonic = "kernel_patches_daemon.sqlite_db.time.monotonic"
+        with patch(monotonic, return_value=1000):
+            self.assertIsNone(db.connect())
+        init.side_effect = None
+        with patch(monotonic, return_value=999 + REOPEN_INTERVAL_SEC):
+            self.assertIsNone(db.connect())
+        self.assertEqual(init.call_count, 1)
+        with patch(monotonic, return_value=1000 + REOPEN_INTERVAL_SEC):
+            self.assertIsNotNone(db.connect())
+        db.close()
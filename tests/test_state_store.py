@@ -0,0 +1,147 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+# pyre-unsafe
+
+import datetime
+import os
+import sqlite3
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from kernel_patches_daemon.sqlite_db import REOPEN_INTERVAL_SEC
+from kernel_patches_daemon.state_store import BranchState, StateStore
+
+
+class TestStateStore(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, "state.sqlite3")
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    def reopen(self, store: StateStore) -> StateStore:
+        store.close()
+        return StateStore(self.path)
+
+    def test_empty(self) -> None:
+        store = StateStore(self.path)
+        self.assertEqual(store.load_series_index(), ({}, {}))
+        self.assertEqual(store.load_subjects(), {})
+        self.assertEqual(store.load_branch_state("branch"), BranchState())
+        self.assertIsNone(store.get_value("key"))
+
+    def test_series_index(self) -> None:
+        date = datetime.datetime(2010, 7, 23, 1, 2, 3)
+        store = StateStore(self.path)
+        store.save_series_index({0: {1: date, 2: date}, 1: {3: date}}, {0: date})
+        store.save_series_index({0: {1: date}}, {0: date, 1: date})
+
+        store = self.reopen(store)
+        self.assertEqual(
+            store.load_series_index(), ({0: {1: date}}, {0: date, 1: date})
+        )
+
+    def test_subjects(self) -> None:
+        subjects = {"subject": (1, "branch", (("branch", "upstream", None),))}
+        store = StateStore(self.path)
+        store.save_subjects(subjects)
+
+        store = self.reopen(store)
+        self.assertEqual(store.load_subjects(), subjects)
+
+    def test_branch_state(self) -> None:
+        state = BranchState(
+            upstream_sha="upstream",
+            e2e_synced_key=("upstream", "ci"),
+            pr_base_commits={"branch_base": (("upstream", "ci"), "base")},
+            closed_prs={"series/1=>branch": (42, 1000.0)},
+            closed_prs_synced_at=1000.0,
+        )
+        store = StateStore(self.path)
+        store.save_branch_state("branch", state)
+        store.save_branch_state("other", BranchState(upstream_sha="other"))
+
+        store = self.reopen(store)
+        self.assertEqual(store.load_branch_state("branch"), state)
+        self.assertEqual(
+            store.load_branch_state("other"), BranchState(upstream_sha="other")
+        )
+
+    def test_closed_prs_incremental(self) -> None:
+        """
+        Only closed PRs that changed since they were last loaded or saved get
+        written.
+        """
+        state = BranchState(closed_prs={"a": (1, 1000.0), "b": (2, 1000.0)})
+        store = StateStore(self.path)
+        store.save_branch_state("branch", state)
+
+        def tamper() -> None:
+            # Rows that get written again lose this change.
+            db = sqlite3.connect(self.path)
+            with db:
+                db.execute("UPDATE closed_prs SET number = number + 100")
+            db.close()
+
+        tamper()
+        state.closed_prs["b"] = (3, 2000.0)
+        state.closed_prs["c"] = (4, 2000.0)
+        store.save_branch_state("branch", state)
+        self.assertEqual(
+            store.load_branch_state("branch").closed_prs,
+            {"a": (101, 1000.0), "b": (3, 2000.0), "c": (4, 2000.0)},
+        )
+
+        # Loaded closed PRs are not written again either.
+        store = self.reopen(store)
+        state = store.load_branch_state("branch")
+        tamper()
+        store.save_branch_state("branch", state)
+        self.assertEqual(
+            store.load_branch_state("branch").closed_prs,
+            {"a": (201, 1000.0), "b": (103, 2000.0), "c": (104, 2000.0)},
+        )
+
+    def test_values(self) -> None:
+        store = StateStore(self.path)
+        store.set_value("key", {"a": [1]})
+        store = self.reopen(store)
+        self.assertEqual(store.get_value("key"), {"a": [1]})
+
+    def test_missing_directory(self) -> None:
+        """
+        The directory of the store is created if need be, e.g., before the
+        first clone of a fresh deployment.
+        """
+        store = StateStore(os.path.join(self.tmp_dir.name, "missing", "state"))
+        store.set_value("key", 1)
+        self.assertEqual(store.get_value("key"), 1)
+
+    def test_unusable_database(self) -> None:
+        """
+        The store does nothing while the database cannot be opened, and opens
+        it again later.
+        """
+        # A directory cannot be opened as a database.
+        os.mkdir(self.path)
+        store = StateStore(self.path)
+        state = BranchState(closed_prs={"a": (1, 1000.0)})
+        monotonic = "kernel_patches_daemon.sqlite_db.time.monotonic"
+        with patch(monotonic, return_value=1000):
+            store.save_branch_state("branch", state)
+            store.set_value("key", 1)
+            self.assertIsNone(store.get_value("key"))
+
+        os.rmdir(self.path)
+        with patch(monotonic, return_value=999 + REOPEN_INTERVAL_SEC):
+            self.assertIsNone(store.get_value("key"))
+        with patch(monotonic, return_value=1000 + REOPEN_INTERVAL_SEC):
+            store.save_branch_state("branch", state)
+            # Closed PRs that failed to be saved are saved this time.
+            self.assertEqual(store.load_branch_state("branch"), state)
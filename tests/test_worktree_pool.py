@@ -0,0 +1,141 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+#
+# This source code is licensed under the BSD-style license found in the
+# LICENSE file in the root directory of this source tree.
+
+# pyre-unsafe
+
+import asyncio
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import git
+
+from kernel_patches_daemon.async_git import AsyncGit
+from kernel_patches_daemon.worktree_pool import WorktreePool
+
+
+class TestWorktreePool(unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, "repo")
+        self.repo = git.Repo.init(self.path)
+        self.repo.git.config("user.name", "test")
+        self.repo.git.config("user.email", "test@test.com")
+        with open(os.path.join(self.path, "file.txt"), "w") as f:
+            f.write("Hello, world!\n")
+        self.repo.index.add(["file.txt"])
+        self.repo.index.commit("Initial commit\n")
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.tmp_dir)
+
+    async def test_no_worktrees(self) -> None:
+        pool = WorktreePool(self.path)
+        pool.attach(self.repo)
+
+        async with pool.lease() as repo:
+            self.assertIs(repo, self.repo)
+        self.assertFalse(os.path.exists(pool.worktree_path(0)))
+
+    async def test_no_worktrees_serializes_leases(self) -> None:
+        pool = WorktreePool(self.path)
+        pool.attach(self.repo)
+        active = 0
+        max_active = 0
+
+        async def use() -> None:
+            nonlocal active, max_active
+            async with pool.lease():
+                active += 1
+                max_active = max(max_active, active)
+                await asyncio.sleep(0.01)
+                active -= 1
+
+        await asyncio.gather(*(use() for _ in range(3)))
+        self.assertEqual(max_active, 1)
+
+    async def test_concurrent_leases_get_distinct_worktrees(self) -> None:
+        pool = WorktreePool(self.path, 2)
+        pool.attach(self.repo)
+        dirs = []
+
+        async def use() -> None:
+            async with pool.lease() as repo:
+                dirs.append(repo.working_dir)
+                await asyncio.sleep(0.01)
+
+        await asyncio.gather(use(), use())
+        self.assertCountEqual(dirs, [pool.worktree_path(0), pool.worktree_path(1)])
+
+    async def test_branch_visible_after_release(self) -> None:
+        pool = WorktreePool(self.path, 1)
+        pool.attach(self.repo)
+
+        async with pool.lease() as repo:
+            repo.git.checkout("-B", "series/1")
+            with open(os.path.join(repo.working_dir, "file.txt"), "a") as f:
+                f.write("change\n")
+            repo.index.add(["file.txt"])
+            repo.index.commit("change\n")
+            sha = repo.head.commit.hexsha
+
+        # The branch is shared with the main clone and no longer checked out
+        # in the worktree, so it can be checked out elsewhere.
+        self.assertEqual(self.repo.heads["series/1"].commit.hexsha, sha)
+        self.repo.git.checkout("series/1")
+
+    async def test_dirty_worktree_is_cleaned(self) -> None:
+        pool = WorktreePool(self.path, 1)
+        pool.attach(self.repo)
+
+        async with pool.lease() as repo:
+            pass
+        with open(os.path.join(repo.working_dir, "file.txt"), "w") as f:
+            f.write("garbage\n")
+        with open(os.path.join(repo.working_dir, "untracked"), "w") as f:
+            f.write("garbage\n")
+
+        async with pool.lease() as repo:
+            self.assertFalse(repo.is_dirty(untracked_files=True))
+
+    async def test_broken_worktree_is_recreated(self) -> None:
+        pool = WorktreePool(self.path, 1)
+        pool.attach(self.repo)
+
+        async with pool.lease() as repo:
+            pass
+        shutil.rmtree(repo.working_dir)
+        os.makedirs(repo.working_dir)
+
+        async with pool.lease() as repo:
+            self.assertEqual(repo.working_dir, pool.worktree_path(0))
+            self.assertEqual(repo.head.commit.hexsha, self.repo.head.commit.hexsha)
+
+    async def test_git_runs_off_the_event_loop(self) -> None:
+        """
+        Worktrees are created, cleaned and released through AsyncGit.
+        """
+        pool = WorktreePool(self.path, 1)
+        pool.attach(self.repo)
+
+        commands = []
+        run = AsyncGit.run
+
+        async def record(git_: AsyncGit, *args: str, **kwargs) -> str:
+            commands.append(args[:2])
+            return await run(git_, *args, **kwargs)
+
+        with patch.object(AsyncGit, "run", record):
+            async with pool.lease():
+                pass
+            async with pool.lease():
+                pass
+        self.assertIn(("worktree", "add"), commands)
+        self.assertIn(("reset", "--hard"), commands)
+        self.assertIn(("clean", "-ffdx"), commands)
+        self.assertIn(("checkout", "--detach"), commands)